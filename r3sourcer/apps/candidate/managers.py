@@ -1,9 +1,11 @@
 from datetime import date, timedelta, datetime
 from django.conf import settings
-from django.db.models import Manager, Q, Max, Case, When, DateTimeField
+from django.db.models import Q, Max, Case, When, DateTimeField
 
+from r3sourcer.apps.core.managers import AbstractObjectOwnerManager
 
-class CandidateContactManager(Manager):
+
+class CandidateContactManager(AbstractObjectOwnerManager):
 
     def available(self, target_date=None):
         if target_date is None:
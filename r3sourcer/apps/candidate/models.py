@@ -543,17 +543,22 @@ class CandidateContact(UUIDModel, WorkflowProcess):
                                       .first()
         return skill_rate.rate if skill_rate else None
 
-    def get_closest_company(self):
-        try:
-            current_request = get_current_request()
-            company_qry = models.Q()
+    @classmethod
+    def _get_current_company_qry(cls):
+        current_request = get_current_request()
+        company_qry = models.Q()
 
-            if current_request and current_request.user.is_authenticated:
-                current_user = current_request.user
-                if current_user.contact.is_company_contact():
-                    current_company = current_user.contact.get_closest_company()
-                    company_qry = models.Q(master_company=current_company)
+        if current_request and current_request.user.is_authenticated:
+            current_user = current_request.user
+            if current_user.contact.is_company_contact():
+                current_company = current_user.contact.get_closest_company()
+                company_qry = models.Q(master_company=current_company)
 
+        return company_qry
+
+    def get_closest_company(self):
+        try:
+            company_qry = self._get_current_company_qry()
             candidate_rel = self.candidate_rels.filter(company_qry, owner=True, active=True).first()
             if not candidate_rel:
                 candidate_rel = self.candidate_rels.get(
@@ -563,6 +568,31 @@ class CandidateContact(UUIDModel, WorkflowProcess):
         except CandidateRel.DoesNotExist:
             return get_site_master_company()
 
+    @classmethod
+    def get_closest_company_ids(cls, objects):
+        """
+        Resolves closest companies of the candidates with the owner candidate relations of all candidates
+        """
+        candidate_ids = [obj.pk for obj in objects]
+        # reversed order keeps the first relation of the candidate like `first()`
+        company_ids = dict(CandidateRel.objects.filter(
+            cls._get_current_company_qry(), candidate_contact_id__in=candidate_ids, owner=True, active=True
+        ).order_by('-pk').values_list('candidate_contact_id', 'master_company_id'))
+
+        missing_ids = [pk for pk in candidate_ids if pk not in company_ids]
+        if missing_ids:
+            company_ids.update(CandidateRel.objects.filter(
+                candidate_contact_id__in=missing_ids, owner=True,
+                master_company__type=core_models.Company.COMPANY_TYPES.master
+            ).order_by('-pk').values_list('candidate_contact_id', 'master_company_id'))
+
+        missing_ids = [pk for pk in candidate_ids if pk not in company_ids]
+        if missing_ids:
+            site_master_company = get_site_master_company()
+            company_ids.update({pk: site_master_company and site_master_company.pk for pk in missing_ids})
+
+        return company_ids
+
     def save(self, *args, **kwargs):
         just_added = self._state.adding
         master_company = self.get_closest_company()
@@ -1,3 +1,6 @@
+import uuid
+from collections import defaultdict
+
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.db.models import Q
@@ -5,7 +8,7 @@ from django.utils.translation import ugettext_lazy as _
 from django_filters import NumberFilter
 
 from crum import get_current_request
-from rest_framework import exceptions
+from rest_framework import exceptions, serializers
 
 from r3sourcer.apps.logger.main import endless_logger
 from r3sourcer.apps.core.models import User, WorkflowObject, WorkflowNode
@@ -13,6 +16,19 @@ from r3sourcer.apps.core.utils.address import parse_google_address
 from r3sourcer.apps.core.utils.companies import get_site_master_company
 
 
+def get_serializer_page_objects(serializer, obj):
+    """
+    Gets all objects serialized by the parent list serializer if obj is one of them
+    """
+    parent = getattr(serializer, 'parent', None)
+    if isinstance(parent, serializers.ListSerializer) and parent.instance is not None:
+        objects = list(parent.instance)
+        if obj in objects:
+            return objects
+
+    return [obj]
+
+
 class WorkflowStatesColumnMixin():
 
     def get_method_fields(self):
@@ -23,7 +39,14 @@ class WorkflowStatesColumnMixin():
         if not obj:
             return
 
-        states = obj.get_active_states()
+        if '_prefetched_active_states' not in obj.__dict__:
+            page_objects = get_serializer_page_objects(self, obj)
+            if len(page_objects) > 1:
+                obj.prefetch_active_states([
+                    item for item in page_objects if '_prefetched_active_states' not in item.__dict__
+                ])
+
+        states = obj.get_active_states_list()
 
         return [
             {
@@ -46,23 +69,50 @@ class CreatedUpdatedByMixin:
     def get_field_to_check_update(self, obj):
         return 'updated_at'
 
-    def _get_log_updated_by(self, obj, log_type=None):
+    def _get_log_field(self, obj, log_type=None):
         if log_type and log_type == 'create':
-            field = self.get_field_to_check_create(obj)
-        else:
-            field = self.get_field_to_check_update(obj)
+            return self.get_field_to_check_create(obj)
+
+        return self.get_field_to_check_update(obj)
+
+    def prefetch_log_updated_by(self, objects, log_type=None):
+        """
+        Resolves emails of the users who made the recent changes for all objects
+        with one logger query per checked field and one users query
+        """
+        ids_by_field = defaultdict(list)
+        for item in objects:
+            ids_by_field[self._get_log_field(item, log_type)].append(item.id)
+
+        log_entries = {}
+        for field, object_ids in ids_by_field.items():
+            changes = endless_logger.get_recent_fields_changes(self.Meta.model, object_ids, field, log_type)
+            log_entries.update({
+                (object_id, field): log_entry['updated_by'] for object_id, log_entry in changes.items()
+            })
+
+        user_ids = set()
+        for user_id in log_entries.values():
+            try:
+                user_ids.add(uuid.UUID(user_id))
+            except (TypeError, ValueError):
+                continue
+
+        users = User.objects.filter(id__in=user_ids).select_related('contact')
+        emails = {str(user.id): user.email if hasattr(user, 'contact') else None for user in users}
+
+        log_updated_by = self.__dict__.setdefault('_log_updated_by', {})
+        for item in objects:
+            user_id = log_entries.get((str(item.id), self._get_log_field(item, log_type)))
+            log_updated_by[(log_type, str(item.id))] = emails.get(user_id) or settings.SYSTEM_USER
 
-        log_entry = endless_logger.get_recent_field_change(self.Meta.model, obj.id, field, log_type)
-        if 'updated_by' in log_entry:
-            user = User.objects.get(id=log_entry['updated_by'])
-            email = user.email if hasattr(user, 'contact') else None
-        else:
-            email = None
-
-        if not email:
-            email = settings.SYSTEM_USER
+    def _get_log_updated_by(self, obj, log_type=None):
+        log_updated_by = self.__dict__.get('_log_updated_by', {})
+        if (log_type, str(obj.id)) not in log_updated_by:
+            self.prefetch_log_updated_by(get_serializer_page_objects(self, obj), log_type)
+            log_updated_by = self.__dict__['_log_updated_by']
 
-        return email
+        return log_updated_by[(log_type, str(obj.id))]
 
     def get_created_by(self, obj):
         return self._get_log_updated_by(obj, 'create')
@@ -1,3 +1,5 @@
+import copy
+import threading
 from datetime import datetime, time
 from itertools import chain
 from collections import OrderedDict
@@ -19,6 +21,7 @@ from django.utils.formats import date_format
 from django.utils.translation import ugettext_lazy as _
 from rest_framework import serializers, exceptions, validators
 from rest_framework.fields import empty
+from rest_framework.utils.serializer_helpers import BindingDict
 
 from django.db.models.fields.related import (
     RelatedField, ManyToOneRel, ManyToManyField, ManyToManyRel, OneToOneRel
@@ -40,6 +43,40 @@ rest_settings = settings.REST_FRAMEWORK
 
 RELATED_NONE, RELATED_DIRECT, RELATED_FULL = 'minimal', 'direct', 'full'
 
+FIELD_LAYOUT_CACHE_SIZE = 1024
+
+_field_layouts = OrderedDict()
+_field_layouts_lock = threading.Lock()
+_internal_serializers = {}
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _get_field_layout(key):
+    with _field_layouts_lock:
+        layout = _field_layouts.get(key)
+        if layout is not None:
+            _field_layouts.move_to_end(key)
+        return layout
+
+
+def _set_field_layout(key, layout):
+    with _field_layouts_lock:
+        _field_layouts[key] = layout
+        if len(_field_layouts) > FIELD_LAYOUT_CACHE_SIZE:
+            _field_layouts.popitem(last=False)
+
+
+def clear_field_layouts():
+    with _field_layouts_lock:
+        _field_layouts.clear()
+
 
 class ApiFullRelatedFieldsMixin():
     """
@@ -48,6 +85,9 @@ class ApiFullRelatedFieldsMixin():
     Settings:
     ``settings.REST_FRAMEWORK['RELATED_FULL']`` (default: 'minimal') - render related object
     values: 'full', 'direct', 'minimal'
+
+    Fields built for serializers without data don't depend on the instance, so they are cached
+    as a layout by serializer class and settings and later instantiations only clone them.
     """
 
     _read_only_fields = ('__str__', )
@@ -70,10 +110,23 @@ class ApiFullRelatedFieldsMixin():
             getattr(self.Meta, 'related', rest_settings.get(
                 'RELATED', RELATED_NONE))
         related_obj_setting = related_obj_setting or RELATED_NONE
-        internal_fields_dict = getattr(self.Meta, 'related_fields', {})
+        internal_fields_dict = dict(getattr(self.Meta, 'related_fields', {}))
         related_setting = related_obj_setting if related_obj_setting != RELATED_DIRECT else RELATED_NONE
         related_extra_kwargs = getattr(self.Meta, 'extra_kwargs', {})
 
+        layout_key = None
+        if data is empty and settings.SERIALIZER_FIELD_LAYOUT_CACHE:
+            is_write_request = request is not None and request.method in ('POST', 'PUT', 'PATCH')
+            layout_key = (
+                type(self), related_obj_setting, parent_field_name, bool(kwargs.get('partial', False)),
+                is_write_request, _freeze(self.Meta.fields), tuple(self._declared_fields),
+            )
+            layout = _get_field_layout(layout_key)
+            if layout is not None:
+                self._apply_field_layout(layout, context)
+                return
+
+        nested_fields = {}
         for field_name, field in self.fields.items():
             if field_name == 'id':
                 kwargs = field._kwargs
@@ -153,6 +206,7 @@ class ApiFullRelatedFieldsMixin():
                         related_extra_kwargs
                     )
                     self.fields[field_name] = internal(**kwargs)
+                    nested_fields[field_name] = (internal, kwargs)
                 continue
 
             try:
@@ -242,6 +296,38 @@ class ApiFullRelatedFieldsMixin():
 
             kwargs['context']['related_setting'] = internal.Meta.related
             self.fields[field_name] = internal(**kwargs)
+            nested_fields[field_name] = (internal, kwargs)
+
+        if layout_key is not None:
+            _set_field_layout(layout_key, self._build_field_layout(nested_fields))
+
+    def _build_field_layout(self, nested_fields):
+        """
+        Unbound copies of the built fields, nested serializers are stored as classes with
+        their arguments as they are instantiated with the context of the request
+        """
+        layout = []
+        for field_name, field in self.fields.items():
+            if field_name in nested_fields:
+                internal, kwargs = nested_fields[field_name]
+                kwargs = {key: value for key, value in kwargs.items() if key != 'context'}
+                layout.append((field_name, (internal, kwargs)))
+            else:
+                layout.append((field_name, copy.deepcopy(field)))
+
+        return layout
+
+    def _apply_field_layout(self, layout, context):
+        fields = BindingDict(self)
+        for field_name, field in layout:
+            if isinstance(field, tuple):
+                internal, kwargs = field
+                context['related_setting'] = internal.Meta.related
+                fields[field_name] = internal(context=context, **kwargs)
+            else:
+                fields[field_name] = copy.deepcopy(field)
+
+        self.fields = fields
 
     def _get_internal_serializer(
         self, field_name, field, model, related_setting, internal_fields_dict, related_extra_kwargs=None
@@ -250,6 +336,13 @@ class ApiFullRelatedFieldsMixin():
         if not isinstance(related_fields, (list, tuple)) or not related_fields:
             related_fields = '__all__'
 
+        # related fields taken from the request data are not cached
+        meta_related_fields = getattr(self.Meta, 'related_fields', {})
+        is_cacheable = internal_fields_dict.get(field_name) is meta_related_fields.get(field_name)
+        internal_key = (model, _freeze(related_fields), related_setting)
+        if is_cacheable and internal_key in _internal_serializers:
+            return _internal_serializers[internal_key]
+
         meta_properties = dict(
             model=model,
             fields=related_fields,
@@ -262,6 +355,8 @@ class ApiFullRelatedFieldsMixin():
             (ApiBaseModelSerializer,),
             dict(Meta=internal_meta)
         )
+        if is_cacheable:
+            _internal_serializers[internal_key] = internal
 
         return internal
 
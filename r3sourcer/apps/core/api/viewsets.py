@@ -25,7 +25,7 @@ from r3sourcer.apps.candidate.models import CandidateContact, CandidateRel
 from r3sourcer.apps.core import tasks
 from r3sourcer.apps.core.api.contact_bank_accounts.serializers import ContactBankAccountFieldSerializer
 from r3sourcer.apps.core.api.fields import ApiBase64FileField
-from r3sourcer.apps.core.api.mixins import GoogleAddressMixin
+from r3sourcer.apps.core.api.mixins import GoogleAddressMixin, WorkflowStatesColumnMixin
 from r3sourcer.apps.core.models import BankAccountLayout, ContactBankAccount, BankAccountField, Contact
 from r3sourcer.apps.core.models.dashboard import DashboardModule
 from r3sourcer.apps.core.utils.address import parse_google_address
@@ -86,6 +86,11 @@ class BaseApiViewset(BaseViewsetMixin, viewsets.ModelViewSet):
         if context is not None:
             serializer_context.update(context)
 
+        is_states_listed = issubclass(serializer_class, WorkflowStatesColumnMixin) and \
+            (not fields or 'active_states' in fields)
+        if is_states_listed and hasattr(queryset, 'prefetch_workflow_states'):
+            queryset = queryset.prefetch_workflow_states()
+
         page = self.paginate_queryset(queryset)
         if page is not None:
 
@@ -1,5 +1,6 @@
 from datetime import date
 from functools import reduce
+from operator import __or__ as OR
 
 from django.db import models
 from django.db.models import Q
@@ -13,9 +14,105 @@ class TagManager(TreeManager):
         return self.get_queryset().filter(active=True)
 
 
+LOOKUP_OWNER, LOOKUP_OWNED_BY, LOOKUP_MANAGER = range(3)
+
+_lookup_paths = {}
+_related_lookups = {}
+
+
+def compile_lookup_paths(model, owner):
+    """
+    Finds foreign key paths from the model to the owner model, results are cached per
+    (model, owner model) as the model graph doesn't change at runtime.
+
+    :param model: owned model
+    :param owner: owner object, ``owned_by_lookups`` of the related models are checked for it
+    :return: tuple of (lookup type, relative path, related model) entries
+    """
+    owner_model = owner._meta.model
+    key = (model, owner_model)
+    if key in _lookup_paths:
+        return _lookup_paths[key]
+
+    paths = []
+    related_fields = [
+        f for f in model._meta.get_fields()
+        if (getattr(f, 'many_to_one', False) and f.related_model != model)
+    ]
+
+    for related_field in related_fields:
+        related_model = related_field.related_model
+
+        if related_model == owner_model:
+            paths.append((LOOKUP_OWNER, related_field.name, None))
+        elif related_model and hasattr(related_model.objects, 'get_lookups'):
+            if related_model.owned_by_lookups(owner):
+                paths.append((LOOKUP_OWNED_BY, related_field.name, related_model))
+            elif type(related_model.objects.get_queryset()).get_lookups is AbstractObjectOwnerQuerySet.get_lookups:
+                paths.extend(
+                    (lookup_type, '%s__%s' % (related_field.name, path), path_model)
+                    for lookup_type, path, path_model in compile_lookup_paths(related_model, owner)
+                )
+            else:
+                paths.append((LOOKUP_MANAGER, related_field.name, related_model))
+
+    _lookup_paths[key] = tuple(paths)
+    return _lookup_paths[key]
+
+
+def compile_related_lookups(model, owner, passed_models):
+    """
+    Finds reverse relations of the model whose objects are owned by the owner model, results
+    are cached per (model, owner model, models being resolved).
+
+    Relations from the owner model itself are checked for rows when lookups are built.
+
+    :return: tuple of (related model, relation field name, is relation from the owner model) entries
+    """
+    key = (model, owner._meta.model, tuple(passed_models))
+    if key in _related_lookups:
+        return _related_lookups[key]
+
+    relations = []
+    for rel in model._meta.related_objects:
+        if rel.related_model in passed_models or rel.related_model == model:
+            continue
+
+        relations.append((rel.related_model, rel.field.name, isinstance(owner, rel.related_model)))
+
+    _related_lookups[key] = tuple(relations)
+    return _related_lookups[key]
+
+
 class AbstractObjectOwnerQuerySet(LoggerQuerySet):
     passed_models = []
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._prefetch_workflow_states = False
+
+    def prefetch_workflow_states(self):
+        """
+        Loads active workflow states of all fetched objects at once
+        """
+        clone = self._chain()
+        clone._prefetch_workflow_states = True
+        return clone
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._prefetch_workflow_states = self._prefetch_workflow_states
+        return clone
+
+    def _fetch_all(self):
+        is_fetched = self._result_cache is not None
+        super()._fetch_all()
+
+        if self._prefetch_workflow_states and not is_fetched and hasattr(self.model, 'prefetch_active_states'):
+            objects = [obj for obj in self._result_cache if isinstance(obj, self.model)]
+            if objects:
+                self.model.prefetch_active_states(objects)
+
     def owned_by(self, _obj):
         if not self.model.is_owned():
             return self
@@ -31,8 +128,9 @@ class AbstractObjectOwnerQuerySet(LoggerQuerySet):
         lookups.extend(self.model.owner_lookups(_obj))
 
         if lookups:
-            from operator import __or__ as OR
-            return self.filter(reduce(OR, lookups)).distinct()
+            # joins of the lookups are kept in the subquery so the result doesn't need distinct
+            owned_objects = self.model._base_manager.using(self.db).filter(reduce(OR, lookups))
+            return self.filter(pk__in=owned_objects.values('pk'))
         return self.none()
 
     def get_lookups(self, _obj, path=''):
@@ -41,55 +139,41 @@ class AbstractObjectOwnerQuerySet(LoggerQuerySet):
         if _obj is None:
             return path_list
 
-        related_fields = [
-            f for f in self.model._meta.get_fields()
-            if (getattr(f, 'many_to_one', False) and f.related_model != self.model)
-        ]
-
-        for related_field in related_fields:
+        for lookup_type, lookup_path, related_model in compile_lookup_paths(self.model, _obj):
             if path:
-                cur_path = '%s__%s' % (path, related_field.name)
+                lookup_path = '%s__%s' % (path, lookup_path)
+
+            if lookup_type == LOOKUP_OWNER:
+                path_list.append(Q(**{lookup_path: _obj}))
+            elif lookup_type == LOOKUP_OWNED_BY:
+                owned_dicts = [dict(name.children) for name in related_model.owned_by_lookups(_obj)]
+                for owned_dict in owned_dicts:
+                    path_list.append(Q(**{'%s__%s' % (lookup_path, k): v for k, v in owned_dict.items()}))
             else:
-                cur_path = related_field.name
-
-            if related_field.related_model == _obj._meta.model:
-                path_list.append(Q(**{cur_path: _obj}))
-            elif related_field.related_model and hasattr(related_field.related_model.objects, 'get_lookups'):
-                owned_by_lookups = related_field.related_model.owned_by_lookups(_obj)
-
-                if not owned_by_lookups:
-                    owned_by_lookups = related_field.related_model.objects.get_lookups(_obj, cur_path)
-                else:
-                    owned_dicts = [dict(name.children) for name in owned_by_lookups]
-                    owned_by_lookups = []
-                    for owned_dict in owned_dicts:
-                        owned_by_lookups.append(Q(**{'%s__%s' % (cur_path, k): v for k, v in owned_dict.items()}))
-
-                path_list.extend(owned_by_lookups)
+                path_list.extend(related_model.objects.get_lookups(_obj, lookup_path))
 
         return path_list
 
     def _get_obj_related_lookups(self, _obj):
         lookups = []
+        plan = compile_related_lookups(self.model, _obj, self.passed_models)
         self.passed_models.append(self.model)
-        for rel in self.model._meta.related_objects:
-            null_filter = Q(**{'%s__isnull' % rel.field.name: False})
-
-            if rel.related_model not in self.passed_models:
-                is_rel_direct = isinstance(_obj, rel.related_model)
-                qs = rel.related_model.objects
-
-                if not is_rel_direct and hasattr(qs, 'owned_by'):
-                    qs = qs.owned_by(_obj)
-
-                related_queryset_result = qs.filter(null_filter).values_list(rel.field.name, flat=True)
-
-                if related_queryset_result:
-                    q_name = 'id__in'
-                    lookups.append(Q(**{q_name: related_queryset_result}))
-
-                    if is_rel_direct:
-                        break
+        for related_model, field_name, is_rel_direct in plan:
+            null_filter = Q(**{'%s__isnull' % field_name: False})
+            qs = related_model.objects
+
+            if not is_rel_direct and hasattr(qs, 'owned_by'):
+                qs = qs.owned_by(_obj)
+
+            related_queryset = qs.filter(null_filter).values_list(field_name, flat=True)
+            if is_rel_direct:
+                # lookups stop on the first relation from the owner model which has rows
+                if related_queryset.exists():
+                    lookups.append(Q(id__in=related_queryset))
+                    break
+                continue
+
+            lookups.append(Q(id__in=related_queryset))
 
         self.passed_models.remove(self.model)
         return lookups
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0150_auto_20221221_1448'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoiceline',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32, verbose_name='Content hash'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0151_invoiceline_content_hash'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='invoicerule',
+            index_together=set([('period', 'period_zero_reference')]),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0152_invoicerule_period_index'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='address',
+            index_together=set([('latitude', 'longitude')]),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0153_address_coordinates_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='address',
+            name='time_zone',
+            field=models.CharField(blank=True, editable=False, max_length=63, null=True, verbose_name='Time zone'),
+        ),
+    ]
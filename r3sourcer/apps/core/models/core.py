@@ -16,6 +16,7 @@ from django.core.validators import MinLengthValidator
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.db.models import Q, Sum, F, ProtectedError
+from django.db.models.signals import post_save, post_delete
 from django.utils.formats import date_format
 from django.utils.translation import ugettext_lazy as _
 from rest_framework.exceptions import APIException
@@ -32,9 +33,11 @@ from model_utils import Choices
 from mptt.models import MPTTModel, TreeForeignKey
 from phonenumber_field.modelfields import PhoneNumberField
 
-from r3sourcer.apps.core.utils.companies import get_site_master_company
+from r3sourcer.apps.core.utils.companies import (
+    get_site_master_company, get_master_company_ids, get_regular_company_ids, invalidate_company_hierarchy
+)
 from r3sourcer.apps.core.utils.user import get_default_company
-from r3sourcer.helpers.datetimes import utc_now
+from r3sourcer.helpers.datetimes import geo_time_zone_name, utc_now
 from r3sourcer.helpers.models.abs import UUIDModel, TimeZoneUUIDModel
 from .company_languages import CompanyLanguage
 from ..decorators import workflow_function
@@ -750,14 +753,32 @@ class Address(TimeZoneUUIDModel):
     country = models.ForeignKey(Country, to_field='code2', default='AU', on_delete=models.CASCADE)
     apartment = models.CharField(max_length=6, blank=True, null=True, verbose_name=_('Apartment'))
 
+    time_zone = models.CharField(
+        max_length=63,
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name=_("Time zone"),
+    )
+
     class Meta:
         verbose_name = _("Address")
         verbose_name_plural = _("Addresses")
+        index_together = [('latitude', 'longitude')]
 
     @property
     def geo(self):
         return self.longitude, self.latitude
 
+    def get_stored_time_zone(self):
+        return self.time_zone
+
+    def resolve_time_zone(self):
+        if not settings.STORE_ADDRESS_TIME_ZONE or not (self.latitude or self.longitude):
+            return None
+
+        return geo_time_zone_name(self.longitude, self.latitude)
+
     def __str__(self):
         apartment = ''
         if self.apartment:
@@ -832,7 +853,7 @@ class Address(TimeZoneUUIDModel):
             self.latitude = latitude
             self.longitude = longitude
             if should_save:
-                self.save(update_fields=['latitude', 'longitude'])
+                self.save(update_fields=['latitude', 'longitude', 'time_zone'])
             return True
         return False
 
@@ -848,6 +869,8 @@ class Address(TimeZoneUUIDModel):
                 and None in [self.longitude, self.latitude]:
             if getattr(settings, 'FETCH_ADDRESS_RAISE_EXCEPTIONS', True):
                 raise ValidationError(self.default_errors['fetch_error'])
+
+        self.time_zone = self.resolve_time_zone()
         super(Address, self).save(*args, **kwargs)
 
     @classmethod
@@ -959,9 +982,12 @@ class CompanyContact(UUIDModel, MasterCompanyLookupMixin):
         return '{} {}'.format(self.job_title, str(self.contact))
 
     def get_master_company(self):
+        companies = [rel.company for rel in self.relationships.select_related('company')]
+        companies_map = Company.get_master_companies_map(companies)
+
         master_companies = []
-        for rel in self.relationships.all():
-            master_companies.extend(rel.get_master_company())
+        for company in companies:
+            master_companies.extend(companies_map[company.id])
         return master_companies
 
     @classmethod
@@ -1301,11 +1327,39 @@ class Company(CategoryFolderMixin,
     def get_master_company(self):
         if self.type == self.COMPANY_TYPES.master:
             return [self]
-        else:
-            master_companies = []
-            for company_rel in self.regular_companies.all():
-                master_companies.extend(company_rel.master_company.get_master_company())
-            return master_companies
+
+        return self.get_master_companies_map([self])[self.id]
+
+    @classmethod
+    def _get_companies_map(cls, companies, company_ids_map):
+        known_companies = {company.id: company for company in companies}
+        missing_ids = {
+            company_id for company_ids in company_ids_map.values() for company_id in company_ids
+            if company_id not in known_companies
+        }
+        if missing_ids:
+            known_companies.update(cls.objects.in_bulk(missing_ids))
+
+        return {
+            company_id: [known_companies[item_id] for item_id in company_ids if item_id in known_companies]
+            for company_id, company_ids in company_ids_map.items()
+        }
+
+    @classmethod
+    def get_master_companies_map(cls, companies):
+        """
+        Gets master companies for every company by its id, company hierarchy is cached
+        """
+        companies = list(companies)
+        return cls._get_companies_map(companies, get_master_company_ids([company.id for company in companies]))
+
+    @classmethod
+    def get_regular_companies_map(cls, companies):
+        """
+        Gets regular companies for every company by its id, company hierarchy is cached
+        """
+        companies = list(companies)
+        return cls._get_companies_map(companies, get_regular_company_ids([company.id for company in companies]))
 
     def get_closest_master_company(self):
         master_companies = self.get_master_company()
@@ -1319,10 +1373,8 @@ class Company(CategoryFolderMixin,
     def get_regular_companies(self):
         if self.type == self.COMPANY_TYPES.regular:
             return [self]
-        reg_companies = []
-        for company_rel in self.master_companies.all():
-            reg_companies.extend(company_rel.regular_company.get_regular_companies())
-        return reg_companies
+
+        return self.get_regular_companies_map([self])[self.id]
 
     def get_terms_of_payment(self):
         if self.terms_of_payment in (self.TERMS_PAYMENT_CHOICES.prepaid,
@@ -1465,6 +1517,8 @@ class Company(CategoryFolderMixin,
 
         if not just_added:
             origin = Company.objects.get(pk=self.pk)
+            if origin.type != self.type:
+                invalidate_company_hierarchy()
             if origin.myob_card_id != self.myob_card_id:
                 self.old_myob_card_id = origin.myob_card_id
             super(Company, self).save(*args, **kwargs)
@@ -1592,6 +1646,10 @@ class CompanyRel(UUIDModel,
     def get_closest_company(self):
         return self.master_company
 
+    @classmethod
+    def get_closest_company_ids(cls, objects):
+        return {obj.pk: obj.master_company_id for obj in objects}
+
     def after_state_activated(self, workflow_object):
         if workflow_object.state.number == 70 and workflow_object.active:
             jobs = self._get_jobs_with_states(40)
@@ -1820,6 +1878,10 @@ class CompanyAddress(TimeZoneUUIDModel, MasterCompanyLookupMixin):
             latitude=F('address__latitude')
         ).values_list('longitude', 'latitude').get()
 
+    def get_stored_time_zone(self):
+        if self.hq:
+            return self.address.time_zone
+
     def save(self, *args, **kwargs):
         if self.hq:
             CompanyAddress.objects.filter(company=self.company).update(hq=False)
@@ -2391,6 +2453,17 @@ class AbstractBaseOrder(TimeZoneUUIDModel,
             return self.provider_company
         return self.customer_company
 
+    @classmethod
+    def get_closest_company_ids(cls, objects):
+        master_company_ids = set(Company.objects.filter(
+            id__in={obj.provider_company_id for obj in objects}, type=Company.COMPANY_TYPES.master
+        ).values_list('id', flat=True))
+
+        return {
+            obj.pk: obj.provider_company_id if obj.provider_company_id in master_company_ids
+            else obj.customer_company_id for obj in objects
+        }
+
 
 class AbstractOrder(AbstractBaseOrder):
 
@@ -2693,6 +2766,14 @@ class InvoiceLine(AbstractOrderLine):
         null=True
     )
 
+    content_hash = models.CharField(
+        max_length=32,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name=_("Content hash"),
+    )
+
     class Meta:
         verbose_name = _("Invoice Line")
         verbose_name_plural = _("Invoice Lines")
@@ -2878,6 +2959,7 @@ class InvoiceRule(AbstractPayRuleMixin, UUIDModel):
         verbose_name = _("Invoice Rule")
         verbose_name_plural = _("Invoice Rules")
         unique_together = ('company', 'serial_number')
+        index_together = [('period', 'period_zero_reference')]
 
 
 class CurrencyExchangeRates(UUIDModel):
@@ -3045,6 +3127,9 @@ connect_default_signals(Country)
 connect_default_signals(Region)
 connect_default_signals(City)
 
+post_save.connect(invalidate_company_hierarchy, sender=CompanyRel)
+post_delete.connect(invalidate_company_hierarchy, sender=CompanyRel)
+
 __all__ = [
     'Contact', 'ContactRelationship', 'ContactUnavailability',
     'ContactAddress', 'CompanyIndustryRel', 'User', 'UserManager',
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.signals import post_save, post_delete
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.postgres.fields import JSONField
 from django.core.exceptions import ValidationError
@@ -6,6 +7,7 @@ from django.utils.functional import cached_property
 from django.utils.translation import ugettext_lazy as _
 
 from r3sourcer.apps.core.models import Company
+from r3sourcer.apps.core.workflow import invalidate_workflow_graphs
 from r3sourcer.helpers.models.abs import UUIDModel
 
 __all__ = [
@@ -433,3 +435,8 @@ class CompanyWorkflowNode(UUIDModel):
                 models.Q(company=owner),
                 models.Q(company__regular_companies__master_company=owner)
             ]
+
+
+for workflow_model in (Workflow, WorkflowNode, CompanyWorkflowNode):
+    post_save.connect(invalidate_workflow_graphs, sender=workflow_model)
+    post_delete.connect(invalidate_workflow_graphs, sender=workflow_model)
@@ -33,7 +33,8 @@ def memcache_lock(lock_id, oid):
     try:
         yield status
     finally:
-        if monotonic() < timeout_at:
+        # lock is released only by its holder, skipped runs keep it for the running task
+        if status and monotonic() < timeout_at:
             cache.delete(lock_id)
 
 
@@ -12,6 +12,7 @@ from django.utils import timezone
 
 from r3sourcer.apps.candidate.models import CandidateContact, CandidateRel
 from r3sourcer.apps.core import models
+from r3sourcer.apps.core.api.serializers import clear_field_layouts
 from r3sourcer.apps.core.models.core import Role, CompanyAddress, ContactAddress
 from r3sourcer.apps.email_interface.models import EmailTemplate
 from r3sourcer.apps.hr.models import Job, ShiftDate, Shift, Jobsite, JobOffer, JobOfferSMS, TimeSheet
@@ -19,6 +20,14 @@ from r3sourcer.apps.pricing.models import Industry
 from r3sourcer.apps.skills.models import SkillName, Skill
 
 
+@pytest.fixture(autouse=True)
+def field_layouts():
+    # layouts cached by the previous tests are built from their patched fields
+    clear_field_layouts()
+    yield
+    clear_field_layouts()
+
+
 @pytest.fixture
 def user(db):
     return models.User.objects.create_user(
@@ -13,6 +13,7 @@ from freezegun import freeze_time
 from rest_framework import serializers, exceptions, relations
 
 from r3sourcer.apps.core.api.fields import ApiBaseRelatedField
+from r3sourcer.apps.core.api.mixins import CreatedUpdatedByMixin
 from r3sourcer.apps.core.api.serializers import (
     ApiMethodFieldsMixin, ApiBaseModelSerializer, AddressSerializer,
     ContactSerializer, CompanySerializer, CompanyContactSerializer,
@@ -456,6 +457,38 @@ class TestApiFullRelatedFieldsMixin:
 
         assert res_field.queryset is not None
 
+    def test_field_layout_cached(self):
+        serializer = BaseTestSerializer()
+
+        with patch.object(BaseTestSerializer, 'get_fields') as mock_get_fields:
+            cached_serializer = BaseTestSerializer()
+
+            assert list(cached_serializer.fields) == list(serializer.fields)
+            assert not mock_get_fields.called
+
+        assert cached_serializer.fields['name'] is not serializer.fields['name']
+        assert type(cached_serializer.fields['country']) is type(serializer.fields['country'])
+        assert cached_serializer.fields['country'].parent is cached_serializer
+
+    def test_field_layout_not_cached_with_data(self, city_data):
+        BaseTestSerializer(data=city_data)
+
+        with patch.object(BaseTestSerializer, 'get_fields', return_value={}) as mock_get_fields:
+            serializer = BaseTestSerializer(data=city_data)
+
+            assert not serializer.fields
+            assert mock_get_fields.called
+
+    def test_field_layout_cache_disabled(self, settings):
+        settings.SERIALIZER_FIELD_LAYOUT_CACHE = False
+        BaseTestSerializer()
+
+        with patch.object(BaseTestSerializer, 'get_fields', return_value={}) as mock_get_fields:
+            serializer = BaseTestSerializer()
+
+            assert not serializer.fields
+            assert mock_get_fields.called
+
 
 @pytest.mark.django_db
 class TestApiBaseModelSerializer:
@@ -1399,3 +1432,35 @@ class TestCompanyContactRenderSerializer:
         assert rel.termination_date == date(2018, 5, 5)
         assert rel.active
         assert mock_tasks.terminate_company_contact.apply_async.called
+
+
+class CreatedUpdatedBySerializer(CreatedUpdatedByMixin, ApiBaseModelSerializer):
+
+    class Meta:
+        fields = ('id', )
+        model = City
+
+
+class TestCreatedUpdatedByMixin:
+
+    @patch('r3sourcer.apps.core.api.mixins.endless_logger')
+    def test_created_by_prefetched_for_page(self, mock_logger, user, settings):
+        objects = [MockModel(id=1), MockModel(id=2)]
+        mock_logger.get_recent_fields_changes.return_value = {
+            '1': {'updated_by': str(user.id), 'updated_at': None},
+        }
+        serializer = CreatedUpdatedBySerializer(objects, many=True).child
+
+        assert serializer.get_created_by(objects[0]) == user.email
+        assert serializer.get_created_by(objects[1]) == settings.SYSTEM_USER
+        mock_logger.get_recent_fields_changes.assert_called_once_with(City, [1, 2], 'id', 'create')
+
+    @patch('r3sourcer.apps.core.api.mixins.endless_logger')
+    def test_updated_by_single_object(self, mock_logger, settings):
+        obj = MockModel(id=1)
+        mock_logger.get_recent_fields_changes.return_value = {
+            '1': {'updated_by': 'None', 'updated_at': None},
+        }
+
+        assert CreatedUpdatedBySerializer(obj).get_updated_by(obj) == settings.SYSTEM_USER
+        mock_logger.get_recent_fields_changes.assert_called_once_with(City, [1], 'updated_at', None)
@@ -3,7 +3,7 @@ import mock
 from django.db.models import Q
 
 from r3sourcer.apps.core.managers import TagManager
-from r3sourcer.apps.core.models import Tag, CompanyContact, Contact, Address
+from r3sourcer.apps.core.models import Tag, CompanyContact, Contact, Address, CompanyAddress, ContactAddress
 
 
 class TestManagers(object):
@@ -54,3 +54,31 @@ class TestAbstractObjectOwnerManager:
         lookups = Contact.objects.get_lookups(address.country)
 
         assert len(lookups) == 4
+
+    def test_get_lookups_paths_compiled_once(self, contact, address):
+        lookups = Contact.objects.get_lookups(address.country)
+
+        with mock.patch.object(Contact._meta, 'get_fields') as mock_get_fields:
+            cached_lookups = Contact.objects.get_lookups(address.country)
+
+        assert not mock_get_fields.called
+        assert [lookup.children for lookup in cached_lookups] == [lookup.children for lookup in lookups]
+
+    def test_owned_by_without_distinct(self, staff_company_contact, staff_relationship, company):
+        result = Contact.objects.owned_by(company)
+
+        assert not result.query.distinct
+        assert list(result) == [staff_company_contact.contact]
+
+    @mock.patch('r3sourcer.apps.core.managers.compile_related_lookups')
+    def test_related_lookups_skip_empty_direct_relation(self, mock_related_lookups, contact, contact_address):
+        mock_related_lookups.return_value = (
+            (CompanyAddress, 'address', True),
+            (ContactAddress, 'address', True),
+            (Contact, 'address', False),
+        )
+
+        lookups = Address.objects._get_obj_related_lookups(contact)
+
+        assert len(lookups) == 1
+        assert list(Address.objects.filter(lookups[0])) == [contact_address]
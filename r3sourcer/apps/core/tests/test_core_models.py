@@ -9,13 +9,14 @@ from datetime import date, datetime, timedelta
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
+from django.test import override_settings
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
 from freezegun import freeze_time
 
 from r3sourcer.apps.core.models import (
-    User, CompanyContact, BankAccount, CompanyAddress, ContactUnavailability,
+    User, Address, CompanyContact, BankAccount, CompanyAddress, ContactUnavailability,
     CompanyTradeReference, Note, Tag, InvoiceLine, FileStorage, Contact,
     Company, CompanyLocalization, Invoice, WorkflowNode,
     Workflow, SiteCompany, CompanyRel, CompanyContactRelationship
@@ -202,6 +203,28 @@ class TestAddress:
         assert address.latitude == 42
         assert address.longitude == 42
 
+    def test_time_zone_not_stored_by_default(self, address):
+        address.latitude, address.longitude = -33.8688, 151.2093
+        address.save()
+
+        assert address.time_zone is None
+
+    @override_settings(STORE_ADDRESS_TIME_ZONE=True)
+    def test_time_zone_stored(self, address):
+        address.latitude, address.longitude = -33.8688, 151.2093
+        address.save()
+
+        assert address.time_zone == 'Australia/Sydney'
+
+    @override_settings(STORE_ADDRESS_TIME_ZONE=True)
+    @mock.patch('r3sourcer.helpers.models.abs.timezone_models.geo_time_zone')
+    def test_stored_time_zone_used(self, mock_geo_time_zone, address):
+        address.latitude, address.longitude = -33.8688, 151.2093
+        address.save()
+
+        assert Address.objects.get(id=address.id).tz.zone == 'Australia/Sydney'
+        assert not mock_geo_time_zone.called
+
 
 @pytest.mark.django_db
 class TestCompanyContact:
@@ -323,6 +346,28 @@ class TestCompany:
         assert company in master_companies
         assert master_company in master_companies
 
+    def test_get_master_company_hierarchy_cached(self, company, company_rel, django_assert_num_queries):
+        regular_company = Company.objects.get(id=company_rel.regular_company.id)
+        regular_company.get_master_company()
+
+        with django_assert_num_queries(1):
+            assert regular_company.get_master_company() == [company]
+
+    def test_get_master_company_invalidated_on_rel_delete(self, company, company_rel):
+        regular_company = company_rel.regular_company
+        assert regular_company.get_master_company() == [company]
+
+        company_rel.delete()
+
+        assert regular_company.get_master_company() == []
+
+    def test_get_master_companies_map(self, company, company_rel):
+        regular_company = company_rel.regular_company
+
+        companies_map = Company.get_master_companies_map([company, regular_company])
+
+        assert companies_map == {company.id: [company], regular_company.id: [company]}
+
     def test_get_regular_companies_none(self, company):
         assert len(company.get_regular_companies()) == 0
 
@@ -635,6 +680,32 @@ class TestTemplateMessage:
         assert "user__email" in values_dict.keys()
         assert values_dict["user__email"] == user.email
 
+    def test_compile_string_resolves_shared_lookups_once(self, email_test_message_template):
+        get_contact = mock.Mock(return_value={'first_name': 'John', 'last_name': 'Smith'})
+        params = {
+            'user': mock.Mock(get_contact=get_contact),
+        }
+        compiled, = email_test_message_template.compile_string(
+            'Hello [[user__get_contact__first_name]] [[ user__get_contact__last_name ]] [[unknown]]',
+            **params
+        )
+
+        assert compiled == 'Hello John Smith [[unknown]]'
+        assert get_contact.call_count == 1
+
+    def test_compiled_template_cached(self, email_test_message_template):
+        email_test_message_template._state.adding = False
+        email_test_message_template.updated_at = timezone.now()
+
+        compiled = email_test_message_template.get_compiled_template()
+
+        assert email_test_message_template.get_compiled_template() is compiled
+
+        email_test_message_template.message_text_template = 'Bye [[user]]'
+
+        assert email_test_message_template.get_compiled_template() is not compiled
+        assert email_test_message_template.compile(user='John')['text'] == 'Bye John'
+
 
 @pytest.mark.django_db
 class TestWorkflowNode:
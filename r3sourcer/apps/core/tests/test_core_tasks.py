@@ -3,7 +3,7 @@ import pytest
 
 from r3sourcer.apps.core.models import CurrencyExchangeRates
 from r3sourcer.apps.core.open_exchange.client import OpenExchangeClient
-from r3sourcer.apps.core.tasks import exchange_rates_sync
+from r3sourcer.apps.core.tasks import exchange_rates_sync, memcache_lock
 
 
 @pytest.mark.django_db
@@ -32,3 +32,19 @@ class TestExchangeRateSync:
         exchange_rates_sync()
 
         assert not CurrencyExchangeRates.objects.exists()
+
+
+class TestMemcacheLock:
+
+    def test_skipped_run_keeps_lock(self):
+        with memcache_lock('lock:test', 'first') as first_acquired:
+            with memcache_lock('lock:test', 'second') as second_acquired:
+                assert not second_acquired
+
+            with memcache_lock('lock:test', 'third') as third_acquired:
+                assert not third_acquired
+
+        assert first_acquired
+
+        with memcache_lock('lock:test', 'fourth') as acquired:
+            assert acquired
@@ -1,12 +1,17 @@
 import mock
 import pytest
 import googlemaps
+from django.conf import settings
 from django.core.exceptions import ValidationError
 
 from r3sourcer.apps.core.models import CompanyContactRelationship
 from r3sourcer.apps.core.utils.companies import get_closest_companies, get_master_companies
-from r3sourcer.apps.core.utils.geo import fetch_geo_coord_by_address, calc_distance
+from r3sourcer.apps.core.utils.geo import (
+    fetch_geo_coord_by_address, calc_distance, GeoPoint, HaversineDistanceProvider, GoogleDistanceProvider,
+    get_bounding_box, haversine_distance,
+)
 from r3sourcer.apps.core.utils.validators import string_is_numeric
+from r3sourcer.helpers.datetimes import _find_time_zone_name, geo_time_zone
 
 
 class TestGeo:
@@ -95,6 +100,56 @@ class TestGeo:
         assert res == []
 
 
+class TestDistanceProviders:
+
+    def test_haversine_provider(self):
+        origin = GeoPoint('origin', -33.86, 151.20)
+        destinations = [GeoPoint('destination', -33.87, 151.21), GeoPoint('unknown', 0, 0)]
+
+        result = HaversineDistanceProvider().get_distances(origin, destinations)
+
+        assert 1000 < result[0]['distance'] < 2000
+        assert result[0]['duration'] > 0
+        assert result[1] == {'distance': None, 'duration': None}
+
+    @mock.patch('r3sourcer.apps.core.utils.geo.googlemaps.Client')
+    def test_google_provider_single_destination(self, mock_googlemaps):
+        mock_googlemaps.return_value.distance_matrix.return_value = {
+            'rows': [{'elements': [{
+                'status': 'OK',
+                'distance': {'value': 1535427, 'text': '1,535 km'},
+                'duration': {'value': 87821, 'text': '1 day 0 hours'}
+            }]}],
+        }
+
+        result = GoogleDistanceProvider('key').get_distances(
+            GeoPoint('origin', 0, 0), [GeoPoint('destination', 0, 0)]
+        )
+
+        assert result == [{'distance': 1535427, 'duration': 87821}]
+
+    def test_bounding_box_contains_radius(self):
+        min_latitude, max_latitude, min_longitude, max_longitude = get_bounding_box(-33.86, 151.20, 10000)
+
+        assert haversine_distance(-33.86, 151.20, max_latitude, 151.20) == pytest.approx(10000, rel=1e-3)
+        assert haversine_distance(-33.86, 151.20, -33.86, min_longitude) == pytest.approx(10000, rel=1e-3)
+
+
+class TestGeoTimeZone:
+
+    def test_time_zone_cached_by_rounded_coordinates(self):
+        _find_time_zone_name.cache_clear()
+
+        with mock.patch.object(
+            settings.TIME_ZONE_FINDER, 'timezone_at', return_value='Australia/Sydney'
+        ) as mock_timezone_at:
+            assert geo_time_zone(151.20931, -33.86881).zone == 'Australia/Sydney'
+            assert geo_time_zone(151.20929, -33.86879).zone == 'Australia/Sydney'
+
+        assert mock_timezone_at.call_count == 1
+        _find_time_zone_name.cache_clear()
+
+
 class TestCompanies:
     def test_get_closest_companies(self, staff_user, staff_relationship):
         request = mock
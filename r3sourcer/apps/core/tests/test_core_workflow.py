@@ -4,8 +4,9 @@ import uuid
 
 from r3sourcer.apps.core.models import WorkflowNode, WorkflowObject, Company
 from r3sourcer.apps.core.workflow import (
-    WorkflowProcess, CompanyRelState60, OrderState50, OrderState90
+    WorkflowProcess, WorkflowGraph, CompanyRelState60, OrderState50, OrderState90
 )
+from django.db.models import Q
 from django_mock_queries.query import MockSet, MockModel
 from django.utils.translation import ugettext_lazy as _
 
@@ -150,6 +151,49 @@ class TestWorkflowProcess:
 
         assert wp_active_states.count() == 0
 
+    def test_active_states_lazy(self):
+        with mock.patch.object(WorkflowProcess, 'get_active_states') as mock_active_states:
+            process = WorkflowProcess()
+
+            assert not mock_active_states.called
+            assert process.active_states == mock_active_states.return_value
+            assert mock_active_states.call_count == 1
+
+    @mock.patch.object(WorkflowObject, 'objects', new_callable=mock.PropertyMock)
+    def test_prefetch_active_states(self, mock_objects, workflow_proc):
+        other_proc = WorkflowProcess()
+        other_proc.id = 2
+        workflow_objects = [MockModel(object_id=1, state=self.get_node(20), state_company_id=None, created_at=1),
+                            MockModel(object_id=1, state=self.get_node(10), state_company_id=None, created_at=2)]
+        mock_qs = mock_objects.return_value.filter.return_value
+        mock_qs.annotate.return_value.select_related.return_value.order_by.return_value = workflow_objects
+
+        with mock.patch.object(WorkflowProcess, 'get_closest_company', return_value=None), \
+                mock.patch.object(WorkflowProcess, 'content_type', new_callable=mock.PropertyMock) as mock_content:
+            mock_content.return_value = 1
+            WorkflowProcess.prefetch_active_states([workflow_proc, other_proc])
+
+        companies_qry = Q(state__company_workflow_nodes__company__in=set()) | \
+            Q(state__company_workflow_nodes__company__isnull=True)
+        mock_objects.return_value.filter.assert_called_once_with(
+            companies_qry, object_id__in=[1, 2], state__workflow__model=1, active=True
+        )
+        assert workflow_proc.get_active_states_list() == workflow_objects
+        assert workflow_proc.get_current_state() == self.get_node(10)
+        assert other_proc.get_active_states_list() == []
+        assert other_proc.get_current_state() is None
+
+    @mock.patch.object(WorkflowObject, 'objects', new_callable=mock.PropertyMock)
+    def test_prefetch_active_states_other_company(self, mock_objects, workflow_proc):
+        workflow_objects = [MockModel(object_id=1, state=self.get_node(20), state_company_id=2, created_at=1)]
+        mock_qs = mock_objects.return_value.filter.return_value
+        mock_qs.annotate.return_value.select_related.return_value.order_by.return_value = workflow_objects
+
+        with mock.patch.object(WorkflowProcess, 'get_closest_company', return_value=MockModel(pk=1)):
+            WorkflowProcess.prefetch_active_states([workflow_proc])
+
+        assert workflow_proc.get_active_states_list() == []
+
     @mock.patch.object(WorkflowObject, 'objects',
                        new_callable=mock.PropertyMock)
     def test_get_current_state(self, mock_objects, workflow_proc):
@@ -413,6 +457,28 @@ class TestWorkflowProcess:
             object_id=uid, state__number=200, active=True
         ).exists()
 
+    def test_check_state_evaluated_in_memory(self, workflow_process):
+        with workflow_process._evaluate_states({10}):
+            assert workflow_process._check_state(10)
+            assert not workflow_process._check_state(20)
+
+        assert '_evaluated_state_numbers' not in workflow_process.__dict__
+
+    def test_workflow_graph_cached(self, workflow_ct, django_assert_num_queries):
+        WorkflowGraph.get(workflow_ct)
+
+        with django_assert_num_queries(0):
+            graph = WorkflowGraph.get(workflow_ct)
+
+        assert graph.get_node(10).number == 10
+
+    def test_workflow_graph_invalidated_on_node_save(self, workflow_ct):
+        node = WorkflowGraph.get(workflow_ct).get_node(10)
+        node.name_before_activation = 'Changed'
+        node.save()
+
+        assert WorkflowGraph.get(workflow_ct).get_node(10).name_before_activation == 'Changed'
+
 
 class TestCompanyRelState60:
 
@@ -1,3 +1,4 @@
+import uuid
 from urllib.parse import urlparse
 
 from django.contrib.sites.shortcuts import get_current_site
@@ -85,3 +86,104 @@ def get_site_master_company(site=None, request=None, user=None, default=True):
     site_company = site.site_companies.filter(company__type=Company.COMPANY_TYPES.master).first()
 
     return site_company and site_company.company
+
+
+COMPANY_HIERARCHY_VERSION_KEY = 'company_hierarchy_version'
+COMPANY_HIERARCHY_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def get_company_hierarchy_version():
+    version = cache.get(COMPANY_HIERARCHY_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(COMPANY_HIERARCHY_VERSION_KEY, version, None)
+
+    return version
+
+
+def invalidate_company_hierarchy(*args, **kwargs):
+    cache.set(COMPANY_HIERARCHY_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def _load_company_closure(company_ids, terminal_type, from_field, to_field):
+    """
+    Walks company relationships level by level from the companies to the companies of `terminal_type`.
+    Makes one query for company types and one query per hierarchy level.
+    """
+    from r3sourcer.apps.core.models import Company, CompanyRel
+
+    company_types = dict(Company.objects.filter(id__in=company_ids).values_list('id', 'type'))
+    links = {}
+
+    to_load = {company_id for company_id, company_type in company_types.items() if company_type != terminal_type}
+    while to_load:
+        rels = CompanyRel.objects.filter(**{'{}__in'.format(from_field): to_load}).values_list(
+            from_field, to_field, '{}__type'.format(to_field.rsplit('_', 1)[0])
+        )
+
+        to_load = set()
+        for from_id, to_id, to_type in rels:
+            links.setdefault(from_id, []).append(to_id)
+            if to_id not in company_types:
+                company_types[to_id] = to_type
+                if to_type != terminal_type:
+                    to_load.add(to_id)
+
+    def resolve(company_id, visited):
+        if company_types.get(company_id) == terminal_type:
+            return [company_id]
+
+        resolved = []
+        for linked_id in links.get(company_id, []):
+            if linked_id not in visited:
+                resolved.extend(resolve(linked_id, visited | {linked_id}))
+
+        return resolved
+
+    return {company_id: resolve(company_id, {company_id}) for company_id in company_ids}
+
+
+def _get_company_closure(company_ids, direction, terminal_type, from_field, to_field):
+    version = get_company_hierarchy_version()
+    cache_keys = {
+        company_id: 'company_hierarchy_{}_{}_{}'.format(direction, version, company_id)
+        for company_id in company_ids
+    }
+
+    cached = cache.get_many(cache_keys.values())
+    closure = {
+        company_id: cached[cache_key] for company_id, cache_key in cache_keys.items() if cache_key in cached
+    }
+
+    missing_ids = [company_id for company_id in company_ids if company_id not in closure]
+    if missing_ids:
+        loaded = _load_company_closure(missing_ids, terminal_type, from_field, to_field)
+        cache.set_many(
+            {cache_keys[company_id]: ids for company_id, ids in loaded.items()},
+            COMPANY_HIERARCHY_CACHE_TIMEOUT
+        )
+        closure.update(loaded)
+
+    return closure
+
+
+def get_master_company_ids(company_ids):
+    """
+    Gets cached list of master company ids for every company id
+    """
+    from r3sourcer.apps.core.models import Company
+
+    return _get_company_closure(
+        company_ids, 'master', Company.COMPANY_TYPES.master, 'regular_company_id', 'master_company_id'
+    )
+
+
+def get_regular_company_ids(company_ids):
+    """
+    Gets cached list of regular company ids for every company id
+    """
+    from r3sourcer.apps.core.models import Company
+
+    return _get_company_closure(
+        company_ids, 'regular', Company.COMPANY_TYPES.regular, 'master_company_id', 'regular_company_id'
+    )
@@ -1,3 +1,5 @@
+import math
+from collections import namedtuple
 from time import sleep
 from datetime import datetime, date, time
 
@@ -5,12 +7,16 @@ import googlemaps
 import googlemaps.exceptions
 
 from django.conf import settings
+from django.utils.module_loading import import_string
 
 from r3sourcer.helpers.datetimes import utc_now
 
 MODE_DRIVING = 'driving'
 MODE_TRANSIT = 'transit'
 MAX_DIMENSIONS = 25
+EARTH_RADIUS = 6371000
+
+GeoPoint = namedtuple('GeoPoint', ['address', 'latitude', 'longitude'])
 
 
 class GMapsException(Exception):
@@ -243,3 +249,90 @@ def calc_distance(origins, destinations, mode=None):
         return None if e.code == GMapsException.INVALID_REQUEST[1] else []
     except ValueError:
         return None
+
+
+def haversine_distance(latitude1, longitude1, latitude2, longitude2):
+    """
+    Great-circle distance in meters between two points
+    """
+    latitude1, longitude1, latitude2, longitude2 = map(
+        math.radians, map(float, (latitude1, longitude1, latitude2, longitude2))
+    )
+    a = (
+        math.sin((latitude2 - latitude1) / 2) ** 2 +
+        math.cos(latitude1) * math.cos(latitude2) * math.sin((longitude2 - longitude1) / 2) ** 2
+    )
+
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+def get_bounding_box(latitude, longitude, radius):
+    """
+    Coordinates range containing all points within the radius in meters from the point
+    :return tuple(float, float, float, float): min latitude, max latitude, min longitude, max longitude
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    delta_latitude = math.degrees(radius / EARTH_RADIUS)
+    # longitude degrees shrink towards the poles
+    delta_longitude = math.degrees(radius / (EARTH_RADIUS * max(math.cos(math.radians(latitude)), 0.01)))
+
+    return (
+        latitude - delta_latitude, latitude + delta_latitude,
+        longitude - delta_longitude, longitude + delta_longitude,
+    )
+
+
+class GoogleDistanceProvider(object):
+    """
+    Distance matrix provider backed by Google Distance Matrix API.
+
+    `get_distances` returns list of {"distance", "duration"} dicts in order of destinations
+    and raises GMapsException if distances can't be calculated.
+    """
+
+    max_dimensions = MAX_DIMENSIONS
+
+    def __init__(self, key=None):
+        self._client = GMaps(key=key or settings.GOOGLE_DISTANCE_MATRIX_API_KEY)
+
+    def get_distances(self, origin, destinations, mode=None):
+        result = self._client.get_distance(origin.address, [point.address for point in destinations], mode)
+        # single element rows are unwrapped by GMaps
+        row = result[0] if result else []
+
+        return row if isinstance(row, list) else [row]
+
+
+class HaversineDistanceProvider(object):
+    """
+    Offline distance matrix provider.
+
+    Distance is the straight line between coordinates and duration is estimated with average speed
+    of the travel mode. Used in tests and in environments without Distance Matrix API key.
+    """
+
+    max_dimensions = MAX_DIMENSIONS
+    SPEEDS = {
+        MODE_DRIVING: 50,
+        MODE_TRANSIT: 25,
+    }
+
+    def get_distances(self, origin, destinations, mode=None):
+        speed = self.SPEEDS.get(mode or MODE_DRIVING) * 1000 / 3600
+
+        result = []
+        for point in destinations:
+            if not (point.latitude and point.longitude):
+                result.append({"distance": None, "duration": None})
+                continue
+
+            distance = haversine_distance(origin.latitude, origin.longitude, point.latitude, point.longitude)
+            result.append({"distance": int(distance), "duration": int(distance / speed)})
+
+        return result
+
+
+def get_distance_provider(provider_class=None, *args, **kwargs):
+    provider_class = provider_class or settings.DISTANCE_MATRIX_PROVIDER_CLASS
+
+    return import_string(provider_class)(*args, **kwargs)
@@ -1,4 +1,9 @@
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.utils.translation import ugettext_lazy as _
 from django.db import models
 from django.core.exceptions import ObjectDoesNotExist
@@ -9,42 +14,213 @@ from .utils.companies import get_site_master_company
 
 NEED_REQUIREMENTS, ALLOWED, ACTIVE, VISITED, NOT_ALLOWED = range(5)
 
+WORKFLOW_GRAPH_VERSION_KEY = 'workflow_graph_version'
+WORKFLOW_GRAPH_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def get_workflow_graph_version():
+    version = cache.get(WORKFLOW_GRAPH_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(WORKFLOW_GRAPH_VERSION_KEY, version, None)
+
+    return version
+
+
+def invalidate_workflow_graphs(*args, **kwargs):
+    cache.set(WORKFLOW_GRAPH_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+class WorkflowGraph:
+    """
+    Workflow nodes of the model available for the company.
+
+    `nodes_by_number` contains the first node of every state number of the model workflow
+    and `company_nodes` contains the nodes switched on for the company.
+    """
+
+    def __init__(self, nodes_by_number, company_nodes):
+        self.nodes_by_number = nodes_by_number
+        self.company_nodes = company_nodes
+
+    def get_node(self, number):
+        return self.nodes_by_number.get(number)
+
+    def get_company_node(self, number):
+        return self.company_nodes.get(number)
+
+    @classmethod
+    def get_cache_key(cls, content_type, company=None, version=None):
+        return 'workflow_graph_{}_{}_{}'.format(
+            version or get_workflow_graph_version(), content_type.pk, company.pk if company else None
+        )
+
+    @classmethod
+    def get(cls, content_type, company=None):
+        cache_key = cls.get_cache_key(content_type, company)
+        graph = cache.get(cache_key)
+
+        if graph is None:
+            graph = cls.load(content_type, company)
+            cache.set(cache_key, graph, WORKFLOW_GRAPH_CACHE_TIMEOUT)
+
+        return graph
+
+    @classmethod
+    def load(cls, content_type, company=None):
+        from .models import WorkflowNode
+
+        nodes_by_number = {}
+        for node in WorkflowNode.objects.filter(workflow__model=content_type).order_by('pk'):
+            nodes_by_number.setdefault(node.number, node)
+
+        company_nodes = {}
+        if company is not None:
+            company_nodes = {
+                node.number: node for node in WorkflowNode.objects.filter(
+                    workflow__model=content_type, company_workflow_nodes__company=company
+                ).order_by('number')
+            }
+
+        return cls(nodes_by_number, company_nodes)
+
 
 class WorkflowProcess(CompanyLookupMixin, models.Model):
+    # lookup path to the object which closest company is the closest company of this object
+    closest_company_relation = None
+
     class Meta:
         abstract = True
 
     def __init__(self, *args, **kwargs):
-        is_fake = kwargs.pop('fake_wf', False)
+        kwargs.pop('fake_wf', False)
 
         super(WorkflowProcess, self).__init__(*args, **kwargs)
 
-        if not is_fake:
+    @property
+    def active_states(self):
+        """
+        Queryset of the active states, closest company is resolved on the first access
+        """
+        if '_active_states' not in self.__dict__:
             try:
-                self.active_states = self.get_active_states()
+                self._active_states = self.get_active_states()
             except ObjectDoesNotExist:
-                self.active_states = None
+                self._active_states = None
+
+        return self._active_states
+
+    @active_states.setter
+    def active_states(self, value):
+        self._active_states = value
+        self.__dict__.pop('_prefetched_active_states', None)
 
     @property
     def content_type(self):
         return ContentType.objects.get_for_model(self)
 
+    @classmethod
+    def get_closest_company_ids(cls, objects):
+        """
+        Resolves closest companies of the objects.
+        Objects with `closest_company_relation` are resolved in bulk through the related model,
+        other objects fall back to `get_closest_company` of every object.
+
+        :param objects: list of saved objects of the model
+        :return: dict of object pk to closest company pk
+        """
+        if cls.closest_company_relation is None:
+            company_ids = {}
+            for obj in objects:
+                try:
+                    company = obj.get_closest_company()
+                except ObjectDoesNotExist:
+                    company = None
+
+                company_ids[obj.pk] = company and company.pk
+
+            return company_ids
+
+        related_model = cls
+        for field_name in cls.closest_company_relation.split('__'):
+            related_model = related_model._meta.get_field(field_name).related_model
+
+        related_ids = dict(cls.objects.filter(pk__in=[obj.pk for obj in objects]).values_list(
+            'pk', cls.closest_company_relation
+        ))
+        related_objects = related_model.objects.in_bulk({pk for pk in related_ids.values() if pk is not None})
+        related_company_ids = related_model.get_closest_company_ids(list(related_objects.values()))
+
+        return {obj.pk: related_company_ids.get(related_ids.get(obj.pk)) for obj in objects}
+
+    @classmethod
+    def prefetch_active_states(cls, objects):
+        """
+        Loads active states of the objects with one query keyed by object id,
+        closest companies are resolved in bulk by `get_closest_company_ids`
+
+        :param objects: list of WorkflowProcess objects
+        """
+        from .models import WorkflowObject
+
+        saved_objects = []
+        for obj in objects:
+            if obj.pk is None:
+                obj._prefetched_active_states = []
+            else:
+                saved_objects.append(obj)
+
+        if not saved_objects:
+            return
+
+        company_ids = cls.get_closest_company_ids(saved_objects)
+        companies_qry = models.Q(state__company_workflow_nodes__company__in={
+            company_id for company_id in company_ids.values() if company_id is not None
+        })
+        if None in company_ids.values():
+            companies_qry |= models.Q(state__company_workflow_nodes__company__isnull=True)
+
+        # company of the state node is selected to match it with the closest company of the object
+        workflow_objects = WorkflowObject.objects.filter(
+            companies_qry,
+            object_id__in=[obj.pk for obj in saved_objects],
+            state__workflow__model=saved_objects[0].content_type,
+            active=True
+        ).annotate(
+            state_company_id=models.F('state__company_workflow_nodes__company')
+        ).select_related('state').order_by('-state__number')
+
+        object_states = defaultdict(list)
+        for workflow_object in workflow_objects:
+            states = object_states[workflow_object.object_id]
+            if workflow_object.state_company_id == company_ids.get(workflow_object.object_id) and \
+                    workflow_object not in states:
+                states.append(workflow_object)
+
+        for obj in saved_objects:
+            obj._prefetched_active_states = object_states[obj.pk]
+
+    def get_active_states_list(self):
+        """
+        Gets list of the active states, uses states loaded by `prefetch_active_states` if exist
+        :return: list of the states
+        """
+        if '_prefetched_active_states' in self.__dict__:
+            return self._prefetched_active_states
+
+        return list(self.get_active_states())
+
     def create_state(self, number, comment='', active=True):
         """
         Creates state by number
         :param number: int number of the state
         :param comment: str comment to state
         """
-        from .models import WorkflowObject, WorkflowNode
-        kwargs = {
-            'number': number,
-            'workflow__model': self.content_type,
-            'company_workflow_nodes__company': self.get_closest_company(),
-        }
-        if not WorkflowNode.objects.filter(**kwargs).exists():
-            kwargs['company_workflow_nodes__company'] = get_site_master_company()
+        from .models import WorkflowObject
 
-        state = WorkflowNode.objects.filter(**kwargs).first()
+        state = WorkflowGraph.get(self.content_type, self.get_closest_company()).get_company_node(number)
+        if state is None:
+            state = WorkflowGraph.get(self.content_type, get_site_master_company()).get_company_node(number)
 
         if state:
             workflow_object = WorkflowObject(object_id=self.id, state=state, comment=comment, active=active)
@@ -111,6 +287,11 @@ class WorkflowProcess(CompanyLookupMixin, models.Model):
         :return: last state
         """
         from .models import WorkflowObject
+
+        if '_prefetched_active_states' in self.__dict__:
+            states = self._prefetched_active_states
+            return max(states, key=lambda state: state.created_at).state if states else None
+
         try:
             result = WorkflowObject.objects.filter(
                 object_id=self.id, state__workflow__model=self.content_type, active=True,
@@ -170,8 +351,38 @@ class WorkflowProcess(CompanyLookupMixin, models.Model):
         Checks if state number is in active states of object
         :param state: int value of the state
         """
+        active_numbers = self.__dict__.get('_evaluated_state_numbers')
+        if active_numbers is not None:
+            return state in active_numbers
+
         return self.active_states.filter(state__number=state).exists()
 
+    def get_active_state_numbers(self):
+        """
+        Gets set of the active state numbers with one query
+        """
+        if '_prefetched_active_states' in self.__dict__:
+            return {state.state.number for state in self._prefetched_active_states}
+
+        if self.active_states is None:
+            return set()
+
+        return set(self.active_states.values_list('state__number', flat=True))
+
+    @contextmanager
+    def _evaluate_states(self, active_numbers=None):
+        """
+        Checks rule states against in-memory set of the active state numbers inside of the block
+        """
+        if active_numbers is None:
+            active_numbers = self.get_active_state_numbers()
+
+        self._evaluated_state_numbers = active_numbers
+        try:
+            yield active_numbers
+        finally:
+            self.__dict__.pop('_evaluated_state_numbers', None)
+
     def _check_function(self, func):
         """
         Checks if object has passed function and it returns positive value
@@ -185,27 +396,23 @@ class WorkflowProcess(CompanyLookupMixin, models.Model):
         :param new_state: WorkflowNode value of new state
         :return: True or False
         """
-        from .models import WorkflowNode, WorkflowObject
         if isinstance(new_state, int):
-            new_state = WorkflowNode.objects.filter(
-                workflow__model=ContentType.objects.get_for_model(self),
-                number=new_state
-            ).first()
+            new_state = WorkflowGraph.get(self.content_type).get_node(new_state)
 
-        active_numbers = self.active_states.values_list(
-            'state__number', flat=True
-        )
-
-        if new_state is None or new_state.number in active_numbers:
+        if new_state is None:
             return False
 
-        result = True
-        ns_rule = new_state.rules
-        if ns_rule and "required_states" in ns_rule.keys():
-            result = self._check_condition(ns_rule["required_states"])
-        if ns_rule and "required_functions" in ns_rule.keys():
-            result = result and self._check_condition(ns_rule["required_functions"])
-        return result
+        with self._evaluate_states() as active_numbers:
+            if new_state.number in active_numbers:
+                return False
+
+            result = True
+            ns_rule = new_state.rules
+            if ns_rule and "required_states" in ns_rule.keys():
+                result = self._check_condition(ns_rule["required_states"])
+            if ns_rule and "required_functions" in ns_rule.keys():
+                result = result and self._check_condition(ns_rule["required_functions"])
+            return result
 
     def _get_or_message(self, rules, new_state):
         return _(" or ").join([self._get_message_for_condition(rule, new_state) for rule in rules
@@ -243,13 +450,10 @@ class WorkflowProcess(CompanyLookupMixin, models.Model):
             return str(func)
 
     def _get_state_name(self, state_number):
-        from .models.workflow import WorkflowNode
+        node = WorkflowGraph.get(self.content_type).get_node(state_number)
 
-        if WorkflowNode.objects.filter(
-                workflow__model=self.content_type, number=state_number).exists():
-            return WorkflowNode.objects \
-                .filter(workflow__model=self.content_type, number=state_number) \
-                .first().name_before_activation
+        if node is not None:
+            return node.name_before_activation
         else:
             return str(state_number)
 
@@ -269,18 +473,20 @@ class WorkflowProcess(CompanyLookupMixin, models.Model):
             checks = ['required_functions']
             if require_states:
                 checks.append('required_states')
-            for requirement in checks:
-                if requirement in ns_rule.keys():
-                    part = self._get_message_for_condition(
-                        ns_rule[requirement], new_state)
-                    if not part:
-                        continue
-
-                    verb = _("are") \
-                        if " or " in part or " and " in part else _("is")
-                    messages.append(_("{} {} required.").format(
-                        part, verb
-                    ))
+
+            with self._evaluate_states():
+                for requirement in checks:
+                    if requirement in ns_rule.keys():
+                        part = self._get_message_for_condition(
+                            ns_rule[requirement], new_state)
+                        if not part:
+                            continue
+
+                        verb = _("are") \
+                            if " or " in part or " and " in part else _("is")
+                        messages.append(_("{} {} required.").format(
+                            part, verb
+                        ))
 
         return messages
 
@@ -345,8 +551,7 @@ class WorkflowProcess(CompanyLookupMixin, models.Model):
         """
         available_states = []
         self.active_states = self.get_active_states()
-
-        from .models.workflow import WorkflowNode
+        active_state_ids = set(self.active_states.values_list('state__id', flat=True))
 
         self_nodes = self._get_companies_nodes(self.get_closest_company())
         default_nodes = self._get_companies_nodes(get_site_master_company())
@@ -354,21 +559,13 @@ class WorkflowProcess(CompanyLookupMixin, models.Model):
         all_nodes = list(self_nodes.values())
         all_nodes.extend(value for key, value in default_nodes.items() if key not in self_nodes.keys())
 
-        for state in WorkflowNode.objects.filter(id__in=all_nodes):
-            if not self.active_states.filter(state=state).exists() and self.is_allowed(state):
+        for state in all_nodes:
+            if state.id not in active_state_ids and self.is_allowed(state):
                 available_states.append(state)
         return available_states
 
     def _get_companies_nodes(self, company):
-
-        from .models.workflow import WorkflowNode
-        nodes = {}
-        for node in WorkflowNode.objects.filter(
-            workflow__model=self.content_type,
-            company_workflow_nodes__company=company
-        ).order_by('number'):
-            nodes[node.number] = node.id
-        return nodes
+        return dict(WorkflowGraph.get(self.content_type, company).company_nodes)
 
     def before_state_creation(self, workflow_object):
         """
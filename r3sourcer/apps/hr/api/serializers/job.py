@@ -570,7 +570,7 @@ class JobFillinSerialzier(FillinAvailableMixin, core_serializers.ApiBaseModelSer
         return hourly_rate
 
     def get_favourite(self, obj):
-        return obj.id in self.context['favourite_list']
+        return obj.favourite
 
     # def get_overpriced(self, obj):
     #     return obj.id in self.context['overpriced']
@@ -590,19 +590,13 @@ class JobFillinSerialzier(FillinAvailableMixin, core_serializers.ApiBaseModelSer
     #     return 0
 
     def get_tags(self, obj):
-        job_tags = self.context['job'].tags
-        job_tags_ids = job_tags.values_list('tag_id', flat=True)
-
-        existing = obj.tag_rels.exclude(tag_id__in=job_tags_ids).values_list('tag__name', flat=True)
-        required = obj.tag_rels.filter(tag_id__in=job_tags_ids).values_list('tag__name', flat=True)
-        missing = job_tags.exclude(
-            tag_id__in=obj.tag_rels.values_list('tag_id', flat=True)
-        ).values_list('tag__name', flat=True)
+        job_tags = self.context['job_tags']
+        candidate_tags = {tag_rel.tag_id: tag_rel.tag.name for tag_rel in obj.tag_rels.all()}
 
         return {
-            'required': required,
-            'missing': missing,
-            'existing': existing,
+            'required': [name for tag_id, name in candidate_tags.items() if tag_id in job_tags],
+            'missing': [name for tag_id, name in job_tags.items() if tag_id not in candidate_tags],
+            'existing': [name for tag_id, name in candidate_tags.items() if tag_id not in job_tags],
         }
 
 
@@ -8,7 +8,10 @@ from functools import reduce
 from django.conf import settings
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
 from django.db import transaction
-from django.db.models import Q, Case, When, BooleanField, Value, IntegerField, F, Sum, Max, Min, Count
+from django.db.models import (
+    Q, Case, When, BooleanField, Value, IntegerField, F, Sum, Max, Min, Exists, OuterRef, Subquery
+)
+from django.db.models.functions import Coalesce
 from django.utils import dateparse
 from django.utils.formats import date_format
 from django.utils.translation import ugettext_lazy as _
@@ -34,7 +37,9 @@ from r3sourcer.apps.hr.api.filters import TimesheetFilter, ShiftFilter
 from r3sourcer.apps.hr.api.serializers import timesheet as timesheet_serializers, job as job_serializers
 from r3sourcer.apps.hr.payment.invoices import InvoiceService
 from r3sourcer.apps.hr.tasks import generate_invoice
-from r3sourcer.apps.hr.utils import job as job_utils, utils as hr_utils
+from r3sourcer.apps.hr.utils import (
+    job as job_utils, utils as hr_utils, booking as booking_utils, distances as distance_utils
+)
 from r3sourcer.apps.myob.tasks import sync_time_sheet
 from r3sourcer.helpers.datetimes import utc_now
 
@@ -131,7 +136,8 @@ class TimeSheetViewset(BaseTimeSheetViewsetMixin, BaseApiViewset):
     def get_queryset(self):
         query = Q(job_offer__candidate_contact__candidate_rels__master_company=self.request.user.contact.get_closest_company(),
                   job_offer__candidate_contact__candidate_rels__owner=True)
-        qs = super().get_queryset().filter(query)
+        # time zone of the timesheets is read from the selected jobsite address
+        qs = super().get_queryset().filter(query).select_related(hr_models.TimeSheet.geo_address_path)
         ordering = self.request.query_params.get('ordering', '-shift_started_at')
         if ordering:
             ordering_fields = [param.strip() for param in ordering.split(',')]
@@ -153,7 +159,9 @@ class TimeSheetViewset(BaseTimeSheetViewsetMixin, BaseApiViewset):
     def get_unapproved_queryset(self, request):
         contact, company_contact_rel = self.get_contact()
         qs_unapproved = TimesheetFilter.get_filter_for_unapproved(contact)
-        queryset = hr_models.TimeSheet.objects.filter(qs_unapproved)
+        queryset = hr_models.TimeSheet.objects.filter(qs_unapproved).select_related(
+            hr_models.TimeSheet.geo_address_path
+        )
 
         if company_contact_rel:
             queryset = queryset.filter(job_offer__shift__date__job__customer_company=company_contact_rel.company)
@@ -669,18 +677,14 @@ class JobViewset(BaseApiViewset):
         # )
 
         company_contacts = request.user.contact.company_contact.all()
-        if company_contacts.exists():
-            favourite_list = list(candidate_contacts.filter(
-                Q(favouritelists__job=job) |
-                Q(favouritelists__jobsite=job.jobsite) |
-                Q(favouritelists__company=job.customer_company) |
-                Q(favouritelists__job__isnull=True,
-                  favouritelists__jobsite__isnull=True,
-                  favouritelists__company__isnull=True),
-                favouritelists__company_contact__in=company_contacts
-            ).values_list('id', flat=True).distinct())
-        else:
-           favourite_list = []
+        favourite_lists = hr_models.FavouriteList.objects.filter(
+            Q(job=job) |
+            Q(jobsite=job.jobsite) |
+            Q(company=job.customer_company) |
+            Q(job__isnull=True, jobsite__isnull=True, company__isnull=True),
+            candidate_contact=OuterRef('pk'),
+            company_contact__in=company_contacts,
+        )
 
         # booked_before_list = list(candidate_contacts.filter(
         #     job_offers__in=job.get_job_offers().values('id'),
@@ -702,35 +706,40 @@ class JobViewset(BaseApiViewset):
         #         )
         #     )
 
-        job_tags = job.tags.values_list('tag_id', flat=True)
+        job_tags = dict(job.tags.values_list('tag_id', 'tag__name'))
+
+        jobsite_address = job.jobsite.get_address()
+        is_jobsite_located = bool(jobsite_address and (jobsite_address.latitude or jobsite_address.longitude))
+
+        # cheap coordinates pre-filter before the cached road distance
+        restrict_radius = int(request.GET.get('distance_to_jobsite', -1))
+        if restrict_radius > -1 and is_jobsite_located:
+            candidate_contacts = distance_utils.filter_contacts_near(
+                candidate_contacts, jobsite_address, restrict_radius * 1000
+            )
+
+        # timesheet stats are materialized in CandidateStats, distance is unique per contact and jobsite
+        distance_caches = hr_models.ContactJobsiteDistanceCache.objects.filter(
+            contact=OuterRef('contact'), jobsite=job.jobsite
+        )
+        distances = [Subquery(distance_caches.values('distance')[:1])]
+        if is_jobsite_located:
+            # straight line estimate for contacts without cached distance
+            distances.append(distance_utils.get_estimated_distance(jobsite_address))
 
         candidate_contacts = candidate_contacts.annotate(
-            distance_to_jobsite=Max(Case(
-                When(contact__distance_caches__jobsite=job.jobsite,
-                     then='contact__distance_caches__distance'),
-                default=-1
-            )),
-            time_to_jobsite=Max(Case(
-                When(contact__distance_caches__jobsite=job.jobsite,
-                     contact__distance_caches__time__isnull=False,
-                     then='contact__distance_caches__time'),
-                default=-1
-            )),
-            last_timesheet_date=Max('job_offers__time_sheets__shift_started_at'),
-            # tags_count=Sum(Case(
-            #     When(tag_rels__tag_id__in=job_tags, job_offers__isnull=True, then=1),
-            #     default=0,
-            #     output_field=IntegerField(),
-            # )),
-            average_score=F('candidate_scores__average_score'),
-            count_timesheets=Count('job_offers__time_sheets', distinct=True)
+            distance_to_jobsite=Coalesce(*distances, Value(-1), output_field=IntegerField()),
+            time_to_jobsite=Coalesce(Subquery(distance_caches.filter(time__isnull=False).values('time')[:1]), -1),
+            last_timesheet_date=F('candidate_stats__last_timesheet_date'),
+            average_score=F('candidate_stats__average_score'),
+            count_timesheets=Coalesce(F('candidate_stats__timesheets_count'), 0),
+            favourite=Exists(favourite_lists),
         ).prefetch_related('tag_rels__tag')
 
         tags_filter = request.query_params.get('show_without_tags', None) in ('True', None)
         if not tags_filter:
-            candidate_contacts = candidate_contacts.filter(tag_rels__tag_id__in=job_tags)
+            candidate_contacts = candidate_contacts.filter(tag_rels__tag_id__in=list(job_tags))
 
-        restrict_radius = int(request.GET.get('distance_to_jobsite', -1))
         if restrict_radius > -1:
             candidate_contacts = candidate_contacts.filter(distance_to_jobsite__lte=restrict_radius * 1000)
 
@@ -744,14 +753,12 @@ class JobViewset(BaseApiViewset):
             'partially_available_candidates': partially_available_candidates,
             # 'overpriced': overpriced_candidates,
             'job': job,
-            'favourite_list': favourite_list,
+            'job_tags': job_tags,
             # 'booked_before_list': booked_before_list,
             # 'carrier_list': carrier_list,
             'init_shifts': init_shifts,
         }
 
-        jobsite_address = job.jobsite.get_address()
-
         job_ctx = {
             'id': job.id,
             '__str__': str(job),
@@ -797,20 +804,10 @@ class JobViewset(BaseApiViewset):
             if len(all_workers) > subscription_worker_count:
                 raise exceptions.ValidationError(_('You are not allowed to book more than {}'.format(subscription_worker_count)))
 
-        for candidate_id in candidate_ids:
-            for shift in shifts:
-                if fill_shifts and str(shift.id) not in fill_shifts:
-                    continue
+        if fill_shifts:
+            shifts = [shift for shift in shifts if str(shift.id) in fill_shifts]
 
-                unavailable = job_utils.get_partially_available_candidate_ids_for_vs(
-                    candidate_models.CandidateContact.objects.filter(id=candidate_id),
-                    shift.date.shift_date, shift.time
-                )
-                if len(unavailable) == 0:
-                    hr_models.JobOffer.objects.create(
-                        shift=shift,
-                        candidate_contact_id=candidate_id,
-                    )
+        booking_utils.book_candidates(job, shifts, candidate_ids)
 
         return Response({
             'status': 'ok',
@@ -1037,6 +1034,8 @@ class TimeSheetCandidateViewset(BaseTimeSheetViewsetMixin,
 
         queryset = hr_models.TimeSheet.objects.filter(
             job_offer__candidate_contact_id=candidate
+        ).select_related(
+            hr_models.TimeSheet.geo_address_path
         ).annotate(
             approved=Case(When(qs_approved, then=True),
                           When(qs_unapproved, then=False),
@@ -1070,6 +1069,7 @@ class JobOffersCandidateViewset(
         by = super().get_queryset()\
             .filter(candidate_contact__contact=contact)\
             .filter(updated_at__in=latest.values('latest_date'))\
+            .select_related(hr_models.JobOffer.geo_address_path)\
             .order_by('-shift__date__shift_date')
         return by
 
@@ -1090,7 +1090,7 @@ class ShiftViewset(BaseApiViewset):
             shift_date.delete()
 
     def get_queryset(self):
-        return super().get_queryset().annotate_is_fulfilled()
+        return super().get_queryset().annotate_is_fulfilled().select_related(hr_models.Shift.geo_address_path)
 
     def filter_queryset(self, queryset):
         queryset = super().filter_queryset(queryset)
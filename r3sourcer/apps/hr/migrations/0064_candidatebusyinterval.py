@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from datetime import datetime, time
+
+from django.db import migrations, models
+from django.utils import timezone
+import django.db.models.deletion
+import uuid
+
+
+HAS_JOBOFFER, HAS_TIMESHEET, UNAVAILABLE = range(3)
+BATCH_SIZE = 1000
+
+
+def make_aware(value):
+    return timezone.make_aware(value, timezone.get_default_timezone())
+
+
+def fill_busy_intervals(apps, schema_editor):
+    CandidateBusyInterval = apps.get_model('hr', 'CandidateBusyInterval')
+    JobOffer = apps.get_model('hr', 'JobOffer')
+    TimeSheet = apps.get_model('hr', 'TimeSheet')
+    ContactUnavailability = apps.get_model('core', 'ContactUnavailability')
+
+    intervals = []
+
+    def add_interval(**kwargs):
+        intervals.append(CandidateBusyInterval(**kwargs))
+        if len(intervals) >= BATCH_SIZE:
+            CandidateBusyInterval.objects.bulk_create(intervals)
+            intervals.clear()
+
+    job_offers = JobOffer.objects.filter(status__in=[0, 1]).values_list(
+        'id', 'candidate_contact_id', 'shift__date__shift_date', 'shift__time'
+    )
+    for job_offer_id, candidate_contact_id, shift_date, shift_time in job_offers.iterator():
+        shift_start = make_aware(datetime.combine(shift_date, shift_time))
+        add_interval(
+            reason=HAS_JOBOFFER, object_id=job_offer_id, candidate_contact_id=candidate_contact_id,
+            busy_from=shift_start, busy_until=shift_start,
+        )
+
+    time_sheets = TimeSheet.objects.filter(shift_started_at__isnull=False).values_list(
+        'id', 'job_offer__candidate_contact_id', 'shift_started_at'
+    )
+    for time_sheet_id, candidate_contact_id, shift_started_at in time_sheets.iterator():
+        add_interval(
+            reason=HAS_TIMESHEET, object_id=time_sheet_id, candidate_contact_id=candidate_contact_id,
+            busy_from=shift_started_at, busy_until=shift_started_at,
+        )
+
+    unavailabilities = ContactUnavailability.objects.filter(
+        unavailable_from__isnull=False,
+        unavailable_until__isnull=False,
+        contact__candidate_contacts__isnull=False,
+    ).values_list('id', 'contact__candidate_contacts', 'unavailable_from', 'unavailable_until')
+    for unavailability_id, candidate_contact_id, unavailable_from, unavailable_until in unavailabilities.iterator():
+        add_interval(
+            reason=UNAVAILABLE, object_id=unavailability_id, candidate_contact_id=candidate_contact_id,
+            busy_from=make_aware(datetime.combine(unavailable_from, time.min)),
+            busy_until=make_aware(datetime.combine(unavailable_until, time.max)),
+        )
+
+    CandidateBusyInterval.objects.bulk_create(intervals)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0152_invoicerule_period_index'),
+        ('candidate', '0051_auto_20211213_1418'),
+        ('hr', '0063_auto_20211122_1343'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidateBusyInterval',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('reason', models.PositiveSmallIntegerField(choices=[(0, 'Job Offer'), (1, 'TimeSheet'), (2, 'Unavailable')], verbose_name='Reason')),
+                ('object_id', models.UUIDField(verbose_name='Object id')),
+                ('busy_from', models.DateTimeField(verbose_name='Busy from')),
+                ('busy_until', models.DateTimeField(verbose_name='Busy until')),
+                ('candidate_contact', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='busy_intervals', to='candidate.CandidateContact', verbose_name='Candidate contact')),
+            ],
+            options={
+                'verbose_name': 'Candidate Busy Interval',
+                'verbose_name_plural': 'Candidate Busy Intervals',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='candidatebusyinterval',
+            unique_together=set([('reason', 'object_id', 'candidate_contact')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='candidatebusyinterval',
+            index_together=set([('busy_from', 'busy_until')]),
+        ),
+        migrations.RunPython(fill_busy_intervals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+BATCH_SIZE = 1000
+
+
+def fill_candidate_stats(apps, schema_editor):
+    CandidateStats = apps.get_model('hr', 'CandidateStats')
+    CandidateContact = apps.get_model('candidate', 'CandidateContact')
+    CandidateScore = apps.get_model('hr', 'CandidateScore')
+    TimeSheet = apps.get_model('hr', 'TimeSheet')
+
+    time_sheets = {
+        row['job_offer__candidate_contact_id']: row
+        for row in TimeSheet.objects.order_by().values('job_offer__candidate_contact_id').annotate(
+            last_timesheet_date=models.Max('shift_started_at'),
+            timesheets_count=models.Count('id'),
+        )
+    }
+    scores = dict(CandidateScore.objects.filter(
+        candidate_contact__isnull=False
+    ).values_list('candidate_contact_id', 'average_score'))
+
+    stats = []
+    for candidate_contact_id in CandidateContact.objects.values_list('id', flat=True).iterator():
+        row = time_sheets.get(candidate_contact_id, {})
+        stats.append(CandidateStats(
+            candidate_contact_id=candidate_contact_id,
+            last_timesheet_date=row.get('last_timesheet_date'),
+            timesheets_count=row.get('timesheets_count', 0),
+            average_score=scores.get(candidate_contact_id),
+        ))
+
+        if len(stats) >= BATCH_SIZE:
+            CandidateStats.objects.bulk_create(stats)
+            stats = []
+
+    CandidateStats.objects.bulk_create(stats)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('candidate', '0051_auto_20211213_1418'),
+        ('hr', '0064_candidatebusyinterval'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CandidateStats',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('last_timesheet_date', models.DateTimeField(blank=True, null=True, verbose_name='Last TimeSheet date')),
+                ('timesheets_count', models.PositiveIntegerField(default=0, verbose_name='TimeSheets count')),
+                ('average_score', models.DecimalField(blank=True, decimal_places=2, max_digits=3, null=True, verbose_name='Average Score')),
+                ('candidate_contact', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='candidate_stats', to='candidate.CandidateContact', verbose_name='Candidate contact')),
+            ],
+            options={
+                'verbose_name': 'Candidate Stats',
+                'verbose_name_plural': "Candidates' Stats",
+            },
+        ),
+        migrations.RunPython(fill_candidate_stats, migrations.RunPython.noop),
+    ]
@@ -14,6 +14,7 @@ from django.contrib.contenttypes.models import ContentType
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
 from django.db import models, IntegrityError, transaction
+from django.db.models.signals import post_save, post_delete
 from django.utils.formats import date_format
 from django.utils.translation import ugettext_lazy as _
 from filer.models import Folder
@@ -31,7 +32,8 @@ from r3sourcer.apps.candidate.models import CandidateContact
 from r3sourcer.apps.skills.models import SkillBaseRate, SkillRateRange, WorkType
 from r3sourcer.apps.sms_interface.models import SMSMessage
 from r3sourcer.apps.pricing.models import Industry
-from r3sourcer.apps.hr.utils import utils as hr_utils
+from r3sourcer.apps.hr.utils import utils as hr_utils, availability as hr_availability
+from r3sourcer.apps.hr.utils.job import HAS_JOBOFFER, HAS_TIMESHEET, UNAVAILABLE
 from r3sourcer.celeryapp import app
 from r3sourcer.helpers.datetimes import utc_now, tz2utc
 from r3sourcer.helpers.models.abs import UUIDModel, TimeZoneUUIDModel
@@ -235,6 +237,10 @@ class Jobsite(CategoryFolderMixin,
     def get_closest_company(self):
         return self.master_company
 
+    @classmethod
+    def get_closest_company_ids(cls, objects):
+        return {obj.pk: obj.master_company_id for obj in objects}
+
     def get_myob_name(self):
         return self.get_site_name()[:30]
 
@@ -362,14 +368,11 @@ class Job(core_models.AbstractBaseOrder):
         return f'{self.position} - {self.jobsite} ({self.workers} workers)'
     get_title.short_description = _('Title')
 
+    geo_address_path = 'jobsite__address'
+
     @property
     def geo(self):
-        return self.__class__.objects.filter(
-            pk=self.pk,
-        ).annotate(
-            longitude=F('jobsite__address__longitude'),
-            latitude=F('jobsite__address__latitude')
-        ).values_list('longitude', 'latitude').get()
+        return self.get_geo_address()[:2]
 
     def get_job_offers(self):
         return JobOffer.objects.filter(shift__date__job=self)
@@ -610,14 +613,11 @@ class ShiftDate(TimeZoneUUIDModel):
     def __str__(self):
         return date_format(self.shift_date, settings.DATE_FORMAT)
 
+    geo_address_path = 'job__jobsite__address'
+
     @property
     def geo(self):
-        return self.__class__.objects.filter(
-            pk=self.pk,
-        ).annotate(
-            longitude=F('job__jobsite__address__longitude'),
-            latitude=F('job__jobsite__address__latitude')
-        ).values_list('longitude', 'latitude').get()
+        return self.get_geo_address()[:2]
 
     @property
     def job_offers(self):
@@ -685,14 +685,11 @@ class Shift(TimeZoneUUIDModel):
             settings.DATETIME_FORMAT
         )
 
+    geo_address_path = 'date__job__jobsite__address'
+
     @property
     def geo(self):
-        return self.__class__.objects.filter(
-            pk=self.pk,
-        ).annotate(
-            longitude=F('date__job__jobsite__address__longitude'),
-            latitude=F('date__job__jobsite__address__latitude')
-        ).values_list('longitude', 'latitude').get()
+        return self.get_geo_address()[:2]
 
     @property
     def shift_date_at_tz(self):
@@ -760,14 +757,11 @@ class JobOffer(TimeZoneUUIDModel):
         verbose_name = _("Job Offer")
         verbose_name_plural = _("Job Offers")
 
+    geo_address_path = 'shift__date__job__jobsite__address'
+
     @property
     def geo(self):
-        return self.__class__.objects.filter(
-            pk=self.pk,
-        ).annotate(
-            longitude=F('shift__date__job__jobsite__address__longitude'),
-            latitude=F('shift__date__job__jobsite__address__latitude')
-        ).values_list('longitude', 'latitude').get()
+        return self.get_geo_address()[:2]
 
     @property
     def scheduled_sms_datetime_tz(self):
@@ -983,7 +977,10 @@ class JobOffer(TimeZoneUUIDModel):
                 shift=self.shift
             ).exclude(status=JobOffer.STATUS_CHOICES.accepted)
             jo_with_sms_sent = list(qs.filter(job_offer_smses__offer_sent_by_sms__isnull=False).distinct())
+            cancelled_ids = list(qs.values_list('id', flat=True).distinct())
             qs.update(status=JobOffer.STATUS_CHOICES.cancelled)
+            # update() bypasses post_save, so drop cancelled offers from busy intervals here
+            hr_availability.refresh_job_offer_intervals(cancelled_ids)
 
             # send placement rejection sms
             for sent_jo in jo_with_sms_sent:
@@ -1039,49 +1036,69 @@ class JobOffer(TimeZoneUUIDModel):
             ).exists():
                 self.move_candidate_to_carrier_list(new_offer=True)
 
-            # offer = JobOffer.objects.get(pk=self.pk)
-            tomorrow = self.now_tz + timedelta(days=1)
-            tomorrow_end = tomorrow.replace(hour=5, minute=0, second=0, microsecond=0) + timedelta(days=1)
-            # TODO: maybe need to rethink, but it should work
-            # compute eta to schedule SMS sending
-            if is_resend:
-                eta = self.now_tz + timedelta(seconds=10)
-            elif self.start_time_tz <= tomorrow_end:
-                # today and tomorrow day and night shifts
-                eta = self.now_tz.replace(hour=10, minute=0, second=0, microsecond=0)
-
-                if self.now_tz >= self.start_time_tz - timedelta(hours=1):
-                    if self.now_tz >= self.start_time_tz + timedelta(hours=2):
-                        eta = None
-                    else:
-                        eta = self.now_tz + timedelta(seconds=10)
-                elif eta <= self.now_tz or eta >= self.start_time_tz - timedelta(hours=1, minutes=30):
-                    eta = self.now_tz + timedelta(seconds=10)
-            else:
-                if not self.has_future_accepted_jo() \
-                        and not self.has_previous_jo() \
-                        and self.start_time_tz <= self.now_tz + timedelta(days=4):
-                    eta = self.now_tz + timedelta(seconds=10)
-                else:
-                    # future date day shift
-                    __target = self.start_time_tz.replace(hour=10, minute=0, second=0, microsecond=0)
-                    eta = __target - timedelta(days=1)
+            eta = self.get_confirmation_eta(is_resend)
             if eta:
                 utc_eta = tz2utc(eta)
                 self.scheduled_sms_datetime = utc_eta
                 self.save(update_fields=['scheduled_sms_datetime'])
-                if self.is_first() and not self.is_accepted():
-                    task = send_jo_confirmation
-                elif self.is_recurring():
-                    task = send_recurring_jo_confirmation
-                else:
-                    # FIXME: send job confirmation SMS because there is pending job's JOs for candidate
-                    task = send_jo_confirmation
-
+                task = self.get_confirmation_task()
                 master_company = self.candidate_contact.contact.get_closest_company()
 
                 task.apply_async(args=[self.id, master_company.id], eta=utc_eta)
 
+    def get_confirmation_eta(self, is_resend=False, has_other_offers=None):
+        """
+        Computes local time to send confirmation SMS of the new job offer, None if it is too late to send it
+        :param is_resend: job offer is resent
+        :param has_other_offers: precalculated result of has_future_accepted_jo() or has_previous_jo() checks
+        """
+        tomorrow = self.now_tz + timedelta(days=1)
+        tomorrow_end = tomorrow.replace(hour=5, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        # TODO: maybe need to rethink, but it should work
+        # compute eta to schedule SMS sending
+        if is_resend:
+            eta = self.now_tz + timedelta(seconds=10)
+        elif self.start_time_tz <= tomorrow_end:
+            # today and tomorrow day and night shifts
+            eta = self.now_tz.replace(hour=10, minute=0, second=0, microsecond=0)
+
+            if self.now_tz >= self.start_time_tz - timedelta(hours=1):
+                if self.now_tz >= self.start_time_tz + timedelta(hours=2):
+                    eta = None
+                else:
+                    eta = self.now_tz + timedelta(seconds=10)
+            elif eta <= self.now_tz or eta >= self.start_time_tz - timedelta(hours=1, minutes=30):
+                eta = self.now_tz + timedelta(seconds=10)
+        else:
+            if has_other_offers is None:
+                has_other_offers = self.has_future_accepted_jo() or self.has_previous_jo()
+
+            if not has_other_offers and self.start_time_tz <= self.now_tz + timedelta(days=4):
+                eta = self.now_tz + timedelta(seconds=10)
+            else:
+                # future date day shift
+                __target = self.start_time_tz.replace(hour=10, minute=0, second=0, microsecond=0)
+                eta = __target - timedelta(days=1)
+
+        return eta
+
+    def get_confirmation_task(self, is_first=None, is_recurring=None):
+        if is_first is None:
+            is_first = self.is_first()
+
+        if is_first and not self.is_accepted():
+            return send_jo_confirmation
+
+        if is_recurring is None:
+            is_recurring = self.is_recurring()
+
+        if is_recurring:
+            return send_recurring_jo_confirmation
+
+        # FIXME: send job confirmation SMS because there is pending job's JOs for candidate
+        return send_jo_confirmation
+
+
 class JobOfferSMS(UUIDModel):
 
     job_offer = models.ForeignKey(
@@ -1295,19 +1312,18 @@ class TimeSheet(TimeZoneUUIDModel, WorkflowProcess):
         self.__original_supervisor_id = self.supervisor_id
         self.__original_going_to_work_confirmation = self.going_to_work_confirmation
         self.__original_candidate_submitted_at = self.candidate_submitted_at
+        # candidate stats of the previous job offer are refreshed when job offer is changed
+        self._original_job_offer_id = self.job_offer_id
 
     def __str__(self):
         fields = [self.shift_started_at_tz, self.candidate_submitted_at_tz]
         return ' '.join([str(x) for x in fields])
 
+    geo_address_path = 'job_offer__shift__date__job__jobsite__address'
+
     @property
     def geo(self):
-        return self.__class__.objects.filter(
-            pk=self.pk,
-        ).annotate(
-            longitude=F('job_offer__shift__date__job__jobsite__address__longitude'),
-            latitude=F('job_offer__shift__date__job__jobsite__address__latitude')
-        ).values_list('longitude', 'latitude').get()
+        return self.get_geo_address()[:2]
 
     @property
     def shift_started_at_tz(self):
@@ -1453,6 +1469,8 @@ class TimeSheet(TimeZoneUUIDModel, WorkflowProcess):
         from r3sourcer.apps.hr.tasks import send_placement_acceptance_message
         send_placement_acceptance_message.apply_async(args=[time_sheet.id, job_offer.id], countdown=10)
 
+    closest_company_relation = 'job_offer__shift__date__job'
+
     def get_closest_company(self):
         return self.job_offer.job.get_closest_company()
 
@@ -1745,6 +1763,8 @@ class TimeSheetIssue(
     def __str__(self):
         return '{}: {}'.format(str(self.time_sheet), str(self.subject))
 
+    closest_company_relation = 'time_sheet'
+
     def get_closest_company(self):
         return self.time_sheet.get_closest_company()
 
@@ -2136,6 +2156,53 @@ class ContactJobsiteDistanceCache(UUIDModel):
         unique_together = ("contact", "jobsite")
 
 
+class CandidateBusyInterval(UUIDModel):
+    """
+    Time interval when candidate can't be booked for a shift.
+    Maintained from JobOffer, TimeSheet and ContactUnavailability changes.
+    """
+
+    REASON_CHOICES = Choices(
+        (HAS_JOBOFFER, 'job_offer', _('Job Offer')),
+        (HAS_TIMESHEET, 'time_sheet', _('TimeSheet')),
+        (UNAVAILABLE, 'unavailable', _('Unavailable')),
+    )
+
+    candidate_contact = models.ForeignKey(
+        'candidate.CandidateContact',
+        on_delete=models.CASCADE,
+        related_name='busy_intervals',
+        verbose_name=_("Candidate contact")
+    )
+
+    reason = models.PositiveSmallIntegerField(
+        choices=REASON_CHOICES,
+        verbose_name=_("Reason")
+    )
+
+    object_id = models.UUIDField(verbose_name=_("Object id"))
+
+    busy_from = models.DateTimeField(verbose_name=_("Busy from"))
+
+    busy_until = models.DateTimeField(verbose_name=_("Busy until"))
+
+    objects = models.Manager()
+
+    class Meta:
+        verbose_name = _("Candidate Busy Interval")
+        verbose_name_plural = _("Candidate Busy Intervals")
+        unique_together = ('reason', 'object_id', 'candidate_contact')
+        index_together = [('busy_from', 'busy_until')]
+
+    @classmethod
+    def use_logger(cls):
+        return False
+
+    @classmethod
+    def is_owned(cls):
+        return False
+
+
 class Payslip(UUIDModel):
 
     payment_date = models.DateField(
@@ -2613,6 +2680,100 @@ class CandidateScore(UUIDModel):
         return self.average_score
 
 
+class CandidateStats(UUIDModel):
+    """
+    Materialized timesheet and score statistics of the candidate used for fill-in ranking.
+    Maintained from TimeSheet and CandidateScore changes.
+    """
+
+    candidate_contact = models.OneToOneField(
+        'candidate.CandidateContact',
+        on_delete=models.CASCADE,
+        related_name='candidate_stats',
+        verbose_name=_("Candidate contact")
+    )
+
+    last_timesheet_date = models.DateTimeField(
+        verbose_name=_("Last TimeSheet date"),
+        null=True,
+        blank=True
+    )
+
+    timesheets_count = models.PositiveIntegerField(
+        verbose_name=_("TimeSheets count"),
+        default=0
+    )
+
+    average_score = models.DecimalField(
+        decimal_places=2,
+        max_digits=3,
+        verbose_name=_("Average Score"),
+        null=True,
+        blank=True
+    )
+
+    objects = models.Manager()
+
+    class Meta:
+        verbose_name = _("Candidate Stats")
+        verbose_name_plural = _("Candidates' Stats")
+
+    @classmethod
+    def use_logger(cls):
+        return False
+
+    @classmethod
+    def is_owned(cls):
+        return False
+
+    @classmethod
+    def refresh(cls, candidate_contact_ids):
+        """
+        Recalculates stats of the candidates with one grouped query per source table
+        """
+        candidate_contact_ids = set(CandidateContact.objects.filter(
+            id__in=set(candidate_contact_ids)
+        ).values_list('id', flat=True))
+        if not candidate_contact_ids:
+            return
+
+        time_sheets = TimeSheet.objects.filter(
+            job_offer__candidate_contact_id__in=candidate_contact_ids
+        ).order_by().values('job_offer__candidate_contact_id').annotate(
+            last_timesheet_date=models.Max('shift_started_at'),
+            timesheets_count=models.Count('id'),
+        )
+        time_sheets = {
+            row['job_offer__candidate_contact_id']: (row['last_timesheet_date'], row['timesheets_count'])
+            for row in time_sheets
+        }
+        scores = dict(CandidateScore.objects.filter(
+            candidate_contact_id__in=candidate_contact_ids
+        ).values_list('candidate_contact_id', 'average_score'))
+        existing = {
+            stats.candidate_contact_id: stats
+            for stats in cls.objects.filter(candidate_contact_id__in=candidate_contact_ids)
+        }
+
+        new_stats = []
+        for candidate_contact_id in candidate_contact_ids:
+            last_timesheet_date, timesheets_count = time_sheets.get(candidate_contact_id, (None, 0))
+            values = {
+                'last_timesheet_date': last_timesheet_date,
+                'timesheets_count': timesheets_count,
+                'average_score': scores.get(candidate_contact_id),
+            }
+
+            stats = existing.get(candidate_contact_id)
+            if stats is None:
+                new_stats.append(cls(candidate_contact_id=candidate_contact_id, **values))
+            elif any(getattr(stats, field) != value for field, value in values.items()):
+                cls.objects.filter(id=stats.id).update(**values)
+
+        if new_stats:
+            cls.objects.bulk_create(new_stats)
+
+
 class JobTag(UUIDModel):
     tag = models.ForeignKey(
         core_models.Tag,
@@ -2733,3 +2894,63 @@ class JobRate(UUIDModel):
 
     def __str__(self):
         return f'{self.job}-{self.worktype}'
+
+
+def refresh_job_offer_busy_interval(sender, instance, **kwargs):
+    hr_availability.refresh_job_offer_intervals([instance.id])
+
+
+def refresh_time_sheet_busy_interval(sender, instance, **kwargs):
+    hr_availability.refresh_time_sheet_intervals([instance.id])
+
+
+def refresh_unavailability_busy_interval(sender, instance, **kwargs):
+    hr_availability.refresh_unavailability_intervals([instance.id])
+
+
+def refresh_shift_busy_intervals(sender, instance, **kwargs):
+    if not kwargs.get('created'):
+        hr_availability.refresh_shift_job_offer_intervals(shift=instance)
+
+
+def refresh_shift_date_busy_intervals(sender, instance, **kwargs):
+    if not kwargs.get('created'):
+        hr_availability.refresh_shift_job_offer_intervals(shift__date=instance)
+
+
+def delete_busy_interval(reason):
+    def receiver(sender, instance, **kwargs):
+        hr_availability.delete_intervals(reason, [instance.id])
+    return receiver
+
+
+def refresh_time_sheet_candidate_stats(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not {'shift_started_at', 'job_offer', 'job_offer_id'}.intersection(update_fields):
+        return
+
+    job_offer_ids = {instance.job_offer_id, instance._original_job_offer_id} - {None}
+    instance._original_job_offer_id = instance.job_offer_id
+
+    candidate_contact_ids = set(JobOffer.objects.filter(
+        id__in=job_offer_ids
+    ).values_list('candidate_contact_id', flat=True))
+    CandidateStats.refresh(candidate_contact_ids)
+
+
+def refresh_score_candidate_stats(sender, instance, **kwargs):
+    if instance.candidate_contact_id:
+        CandidateStats.refresh([instance.candidate_contact_id])
+
+
+post_save.connect(refresh_job_offer_busy_interval, sender=JobOffer)
+post_save.connect(refresh_time_sheet_busy_interval, sender=TimeSheet)
+post_save.connect(refresh_unavailability_busy_interval, sender=core_models.ContactUnavailability)
+post_save.connect(refresh_shift_busy_intervals, sender=Shift)
+post_save.connect(refresh_shift_date_busy_intervals, sender=ShiftDate)
+post_delete.connect(delete_busy_interval(HAS_JOBOFFER), sender=JobOffer, weak=False)
+post_delete.connect(delete_busy_interval(HAS_TIMESHEET), sender=TimeSheet, weak=False)
+post_delete.connect(delete_busy_interval(UNAVAILABLE), sender=core_models.ContactUnavailability, weak=False)
+post_save.connect(refresh_time_sheet_candidate_stats, sender=TimeSheet)
+post_save.connect(refresh_score_candidate_stats, sender=CandidateScore)
+post_delete.connect(refresh_time_sheet_candidate_stats, sender=TimeSheet)
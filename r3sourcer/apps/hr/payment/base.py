@@ -1,13 +1,15 @@
 import copy
 from datetime import timedelta, datetime
-from io import BytesIO
 
-import weasyprint
+from django.contrib.contenttypes.models import ContentType
 from django.db.models import Q
 
+from r3sourcer.apps.candidate.models import SkillRateCoefficientRel
 from r3sourcer.apps.pricing.models import (
     RateCoefficientModifier,
     AllowanceMixin,
+    DynamicCoefficientRule,
+    PriceListRateModifier,
 )
 from r3sourcer.helpers.datetimes import tz2utc, date2utc_date
 
@@ -42,14 +44,12 @@ class BasePaymentService:
 
         return timesheets.order_by('shift_started_at')
 
-    @classmethod
-    def _get_file_from_str(cls, str):
-        pdf = weasyprint.HTML(string=str)
-        pdf_file = BytesIO()
-        pdf_file.write(pdf.write_pdf())
-        pdf_file.seek(0)
+    @property
+    def modifier_index(self):
+        if getattr(self, '_modifier_index', None) is None:
+            self._modifier_index = RateModifierIndex(self.modifier_type)
 
-        return pdf_file
+        return self._modifier_index
 
     def lines_iter(self, coeffs_hours, skill, hourly_rate, timesheet):
         for coeff_hours in coeffs_hours:
@@ -57,26 +57,11 @@ class BasePaymentService:
             notes = str(skill)
             if coefficient != 'base':
                 if self.modifier_type == RateCoefficientModifier.TYPE_CHOICES.company:
-                    modifier_rel = coefficient.price_list_rate_modifiers.filter(
-                        price_list_rate__price_list__company=timesheet.regular_company,
-                    ).first()
-                elif self.modifier_type == RateCoefficientModifier.TYPE_CHOICES.candidate:
-                    modifier_rel = coefficient.candidate_skill_coefficient_rels.filter(
-                        skill_rel__candidate_contact=timesheet.candidate_contact,
-                    ).first()
-
-                modifier = modifier_rel and modifier_rel.rate_coefficient_modifier
-
-                if not modifier:
-                    modifier = coefficient.rate_coefficient_modifiers.filter(
-                        type=self.modifier_type, default=True,
-                    ).first()
-
-                is_allowance = any([
-                    isinstance(rule.rule, AllowanceMixin)
-                    for rule in coefficient.rate_coefficient_rules.all()]
-                )
-                if is_allowance:
+                    modifier = self.modifier_index.get_company_modifier(coefficient, timesheet.regular_company)
+                else:
+                    modifier = self.modifier_index.get_candidate_modifier(coefficient, timesheet.candidate_contact)
+
+                if self.modifier_index.is_allowance(coefficient):
                     rate = modifier.fixed_override
                 else:
                     rate = modifier.calc(hourly_rate)
@@ -89,3 +74,89 @@ class BasePaymentService:
             line['notes'] = notes
 
             yield line
+
+
+class RateModifierIndex:
+    """
+    Resolves rate coefficient modifiers for one invoice/payslip run.
+
+    Customer company and candidate modifiers are loaded once per company/candidate,
+    default modifiers and allowance flags once per coefficient.
+    """
+
+    def __init__(self, modifier_type):
+        self.modifier_type = modifier_type
+        self.company_modifiers = {}
+        self.candidate_modifiers = {}
+        self.default_modifiers = {}
+        self.allowances = set()
+        self._loaded_companies = set()
+        self._loaded_candidates = set()
+        self._loaded_coefficients = set()
+
+    def _load_coefficients(self, coefficient_ids):
+        coefficient_ids = set(coefficient_ids) - self._loaded_coefficients
+        if not coefficient_ids:
+            return
+
+        modifiers = RateCoefficientModifier.objects.filter(
+            rate_coefficient_id__in=coefficient_ids, type=self.modifier_type, default=True,
+        ).order_by('pk')
+        for modifier in modifiers:
+            self.default_modifiers.setdefault(modifier.rate_coefficient_id, modifier)
+
+        rule_types = DynamicCoefficientRule.objects.filter(
+            rate_coefficient_id__in=coefficient_ids,
+        ).values_list('rate_coefficient_id', 'rule_type_id').distinct()
+        for coefficient_id, rule_type_id in rule_types:
+            rule_model = ContentType.objects.get_for_id(rule_type_id).model_class()
+            if rule_model and issubclass(rule_model, AllowanceMixin):
+                self.allowances.add(coefficient_id)
+
+        self._loaded_coefficients.update(coefficient_ids)
+
+    def _load_company(self, company_id):
+        if company_id in self._loaded_companies:
+            return
+
+        modifier_rels = PriceListRateModifier.objects.filter(
+            price_list_rate__price_list__company_id=company_id,
+        ).select_related('rate_coefficient_modifier').order_by('pk')
+        for modifier_rel in modifier_rels:
+            self.company_modifiers.setdefault(
+                (modifier_rel.rate_coefficient_id, company_id), modifier_rel.rate_coefficient_modifier
+            )
+
+        self._loaded_companies.add(company_id)
+
+    def _load_candidate(self, candidate_id):
+        if candidate_id in self._loaded_candidates:
+            return
+
+        modifier_rels = SkillRateCoefficientRel.objects.filter(
+            skill_rel__candidate_contact_id=candidate_id,
+        ).select_related('rate_coefficient_modifier').order_by('pk')
+        for modifier_rel in modifier_rels:
+            self.candidate_modifiers.setdefault(
+                (modifier_rel.rate_coefficient_id, candidate_id), modifier_rel.rate_coefficient_modifier
+            )
+
+        self._loaded_candidates.add(candidate_id)
+
+    def get_default_modifier(self, coefficient):
+        self._load_coefficients([coefficient.pk])
+        return self.default_modifiers.get(coefficient.pk)
+
+    def get_company_modifier(self, coefficient, company):
+        self._load_company(company.pk)
+        modifier = self.company_modifiers.get((coefficient.pk, company.pk))
+        return modifier or self.get_default_modifier(coefficient)
+
+    def get_candidate_modifier(self, coefficient, candidate):
+        self._load_candidate(candidate.pk)
+        modifier = self.candidate_modifiers.get((coefficient.pk, candidate.pk))
+        return modifier or self.get_default_modifier(coefficient)
+
+    def is_allowance(self, coefficient):
+        self._load_coefficients([coefficient.pk])
+        return coefficient.pk in self.allowances
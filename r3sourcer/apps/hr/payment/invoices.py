@@ -1,18 +1,17 @@
 import logging
 import math
-from copy import copy
+from collections import OrderedDict
 from hashlib import md5
 from decimal import Decimal
 
-from django.core.files.base import ContentFile
-from django.db.models import Count
 from django.utils.formats import date_format
-from filer.models import Folder, File, Q
+from filer.models import Folder, Q
 
 from r3sourcer.apps.core.models import Invoice, InvoiceLine, InvoiceRule, VAT
 from r3sourcer.apps.core.utils.utils import get_thumbnail_picture
 from r3sourcer.apps.hr.models import TimeSheet
 from r3sourcer.apps.hr.payment.base import BasePaymentService
+from r3sourcer.apps.hr.utils.pdf import get_pdf_file
 from r3sourcer.apps.pricing.models import RateCoefficientModifier, PriceListRate
 from r3sourcer.apps.pricing.services import CoefficientService
 from r3sourcer.apps.pdf_templates.models import PDFTemplate
@@ -50,9 +49,11 @@ class InvoiceService(BasePaymentService):
     def calculate(self, timesheets):
         coefficient_service = CoefficientService()
         lines = []
+        timesheets_coeffs_hours = coefficient_service.calc_many(
+            timesheets, RateCoefficientModifier.TYPE_CHOICES.company
+        )
 
         for timesheet in timesheets:
-            industry = timesheet.job_offer.job.jobsite.industry
             customer_company = timesheet.job_offer.shift.date.job.customer_company
             vat = customer_company.get_vat()
             company_language = customer_company.get_default_language()
@@ -60,13 +61,7 @@ class InvoiceService(BasePaymentService):
             for ts_rate in timesheet.timesheet_rates.all():
                 price_list_rate = self._get_price_list_rate(ts_rate.worktype, customer_company)
                 if ts_rate.worktype.name == WorkType.DEFAULT:
-                    coeffs_hours = coefficient_service.calc(timesheet.master_company,
-                                                            industry,
-                                                            RateCoefficientModifier.TYPE_CHOICES.company,
-                                                            timesheet.shift_started_at_tz,
-                                                            timesheet.shift_duration,
-                                                            break_started=timesheet.break_started_at_tz,
-                                                            break_ended=timesheet.break_ended_at_tz)
+                    coeffs_hours = timesheets_coeffs_hours[timesheet.pk]
 
                     lines_iter = self.lines_iter(coeffs_hours,
                                                  ts_rate.worktype,
@@ -132,8 +127,6 @@ class InvoiceService(BasePaymentService):
             'show_candidate': show_candidate,
         }
 
-        pdf_file = cls._get_file_from_str(str(template.render(context)))
-
         folder, created = Folder.objects.get_or_create(
             parent=invoice.customer_company.files,
             name='invoices',
@@ -144,19 +137,12 @@ class InvoiceService(BasePaymentService):
             date_format(invoice.date, 'Y_m_d')
         )
 
-        file_obj, _ = File.objects.get_or_create(
-            folder=folder,
-            name='invoice_{}_{}.pdf'.format(
-                invoice.number,
-                date_format(invoice.date, 'Y_m_d')
-            ),
-            file=ContentFile(pdf_file.read(), name=file_name)
-        )
+        file_obj = get_pdf_file(str(template.render(context)), folder, file_name)
 
         return file_obj
 
     @property
-    def invoice_line_keys(se1f):
+    def invoice_line_keys(self):
         return (
             'timesheet',
             'date',
@@ -167,10 +153,13 @@ class InvoiceService(BasePaymentService):
             'unit_name'
         )
 
-    def get_line_unique_id(self, get_fn, line):
+    def get_line_content_hash(self, line):
         parts = []
         for key in self.invoice_line_keys:
-            parts.append(str(get_fn(line, key)))
+            value = line.get(key)
+            if key == 'timesheet':
+                value = value and value.pk
+            parts.append(str(value))
 
         return md5(''.join(parts).encode()).hexdigest()
 
@@ -178,9 +167,9 @@ class InvoiceService(BasePaymentService):
                          show_candidate=False, recreate=False):
         if hasattr(company, 'subcontractor'):
             candidate = company.subcontractor.primary_contact
-            timesheets = timesheets.filter(
-                job_offer__candidate_contact=candidate
-            )
+            timesheets = [
+                timesheet for timesheet in timesheets if timesheet.job_offer.candidate_contact_id == candidate.id
+            ]
 
         lines, timesheets = self.calculate(timesheets)
 
@@ -199,37 +188,32 @@ class InvoiceService(BasePaymentService):
                 separation_rule=invoice_rule.separation_rule
             )
 
+        # lines stored before content hashes were introduced have empty hash and are treated as outdated
         invoice_lines = {}
-        for line in invoice.invoice_lines.all():
-            invoice_lines[self.get_line_unique_id(getattr, line)] = line
+        for line_id, content_hash in invoice.invoice_lines.values_list('id', 'content_hash'):
+            invoice_lines.setdefault(content_hash or line_id, line_id)
 
         calculated_lines = {}
         for line in lines:
-            calculated_lines[self.get_line_unique_id(dict.get, line)] = line
-
-        to_insert = []
-
-        for key in copy(calculated_lines).keys():
-            item = calculated_lines.pop(key)
-            if invoice_lines.get(key) is None:
-                to_insert.append(item)
-            else:
-                invoice_lines.pop(key)
-
-        # delete outdated lines
-        for item in invoice_lines.values():
-            item.delete()
-
-        invoice_lines = []
-
-        for line in to_insert:
-            invoice_lines.append(InvoiceLine(
-                invoice=invoice,
-                created_at=utc_now(),
-                updated_at=utc_now(),
-                **line))
-
-        InvoiceLine.objects.bulk_create(invoice_lines)
+            calculated_lines[self.get_line_content_hash(line)] = line
+
+        to_insert = [
+            (content_hash, line) for content_hash, line in calculated_lines.items()
+            if content_hash not in invoice_lines
+        ]
+        outdated_ids = [
+            line_id for content_hash, line_id in invoice_lines.items()
+            if content_hash not in calculated_lines
+        ]
+
+        if outdated_ids:
+            InvoiceLine.objects.filter(id__in=outdated_ids).delete()
+
+        now = utc_now()
+        InvoiceLine.objects.bulk_create([
+            InvoiceLine(invoice=invoice, created_at=now, updated_at=now, content_hash=content_hash, **line)
+            for content_hash, line in to_insert
+        ])
 
         invoice.save(update_fields=['total', 'tax', 'total_with_tax', 'updated_at'])
 
@@ -241,55 +225,44 @@ class InvoiceService(BasePaymentService):
     def generate_invoice(self, date_from, date_to, company, invoice_rule, invoice=None, recreate=False):
         separation_rule = invoice_rule.separation_rule
         show_candidate = invoice_rule.show_candidate_name
-        time_sheets_qs = TimeSheet.objects.filter(
+        time_sheets = list(TimeSheet.objects.filter(
             invoice_lines__isnull=True,
             candidate_submitted_at__isnull=False,
             supervisor_approved_at__isnull=False,
             job_offer__shift__date__shift_date__lt=date_to,
             job_offer__shift__date__job__jobsite__regular_company=company,
-        ).annotate(Count('id'))
+        ).select_related(
+            'job_offer__candidate_contact__contact',
+            'job_offer__shift__date__job__jobsite__address',
+            'job_offer__shift__date__job__customer_company',
+        ).prefetch_related(
+            'timesheet_rates__worktype__uom',
+        ).order_by('shift_started_at').distinct())
+
         if separation_rule == InvoiceRule.SEPARATION_CHOICES.one_invoce:
+            groups = [time_sheets]
+        elif separation_rule == InvoiceRule.SEPARATION_CHOICES.per_jobsite:
+            groups = self._group_timesheets(time_sheets, lambda ts: ts.job_offer.shift.date.job.jobsite_id)
+        elif separation_rule == InvoiceRule.SEPARATION_CHOICES.per_candidate:
+            groups = self._group_timesheets(time_sheets, lambda ts: ts.job_offer.candidate_contact_id)
+        else:
+            groups = []
+
+        for group_time_sheets in groups:
             self._prepare_invoice(
                 date_from=date_from,
                 date_to=date_to,
                 invoice=invoice,
                 company=company,
+                timesheets=group_time_sheets,
                 show_candidate=show_candidate,
-                timesheets=time_sheets_qs,
                 recreate=recreate
             )
 
-        elif separation_rule == InvoiceRule.SEPARATION_CHOICES.per_jobsite:
-            jobsites = company.jobsites_regular.all()
-
-            for jobsite in set(jobsites):
-                time_sheets = time_sheets_qs.filter(
-                    job_offer__shift__date__job__jobsite=jobsite,
-                ).order_by('shift_started_at')
-
-                self._prepare_invoice(
-                    date_from=date_from,
-                    date_to=date_to,
-                    invoice=invoice,
-                    company=company,
-                    timesheets=time_sheets,
-                    show_candidate=show_candidate,
-                    recreate=recreate
-                )
+    @classmethod
+    def _group_timesheets(cls, timesheets, key_fn):
+        groups = OrderedDict()
+        for timesheet in timesheets:
+            groups.setdefault(key_fn(timesheet), []).append(timesheet)
 
-        elif separation_rule == InvoiceRule.SEPARATION_CHOICES.per_candidate:
-            candidates = set(time_sheets_qs.values_list('job_offer__candidate_contact', flat=True))
-
-            for candidate in candidates:
-                time_sheets = time_sheets_qs.filter(
-                    job_offer__candidate_contact_id=candidate,
-                )
-                self._prepare_invoice(
-                    date_from=date_from,
-                    date_to=date_to,
-                    invoice=invoice,
-                    company=company,
-                    timesheets=time_sheets,
-                    show_candidate=show_candidate,
-                    recreate=recreate
-                )
+        return list(groups.values())
@@ -1,13 +1,13 @@
 from decimal import Decimal
 
-from django.core.files.base import ContentFile
 from django.template.loader import get_template
 from django.utils.formats import date_format
-from filer.models import Folder, File
+from filer.models import Folder
 
 from r3sourcer.apps.candidate.models import CandidateContact, SkillRel
 from r3sourcer.apps.core.utils.companies import get_site_url
 from r3sourcer.apps.hr.payment.base import BasePaymentService
+from r3sourcer.apps.hr.utils.pdf import get_pdf_file
 from r3sourcer.apps.pricing.models import RateCoefficientModifier
 from r3sourcer.apps.pricing.services import CoefficientService
 from ..models import PayslipLine, Payslip, JobOffer, TimeSheet
@@ -32,23 +32,18 @@ class PayslipService(BasePaymentService):
         timesheets = self._get_timesheets(timesheets, from_date, candidate)
         coefficient_service = CoefficientService()
         prices = {}
+        # payslips are calculated with UTC break times
+        timesheets_coeffs_hours = coefficient_service.calc_many(
+            timesheets, RateCoefficientModifier.TYPE_CHOICES.company, local_breaks=False
+        )
 
         for timesheet in timesheets:
-            jobsite = timesheet.job_offer.job.jobsite
-            industry = jobsite.industry
             skill = timesheet.job_offer.job.position
             skill_rate = self._get_skill_rate(candidate, skill)
 
-            coeffs_hours = coefficient_service.calc(
-                timesheet.master_company, industry,
-                RateCoefficientModifier.TYPE_CHOICES.company,
-                timesheet.shift_started_at_tz,
-                timesheet.shift_duration,
-                break_started=timesheet.break_started_at,
-                break_ended=timesheet.break_ended_at,
-            )
+            coeffs_hours = timesheets_coeffs_hours[timesheet.pk]
 
-            lines_iter = self.lines_iter(coeffs_hours, skill, skill_rate)
+            lines_iter = self.lines_iter(coeffs_hours, skill, skill_rate, timesheet)
 
             for raw_line in lines_iter:
                 units = Decimal(raw_line['hours'].total_seconds() / 3600)
@@ -88,8 +83,6 @@ class PayslipService(BasePaymentService):
             'DOMAIN': domain
         }
 
-        pdf_file = cls._get_file_from_str(str(template.render(context)))
-
         folder, created = Folder.objects.get_or_create(
             parent=payslip.company.files,
             name='invoices',
@@ -99,11 +92,7 @@ class PayslipService(BasePaymentService):
             date_format(payslip.from_date, 'Y_m_d'),
             date_format(payslip.to_date, 'Y_m_d')
         )
-        file_obj, created = File.objects.get_or_create(
-            folder=folder,
-            name=file_name,
-            file=ContentFile(pdf_file.read(), name=file_name)
-        )
+        get_pdf_file(str(template.render(context)), folder, file_name)
 
     def prepare_candidate(self, candidate, company, from_date, to_date):
         try:
@@ -1,13 +1,12 @@
 import operator
 from datetime import timedelta, date, time, datetime
 
-from celery import shared_task
+from celery import shared_task, chord
 from celery.utils.log import get_task_logger
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
-from django.core.files.base import ContentFile
 from django.db import transaction, models
 from django.utils import formats, timezone
 from django.utils.formats import date_format
@@ -16,20 +15,21 @@ from filer.models import File, Folder
 
 from r3sourcer.apps.candidate.models import CandidateContact
 from r3sourcer.apps.core import models as core_models
-from r3sourcer.apps.core.tasks import one_sms_task_at_the_same_time
+from r3sourcer.apps.core.tasks import one_sms_task_at_the_same_time, memcache_lock
 from r3sourcer.apps.core.utils import companies as core_companies_utils
 from r3sourcer.apps.core.utils.utils import get_thumbnail_picture
 from r3sourcer.apps.email_interface.models import EmailMessage
 from r3sourcer.apps.email_interface.utils import get_email_service
 from r3sourcer.apps.hr import models as hr_models
-from r3sourcer.apps.hr.utils import utils
+from r3sourcer.apps.hr.utils import utils, distances
+from r3sourcer.apps.hr.utils.pdf import get_pdf_file
 from r3sourcer.apps.login.models import TokenLogin
 from r3sourcer.apps.myob.helpers import get_myob_client
 from r3sourcer.apps.pricing.models import RateCoefficientModifier, PriceListRate
 from r3sourcer.apps.pricing.services import CoefficientService
 from r3sourcer.apps.pricing.utils.utils import format_timedelta
 from r3sourcer.apps.skills.models import Skill
-from r3sourcer.apps.sms_interface.models import SMSMessage
+from r3sourcer.apps.sms_interface.models import SMSConversation, SMSMessage
 from r3sourcer.apps.sms_interface.utils import get_sms_service
 from r3sourcer.apps.pdf_templates.models import PDFTemplate
 from r3sourcer.celeryapp import app
@@ -42,19 +42,8 @@ GOING_TO_WORK, SHIFT_ENDING, RECRUITEE_SUBMITTED, SUPERVISOR_DECLINED = range(4)
 
 @shared_task(queue='hr')
 def update_all_distances():
-
-    all_calculated_jobsites = hr_models.Jobsite.objects.filter(
-        id__in=hr_models.ContactJobsiteDistanceCache.objects.filter(
-            updated_at__isnull=True
-        ).values('jobsite')
-    )
-
-    for jobsite in all_calculated_jobsites:
-        if not (jobsite.latitude == 0 and jobsite.longitude == 0):
-
-            contacts = core_models.Contact.objects.filter(distance_caches__jobsite=jobsite)
-            if not utils.calculate_distances_for_jobsite(contacts, jobsite):
-                break
+    if not distances.refresh_all_distances():
+        logger.warning('Distance refresh is stopped and will be resumed with the next run')
 
 
 def send_job_offer(job_offer, tpl_name, master_company_id, action_sent=None):
@@ -218,6 +207,29 @@ def send_recurring_jo_confirmation(self, job_offer_id, master_company_id):
                                action_sent='offer_sent_by_sms')
 
 
+@shared_task(queue='sms')
+def schedule_jo_confirmations(confirmations):
+    """
+    Schedules confirmation SMS of the job offers booked at once
+
+    :param confirmations: list of (job_offer_id, master_company_id, task_name) items
+    """
+    etas = {
+        str(job_offer_id): eta for job_offer_id, eta in hr_models.JobOffer.objects.filter(
+            id__in=[job_offer_id for job_offer_id, _, _ in confirmations],
+            scheduled_sms_datetime__isnull=False,
+        ).values_list('id', 'scheduled_sms_datetime')
+    }
+
+    for job_offer_id, master_company_id, task_name in confirmations:
+        eta = etas.get(str(job_offer_id))
+        if eta is None:
+            logger.info('Job Offer %s confirmation is not scheduled anymore', job_offer_id)
+            continue
+
+        app.tasks[task_name].apply_async(args=[job_offer_id, master_company_id], eta=eta)
+
+
 def send_job_offer_notification(jo_id, tpl_name, recipient_field):
 
     with transaction.atomic():
@@ -1144,17 +1156,6 @@ def auto_approve_timesheet(timesheet_id):
         supervisor_approved_at=utc_now())
 
 
-def get_file_from_str(str):
-    from io import BytesIO
-    import weasyprint
-    pdf = weasyprint.HTML(string=str)
-    pdf_file = BytesIO()
-    pdf_file.write(pdf.write_pdf())
-    pdf_file.seek(0)
-
-    return pdf_file
-
-
 def group_timsheet_rates(timesheet_rates):
     from itertools import groupby
 
@@ -1209,6 +1210,10 @@ def generate_pdf(timesheet_ids, request=None, master_company=None):
         raise Exception('Cannot find pdf template with slug %s for language %s', template_slug, company_language)
 
     coefficient_service = CoefficientService()
+    timesheets_coeffs_hours = coefficient_service.calc_many(
+        hr_models.TimeSheet.objects.filter(pk__in=timesheet_ids),
+        RateCoefficientModifier.TYPE_CHOICES.candidate,
+    )
     total_base_units = []
     total_15_coef = []
     total_2_coef = []
@@ -1231,16 +1236,7 @@ def generate_pdf(timesheet_ids, request=None, master_company=None):
         activities.append({})
 
         for timesheet_rate in rates:
-
-            jobsite = timesheet_rate.timesheet.job_offer.job.jobsite
-            industry = jobsite.industry
-            coeffs_hours = coefficient_service.calc(timesheet_rate.timesheet.master_company,
-                                                    industry,
-                                                    RateCoefficientModifier.TYPE_CHOICES.candidate,
-                                                    timesheet_rate.timesheet.shift_started_at_tz,
-                                                    timesheet_rate.timesheet.shift_duration,
-                                                    break_started=timesheet_rate.timesheet.break_started_at_tz,
-                                                    break_ended=timesheet_rate.timesheet.break_ended_at_tz)
+            coeffs_hours = timesheets_coeffs_hours[timesheet_rate.timesheet_id]
             timesheet_rate.timesheet.coeffs_hours = coeffs_hours
             name_mapping = {'base': 'base', '1.5': 'c_1_5x', '2': 'c_2x', 'meal': 'meal', 'travel': 'travel'}
 
@@ -1285,10 +1281,9 @@ def generate_pdf(timesheet_ids, request=None, master_company=None):
         'total_travel': total_travel,
         'total_meal': total_meal,
         'total_skill_activities': total_skill_activities,
-        'user': request.user
+        'user': request.user if request else None,
     }
 
-    pdf_file = get_file_from_str(str(template.render(context)))
     folder, created = Folder.objects.get_or_create(
         parent=master_company.files,
         name='timesheet',
@@ -1297,13 +1292,8 @@ def generate_pdf(timesheet_ids, request=None, master_company=None):
         master_company,
         date_format(timesheet_rates[0].timesheet.shift_started_at_tz, 'Y_m_d')
     )
-    file_obj, created = File.objects.get_or_create(
-        folder=folder,
-        name=file_name,
-        file=ContentFile(pdf_file.read(), name=file_name)
-    )
 
-    return file_obj
+    return get_pdf_file(str(template.render(context)), folder, file_name)
 
 
 @shared_task
@@ -1354,70 +1344,142 @@ def send_invoice_email(invoice_id):
                                 )
 
 
-@shared_task
-def generate_invoices():
-    for company in core_models.Company.objects.all():
-        today = company.today_tz
-        invoice_rules = core_models.InvoiceRule.objects.filter(
-            models.Q(period=core_models.InvoiceRule.PERIOD_CHOICES.weekly,
-                     period_zero_reference=today.isoweekday()) |
-            models.Q(period=core_models.InvoiceRule.PERIOD_CHOICES.monthly,
-                     period_zero_reference=today.day) |
-            models.Q(period=core_models.InvoiceRule.PERIOD_CHOICES.daily),
-            company=company,
-        )
+INVOICE_COMPANIES_CHUNK_SIZE = 20
 
-        # TODO: remove this inline import after fix import logic
-        from r3sourcer.apps.hr.payment.invoices import InvoiceService
-        service = InvoiceService()
-
-        for invoice_rule in invoice_rules:
-            if invoice_rule.period == core_models.InvoiceRule.PERIOD_CHOICES.weekly:
-                date_to = today - timedelta(today.isoweekday())
-                date_from = date_to - timedelta(days=6)
-            elif invoice_rule.period == core_models.InvoiceRule.PERIOD_CHOICES.monthly:
-                date_to = today - timedelta(today.day)
-                date_from = date_to.replace(day=1)
-            else:
-                date_to = today
-                date_from = today - timedelta(days=1)
 
-            existing_invoices = core_models.Invoice.objects.filter(
-                models.Q(provider_company=company) |
-                models.Q(customer_company=company),
-                invoice_lines__date__gte=date2utc_date(date_from, company.tz),
-                invoice_lines__date__lte=date2utc_date(date_to, company.tz),
+def get_invoice_due_company_ids(today_utc):
+    """
+    Preselect companies which may have invoice rule due today in any timezone.
 
-            )
+    Exact check against company local date is done by `generate_company_invoices`.
+    """
+    days = [today_utc + timedelta(days=delta) for delta in (-1, 0, 1)]
+    periods = core_models.InvoiceRule.PERIOD_CHOICES
+
+    return list(core_models.InvoiceRule.objects.filter(
+        models.Q(period=periods.weekly, period_zero_reference__in={day.isoweekday() for day in days}) |
+        models.Q(period=periods.monthly, period_zero_reference__in={day.day for day in days}) |
+        models.Q(period__in=[periods.daily, periods.fortnightly]),
+    ).order_by('company_id').values_list('company_id', flat=True).distinct())
+
+
+def generate_company_invoices(company):
+    today = company.today_tz
+    invoice_rules = core_models.InvoiceRule.objects.filter(
+        models.Q(period=core_models.InvoiceRule.PERIOD_CHOICES.weekly,
+                 period_zero_reference=today.isoweekday()) |
+        models.Q(period=core_models.InvoiceRule.PERIOD_CHOICES.monthly,
+                 period_zero_reference=today.day) |
+        models.Q(period=core_models.InvoiceRule.PERIOD_CHOICES.daily),
+        company=company,
+    )
 
-            if not existing_invoices:
-                service.generate_invoice(date_from,
-                                         date_to,
-                                         company=company,
-                                         invoice_rule=invoice_rule)
+    # TODO: remove this inline import after fix import logic
+    from r3sourcer.apps.hr.payment.invoices import InvoiceService
+    service = InvoiceService()
 
-        fortnightly = core_models.InvoiceRule.objects.filter(
-            period=core_models.InvoiceRule.PERIOD_CHOICES.fortnightly,
-            company=company,
-        )
+    for invoice_rule in invoice_rules:
+        if invoice_rule.period == core_models.InvoiceRule.PERIOD_CHOICES.weekly:
+            date_to = today - timedelta(today.isoweekday())
+            date_from = date_to - timedelta(days=6)
+        elif invoice_rule.period == core_models.InvoiceRule.PERIOD_CHOICES.monthly:
+            date_to = today - timedelta(today.day)
+            date_from = date_to.replace(day=1)
+        else:
+            date_to = today
+            date_from = today - timedelta(days=1)
 
-        for invoice_rule in fortnightly:
-            if invoice_rule.last_invoice_created:
-                last_invoice_date = invoice_rule.last_invoice_created
-                date_from = last_invoice_date - timedelta(days=invoice_rule.period_zero_reference)
-                date_to = date_from + timedelta(14)
-            else:
-                date_to = today - timedelta(invoice_rule.period_zero_reference)
-                date_from = date_to - timedelta(days=14)
+        existing_invoices = core_models.Invoice.objects.filter(
+            models.Q(provider_company=company) |
+            models.Q(customer_company=company),
+            invoice_lines__date__gte=date2utc_date(date_from, company.tz),
+            invoice_lines__date__lte=date2utc_date(date_to, company.tz),
 
-            if date_from.isoweekday() != 1 or today != date_to + timedelta(days=invoice_rule.period_zero_reference):
-                continue
+        )
 
+        if not existing_invoices.exists():
             service.generate_invoice(date_from,
                                      date_to,
                                      company=company,
                                      invoice_rule=invoice_rule)
 
+    fortnightly = core_models.InvoiceRule.objects.filter(
+        period=core_models.InvoiceRule.PERIOD_CHOICES.fortnightly,
+        company=company,
+    )
+
+    for invoice_rule in fortnightly:
+        if invoice_rule.last_invoice_created:
+            last_invoice_date = invoice_rule.last_invoice_created
+            date_from = last_invoice_date - timedelta(days=invoice_rule.period_zero_reference)
+            date_to = date_from + timedelta(14)
+        else:
+            date_to = today - timedelta(invoice_rule.period_zero_reference)
+            date_from = date_to - timedelta(days=14)
+
+        if date_from.isoweekday() != 1 or today != date_to + timedelta(days=invoice_rule.period_zero_reference):
+            continue
+
+        service.generate_invoice(date_from,
+                                 date_to,
+                                 company=company,
+                                 invoice_rule=invoice_rule)
+
+
+@shared_task(queue='hr')
+def generate_invoices():
+    """
+    Dispatch invoice generation for companies with invoice rules due today.
+    """
+    company_ids = [str(company_id) for company_id in get_invoice_due_company_ids(utc_now().date())]
+    if not company_ids:
+        return
+
+    chunks = [
+        company_ids[i:i + INVOICE_COMPANIES_CHUNK_SIZE]
+        for i in range(0, len(company_ids), INVOICE_COMPANIES_CHUNK_SIZE)
+    ]
+
+    chord(
+        generate_companies_invoices.s(chunk) for chunk in chunks
+    )(generate_invoices_summary.s())
+
+
+@shared_task(bind=True, queue='hr', ignore_result=False)
+def generate_companies_invoices(self, company_ids):
+    res = {'processed': 0, 'locked': 0, 'failed': 0}
+
+    for company in core_models.Company.objects.filter(id__in=company_ids):
+        lock_id = 'lock:task:generate_company_invoices:{}'.format(company.id)
+        with memcache_lock(lock_id, self.app.oid) as acquired:
+            if not acquired:
+                res['locked'] += 1
+                continue
+
+            try:
+                generate_company_invoices(company)
+            except Exception:
+                logger.exception('Cannot generate invoices for company %s', company.id)
+                res['failed'] += 1
+            else:
+                res['processed'] += 1
+
+    return res
+
+
+@shared_task(queue='hr')
+def generate_invoices_summary(results):
+    summary = {'processed': 0, 'locked': 0, 'failed': 0}
+    for res in results:
+        for key in summary:
+            summary[key] += res.get(key, 0)
+
+    logger.info(
+        'Invoices generated for %s companies, %s skipped as locked, %s failed',
+        summary['processed'], summary['locked'], summary['failed']
+    )
+    return summary
+
 
 @app.task(bind=True)
 @one_sms_task_at_the_same_time
@@ -1468,9 +1530,16 @@ def send_carrier_list_offer_sms(self, carrier_list_id):
                     skill_translation = carrier_list.skill.name.translation(language=template_language)
                     data_dict['skill'] = skill_translation
 
-                    outstanding_sms = SMSMessage.objects.select_for_update().filter(
-                        text__contains=data_dict['target_date_and_time'],
-                        sent_at__date=date.today(),
+                    # only the latest messages sent to the number are checked
+                    target_date_and_time = data_dict['target_date_and_time']
+                    outstanding_sms = SMSConversation.objects.select_for_update(of=('self',)).filter(
+                        models.Q(
+                            open_message__text__contains=target_date_and_time,
+                            open_message__sent_at__date=date.today(),
+                        ) | models.Q(
+                            closed_message__text__contains=target_date_and_time,
+                            closed_message__sent_at__date=date.today(),
+                        ),
                         to_number=candidate_contact.contact.phone_mobile,
                     ).exists()
                     if not outstanding_sms:
@@ -1509,7 +1578,8 @@ def send_carrier_list_offer_sms(self, carrier_list_id):
 @shared_task
 def check_carrier_list():
     """
-    Checks if carrier list for any of Skills is below minimum and fills it if needed
+    Checks if carrier list for any of Skills is below minimum and fills it if needed.
+    Offers for all Skills are sent with one bulk SMS batch per master company of the candidates.
     """
     tpl_name = 'carrier-list-offer'
     target_date = utc_tomorrow()
@@ -1518,66 +1588,87 @@ def check_carrier_list():
         return
 
     target_date_and_time = timezone.make_aware(tomorrow_7_am())
+    # carrier lists are looked up by the date value the field stores
+    carrier_list_date = hr_models.CarrierList._meta.get_field('target_date').to_python(target_date)
 
-    data_dict = dict(
-        target_date_and_time=date_format(
-            target_date_and_time,
-            settings.DATETIME_FORMAT
-        ),
-        skill='',
-    )
-
+    offers = {}
     skills = Skill.objects.filtered_for_carrier_list(target_date_and_time)
     for skill in skills:
         count = skill.carrier_list_reserve - skill.carrier_list_count
-        data_dict['skill'] = skill
 
         available_candidate_contacts = CandidateContact.filtered_objects.get_available_for_skill(
             skill,
             target_date
-        )[:count]
+        ).select_related('contact', 'recruitment_agent').prefetch_workflow_states()[:count]
 
         # take random guys from available
         for available_candidate_contact in available_candidate_contacts:
             # if available for hire
-            if available_candidate_contact.get_current_state() == 70:
-                try:
-                    with transaction.atomic():
-                        master_company = available_candidate_contact.contact.get_closest_company()
-                        if available_candidate_contact.message_by_sms:
-                            try:
-                                sms_interface = get_sms_service()
-                            except ImportError:
-                                logger.exception('Cannot load SMS service')
-                            else:
-                                template = sms_interface.get_template(available_candidate_contact.contact,
-                                                                      master_company,
-                                                                      tpl_name)
-                                # get skill translation based on template
-                                template_language = template.language.alpha_2
-                                if skill and skill.name:
-                                    skill_translation = skill.name.translation(language=template_language)
-                                    data_dict['skill'] = skill_translation
-                        data_dict['candidate_contact'] = available_candidate_contact
-                        data_dict['recruitment_agent'] = available_candidate_contact.recruitment_agent
-                        data_dict['master_company'] = master_company
-
-                        sent_message = sms_interface.send_tpl(available_candidate_contact.contact,
-                                                              master_company,
-                                                              tpl_name,
-                                                              **data_dict
-                                                              )
+            if available_candidate_contact.message_by_sms and available_candidate_contact.get_current_state() == 70:
+                offers.setdefault(available_candidate_contact.id, (available_candidate_contact, skill))
+
+    listed_candidates = set(hr_models.CarrierList.objects.filter(
+        candidate_contact_id__in=offers.keys(), target_date=carrier_list_date
+    ).values_list('candidate_contact_id', flat=True))
+    offers = [offer for candidate_contact_id, offer in offers.items() if candidate_contact_id not in listed_candidates]
+    if not offers:
+        return
 
-                        carrier_list, created = hr_models.CarrierList.objects.update_or_create(
-                            recruitee_contact=available_candidate_contact,
-                            target_date=target_date,
-                            defaults={'sent_message': sent_message, 'skill': skill}
-                        )
-                        carrier_list.sent_message = sent_message
-                        carrier_list.save(update_fields=['sent_message'])
+    try:
+        sms_interface = get_sms_service()
+    except ImportError:
+        logger.exception('Cannot load SMS service')
+        return
 
-                        sent_message.add_primary_related_object(carrier_list)
-                        sent_message.add_related_objects(available_candidate_contact)
-                        cache.set(sent_message.pk, 'sent_carrier_lists', (sent_message.reply_timeout + 2) * 60)
-                except Exception as e:
-                    logger.error(e)
+    # templates and sender are resolved per master company of the candidates
+    company_offers = {}
+    for candidate_contact, skill in offers:
+        master_company = candidate_contact.contact.get_closest_company()
+        company_offers.setdefault(master_company, []).append((candidate_contact, skill))
+
+    skill_translations = {}
+    for master_company, master_company_offers in company_offers.items():
+        templates = sms_interface.get_templates(
+            [candidate_contact.contact for candidate_contact, _ in master_company_offers], master_company, tpl_name
+        )
+
+        carrier_lists = []
+        messages = []
+        for candidate_contact, skill in master_company_offers:
+            template = templates[candidate_contact.contact.id]
+            if template is None:
+                continue
+
+            # get skill translation based on template
+            translation_key = (skill.id, template.language_id)
+            if translation_key not in skill_translations:
+                skill_translations[translation_key] = skill.name.translation(language=template.language_id)
+
+            carrier_list = hr_models.CarrierList(
+                candidate_contact=candidate_contact, target_date=carrier_list_date, skill=skill
+            )
+            carrier_lists.append(carrier_list)
+            messages.append((candidate_contact.contact, template, dict(
+                target_date_and_time=date_format(target_date_and_time, settings.DATETIME_FORMAT),
+                skill=skill_translations[translation_key],
+                candidate_contact=candidate_contact,
+                recruitment_agent=candidate_contact.recruitment_agent,
+                master_company=master_company,
+                related_obj=carrier_list,
+                related_objs=[candidate_contact],
+            )))
+
+        with transaction.atomic():
+            sent_messages = sms_interface.send_tpl_bulk(messages, master_company)
+
+            # candidates are listed only with the sent offer, failed ones are offered again on the next run
+            sent_carrier_lists = []
+            for carrier_list, sent_message in zip(carrier_lists, sent_messages):
+                if sent_message is None or sent_message.error_code:
+                    continue
+
+                carrier_list.sent_message = sent_message
+                sent_carrier_lists.append(carrier_list)
+                cache.set(sent_message.pk, 'sent_carrier_lists', (sent_message.reply_timeout + 2) * 60)
+
+            hr_models.CarrierList.objects.bulk_create(sent_carrier_lists)
@@ -8,6 +8,9 @@ from freezegun import freeze_time
 
 # from r3sourcer.apps.hr.payment.base import BasePaymentService, calc_worked_delta
 from r3sourcer.apps.hr.payment.base import BasePaymentService
+from r3sourcer.apps.hr.models import TimeSheet
+from r3sourcer.apps.pricing.models import RateCoefficientModifier
+from r3sourcer.apps.pricing.services import CoefficientService
 
 
 hour_1 = timedelta(hours=1)
@@ -176,3 +179,61 @@ class TestInvoiceService:
         ))
 
         assert len(res) == 0
+
+    def test_modifier_index_is_allowance(self, service, rate_coefficient, allowance_rate_coefficient):
+        index = service.modifier_index
+
+        assert index.is_allowance(allowance_rate_coefficient)
+        assert not index.is_allowance(rate_coefficient)
+
+    def test_modifier_index_default_modifier(self, service, rate_coefficient, regular_company):
+        modifier = RateCoefficientModifier.objects.create(
+            type=RateCoefficientModifier.TYPE_CHOICES.company,
+            rate_coefficient=rate_coefficient,
+            multiplier=3,
+            default=True,
+        )
+
+        res = service.modifier_index.get_company_modifier(rate_coefficient, regular_company)
+
+        assert res == modifier
+
+
+@pytest.mark.django_db
+class TestCoefficientServiceCalcMany:
+
+    def test_calc_many(self, timesheet_with_break, master_company, industry):
+        service = CoefficientService()
+
+        res = service.calc_many(TimeSheet.objects.all(), RateCoefficientModifier.TYPE_CHOICES.company)
+
+        assert res == {
+            timesheet_with_break.pk: service.calc(
+                master_company, industry, RateCoefficientModifier.TYPE_CHOICES.company,
+                timesheet_with_break.shift_started_at_tz, timesheet_with_break.shift_duration,
+                break_started=timesheet_with_break.break_started_at_tz,
+                break_ended=timesheet_with_break.break_ended_at_tz,
+            )
+        }
+
+    def test_calc_many_utc_breaks(self, timesheet_with_break, master_company, industry):
+        service = CoefficientService()
+
+        res = service.calc_many(
+            TimeSheet.objects.all(), RateCoefficientModifier.TYPE_CHOICES.company, local_breaks=False
+        )
+
+        assert res == {
+            timesheet_with_break.pk: service.calc(
+                master_company, industry, RateCoefficientModifier.TYPE_CHOICES.company,
+                timesheet_with_break.shift_started_at_tz, timesheet_with_break.shift_duration,
+                break_started=timesheet_with_break.break_started_at,
+                break_ended=timesheet_with_break.break_ended_at,
+            )
+        }
+
+    def test_calc_many_list(self, timesheet_with_break):
+        res = CoefficientService().calc_many([timesheet_with_break], RateCoefficientModifier.TYPE_CHOICES.company)
+
+        assert res[timesheet_with_break.pk] == [{'coefficient': 'base', 'hours': timedelta(hours=7, minutes=30)}]
+
@@ -75,6 +75,37 @@ class TestInvoiceService:
 
         assert len(res) == 0
 
+    @mock.patch.object(InvoiceService, 'calculate')
+    def test_prepare_invoice_incremental(self, mock_calc, service, invoice, regular_company, timesheet_approved,
+                                         vat):
+        line = {
+            'date': date(2017, 1, 2),
+            'units': Decimal('8.00'),
+            'notes': 'notes',
+            'unit_price': Decimal('10.00'),
+            'amount': Decimal('80.00'),
+            'vat': vat,
+            'unit_name': 'hours',
+            'timesheet': timesheet_approved,
+        }
+        mock_calc.return_value = [line], [timesheet_approved]
+
+        service._prepare_invoice(date(2017, 1, 1), date(2017, 1, 7), [timesheet_approved], invoice=invoice,
+                                 company=regular_company)
+        line_ids = set(invoice.invoice_lines.values_list('id', flat=True))
+        service._prepare_invoice(date(2017, 1, 1), date(2017, 1, 7), [timesheet_approved], invoice=invoice,
+                                 company=regular_company)
+
+        assert set(invoice.invoice_lines.values_list('id', flat=True)) == line_ids
+        assert invoice.invoice_lines.get().content_hash == service.get_line_content_hash(line)
+
+        mock_calc.return_value = [dict(line, units=Decimal('7.00'), amount=Decimal('70.00'))], [timesheet_approved]
+        service._prepare_invoice(date(2017, 1, 1), date(2017, 1, 7), [timesheet_approved], invoice=invoice,
+                                 company=regular_company)
+
+        assert invoice.invoice_lines.count() == 1
+        assert invoice.invoice_lines.get().units == Decimal('7.00')
+
     @mock.patch.object(InvoiceService, '_prepare_invoice')
     @mock.patch('r3sourcer.apps.hr.payment.invoices.get_invoice_rule')
     @mock.patch.object(InvoiceService, 'calculate')
@@ -15,8 +15,10 @@ from django_mock_queries.query import MockSet, MockModel
 
 from r3sourcer.apps.hr.models import (
     TimeSheet, JobsiteUnavailability, CandidateEvaluation, JobOffer, ShiftDate, TimeSheetIssue, BlackList,
-    FavouriteList, Job, CarrierList, Shift, JobOfferSMS, NOT_FULFILLED, FULFILLED, LIKELY_FULFILLED, IRRELEVANT
+    FavouriteList, Job, CarrierList, Shift, JobOfferSMS, NOT_FULFILLED, FULFILLED, LIKELY_FULFILLED, IRRELEVANT,
+    CandidateStats,
 )
+from r3sourcer.apps.core.models import Address
 from r3sourcer.helpers.datetimes import utc_tomorrow
 from r3sourcer.helpers.models.abs.timezone_models import TimeZone
 from r3sourcer.apps.hr.models import TimeSheet
@@ -323,6 +325,15 @@ class TestTimesheet:
     def test_get_closest_company(self, timesheet, master_company):
         assert timesheet.get_closest_company() == master_company
 
+    def test_get_closest_company_ids(self, timesheet, master_company):
+        assert TimeSheet.get_closest_company_ids([timesheet]) == {timesheet.pk: master_company.pk}
+
+    def test_prefetch_workflow_states(self, timesheet):
+        timesheet = TimeSheet.objects.filter(id=timesheet.id).prefetch_workflow_states()[0]
+
+        assert '_prefetched_active_states' in timesheet.__dict__
+        assert timesheet.get_active_states_list() == list(timesheet.get_active_states())
+
     @patch.object(TimeSheet, 'is_allowed', return_value=True)
     @patch.object(TimeSheet, 'create_state')
     def test_save_just_added(self, mock_create, mock_allowed, job_offer, company_contact):
@@ -656,6 +667,9 @@ class TestTimeSheetIssue:
     def test_get_closest_company(self, timesheet_issue, master_company):
         assert timesheet_issue.get_closest_company() == master_company
 
+    def test_get_closest_company_ids(self, timesheet_issue, master_company):
+        assert TimeSheetIssue.get_closest_company_ids([timesheet_issue]) == {timesheet_issue.pk: master_company.pk}
+
 
 @pytest.mark.django_db
 class TestCarrierList:
@@ -807,3 +821,51 @@ class TestFavouriteList:
 
         with pytest.raises(ValidationError):
             favourite_list.clean()
+
+
+class TestCandidateStats:
+
+    def test_refreshed_on_timesheet_save(self, timesheet, candidate_contact):
+        stats = CandidateStats.objects.get(candidate_contact=candidate_contact)
+
+        assert stats.timesheets_count == 1
+        assert stats.last_timesheet_date == timesheet.shift_started_at
+        assert stats.average_score == candidate_contact.candidate_scores.average_score
+
+    def test_refreshed_on_timesheet_delete(self, timesheet, candidate_contact):
+        timesheet.delete()
+
+        stats = CandidateStats.objects.get(candidate_contact=candidate_contact)
+        assert stats.timesheets_count == 0
+        assert stats.last_timesheet_date is None
+
+    def test_refreshed_on_timesheet_job_offer_change(self, timesheet, candidate_contact, job_offer_second):
+        timesheet.job_offer = job_offer_second
+        timesheet.save(update_fields=['job_offer'])
+
+        stats = CandidateStats.objects.get(candidate_contact=candidate_contact)
+        assert stats.timesheets_count == 0
+        stats = CandidateStats.objects.get(candidate_contact=job_offer_second.candidate_contact)
+        assert stats.timesheets_count == 1
+
+
+@pytest.mark.django_db
+class TestStoredTimeZone:
+
+    @pytest.fixture
+    def jobsite_address(self, timesheet):
+        address = timesheet.job_offer.shift.date.job.jobsite.address
+        Address.objects.filter(id=address.id).update(time_zone='Australia/Perth')
+        return address
+
+    def test_timesheet_tz_from_selected_address(self, timesheet, jobsite_address, django_assert_num_queries):
+        timesheet = TimeSheet.objects.select_related(TimeSheet.geo_address_path).get(id=timesheet.id)
+
+        with django_assert_num_queries(0):
+            assert timesheet.tz.zone == 'Australia/Perth'
+
+    def test_timesheet_tz_from_geo_query(self, timesheet, jobsite_address, django_assert_num_queries):
+        timesheet = TimeSheet.objects.get(id=timesheet.id)
+
+        with django_assert_num_queries(1):
+            assert timesheet.tz.zone == 'Australia/Perth'
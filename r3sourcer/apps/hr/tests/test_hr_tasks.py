@@ -143,3 +143,33 @@ class TestVOTasks:
             job_offer.id, hr_tasks.send_recurring_jo_confirmation,
             tpl_id='job-offer-recurring', action_sent='offer_sent_by_sms'
         )
+
+
+@pytest.mark.django_db
+class TestGenerateInvoicesTasks:
+
+    def test_get_invoice_due_company_ids(self, invoice_rule_master_company, invoice_rule_company,
+                                         regular_company):
+        invoice_rule_master_company.period_zero_reference = 5
+        invoice_rule_master_company.save()
+
+        # 2017-01-02 is Monday, weekly rules with zero reference in Sunday-Tuesday are candidates
+        res = hr_tasks.get_invoice_due_company_ids(datetime(2017, 1, 2).date())
+
+        assert res == [regular_company.id]
+
+    @mock.patch('r3sourcer.apps.hr.tasks.generate_company_invoices')
+    def test_generate_companies_invoices(self, mock_generate, master_company, regular_company):
+        mock_generate.side_effect = [None, Exception]
+
+        res = hr_tasks.generate_companies_invoices([master_company.id, regular_company.id])
+
+        assert res == {'processed': 1, 'locked': 0, 'failed': 1}
+
+    def test_generate_invoices_summary(self):
+        res = hr_tasks.generate_invoices_summary([
+            {'processed': 2, 'locked': 1, 'failed': 0},
+            {'processed': 1, 'locked': 0, 'failed': 1},
+        ])
+
+        assert res == {'processed': 3, 'locked': 1, 'failed': 1}
@@ -1,9 +1,12 @@
 import time
+import uuid
 
+import mock
 import pytest
 import freezegun
 from datetime import datetime, date, timedelta, time
 from django.utils import timezone
+from filer.models import Folder
 
 from r3sourcer.apps.candidate.models import CandidateContact
 from r3sourcer.apps.core.models import InvoiceRule, Invoice, InvoiceLine
@@ -18,8 +21,18 @@ from r3sourcer.apps.hr.utils.utils import (
 from r3sourcer.apps.hr.utils.job import (
     get_partially_available_candidate_ids_for_vs,
     get_partially_available_candidate_ids, get_partially_available_candidates,
+    HAS_JOBOFFER,
 )
-from r3sourcer.apps.hr.models import TimeSheet
+from r3sourcer.apps.hr.models import TimeSheet, JobOffer, CandidateBusyInterval
+from r3sourcer.apps.hr.utils.availability import get_candidates_busy_reasons, refresh_job_offer_intervals
+from r3sourcer.apps.hr.utils.booking import book_candidates
+from r3sourcer.apps.hr.utils.distances import (
+    refresh_jobsite_distances, refresh_all_distances, filter_contacts_near, get_estimated_distance
+)
+from r3sourcer.apps.core.models import Address, ContactAddress
+from r3sourcer.apps.core.utils.geo import GMapsException, HaversineDistanceProvider
+from r3sourcer.apps.hr.models import ContactJobsiteDistanceCache
+from r3sourcer.apps.hr.utils.pdf import get_pdf_file
 
 fun_test_data = [
     (TimeSheet.today_5_am, timezone.make_aware(datetime(2017, 1, 1, 5, 0))),
@@ -400,3 +413,179 @@ class TestJobUtils():
 
         assert len(candidates) > 0
         assert len(partial) == 1
+
+
+class TestCandidateAvailability:
+
+    def test_job_offer_interval_maintained(self, job_offer_for_candidate):
+        intervals = CandidateBusyInterval.objects.filter(object_id=job_offer_for_candidate.id, reason=HAS_JOBOFFER)
+        assert intervals.count() == 1
+
+        JobOffer.objects.filter(id=job_offer_for_candidate.id).update(status=JobOffer.STATUS_CHOICES.cancelled)
+        refresh_job_offer_intervals([job_offer_for_candidate.id])
+
+        assert not intervals.exists()
+
+    def test_job_offer_interval_removed_on_filled_quota(self, job_offer_for_candidate, candidate_contact_second):
+        job_offer = JobOffer.objects.create(
+            shift=job_offer_for_candidate.shift,
+            candidate_contact=candidate_contact_second,
+        )
+        intervals = CandidateBusyInterval.objects.filter(object_id=job_offer.id, reason=HAS_JOBOFFER)
+        assert intervals.count() == 1
+
+        job_offer_for_candidate._cancel_for_filled_quota()
+
+        job_offer.refresh_from_db()
+        assert job_offer.is_cancelled()
+        assert not intervals.exists()
+        assert CandidateBusyInterval.objects.filter(
+            object_id=job_offer_for_candidate.id, reason=HAS_JOBOFFER
+        ).exists()
+
+    def test_get_candidates_busy_reasons_single_query(self, job_offer_for_candidate, shift_first, shift_second,
+                                                      django_assert_num_queries):
+        shift_starts = {
+            shift.id: datetime.combine(shift.date.shift_date, shift.time) for shift in [shift_first, shift_second]
+        }
+        candidates = CandidateContact.objects.all()
+
+        with django_assert_num_queries(1):
+            busy_reasons = get_candidates_busy_reasons(candidates, shift_starts)
+
+        assert busy_reasons[shift_first.id] == {job_offer_for_candidate.candidate_contact_id: {HAS_JOBOFFER}}
+
+
+class TestBookCandidates:
+
+    @freezegun.freeze_time(datetime(2017, 1, 1, 6))
+    @mock.patch('r3sourcer.apps.hr.tasks.schedule_jo_confirmations.delay')
+    def test_book_candidates(self, mock_schedule, job_with_four_shifts, shift_second, shift_third,
+                             candidate_contact, candidate_contact_second):
+        shifts = [shift_second, shift_third]
+        candidate_ids = [str(candidate_contact.id), str(candidate_contact_second.id)]
+
+        job_offers = book_candidates(job_with_four_shifts, shifts, candidate_ids)
+
+        assert len(job_offers) == 4
+        assert JobOffer.objects.filter(shift__in=shifts).count() == 4
+        assert CandidateBusyInterval.objects.filter(
+            object_id__in=[job_offer.id for job_offer in job_offers], reason=HAS_JOBOFFER
+        ).count() == 4
+        mock_schedule.assert_called_once()
+        assert len(mock_schedule.call_args[0][0]) == 4
+
+    @freezegun.freeze_time(datetime(2017, 1, 1, 6))
+    @mock.patch('r3sourcer.apps.hr.tasks.schedule_jo_confirmations.delay')
+    def test_book_candidates_skips_busy(self, mock_schedule, job_with_four_shifts, shift_second, shift_third,
+                                        candidate_contact):
+        book_candidates(job_with_four_shifts, [shift_second], [str(candidate_contact.id)])
+
+        job_offers = book_candidates(job_with_four_shifts, [shift_second, shift_third], [str(candidate_contact.id)])
+
+        assert [job_offer.shift for job_offer in job_offers] == [shift_third]
+
+
+class TestRefreshJobsiteDistances:
+
+    @pytest.fixture
+    def contact_address(self, contact, address):
+        contact_address = Address.objects.create(
+            street_address='another street', postal_code='654321', city=address.city, state=address.state
+        )
+        Address.objects.filter(id=address.id).update(latitude=-33.86, longitude=151.20)
+        Address.objects.filter(id=contact_address.id).update(latitude=-33.87, longitude=151.21)
+
+        return ContactAddress.objects.create(contact=contact, address=contact_address)
+
+    def test_refresh_distances(self, jobsite, contact, contact_address):
+        jobsite.address.refresh_from_db()
+
+        assert refresh_jobsite_distances(jobsite, [contact.id], HaversineDistanceProvider(), workers=2)
+
+        distance_cache = ContactJobsiteDistanceCache.objects.get(jobsite=jobsite, contact=contact)
+        assert 1000 < distance_cache.distance < 2000
+        assert distance_cache.time > 0
+
+    def test_refresh_distances_stopped(self, jobsite, contact, contact_address):
+        provider = mock.Mock(max_dimensions=25)
+        provider.get_distances.side_effect = GMapsException(Exception('OVER_QUERY_LIMIT'))
+
+        assert not refresh_jobsite_distances(jobsite, [contact.id], provider, workers=2)
+        assert not ContactJobsiteDistanceCache.objects.filter(jobsite=jobsite).exists()
+
+    @mock.patch('r3sourcer.apps.hr.utils.distances.get_distance_provider', side_effect=ValueError)
+    def test_refresh_distances_without_api_key(self, mock_provider, jobsite, contact, contact_address):
+        assert not refresh_jobsite_distances(jobsite, [contact.id])
+        assert not ContactJobsiteDistanceCache.objects.filter(jobsite=jobsite).exists()
+
+    @mock.patch('r3sourcer.apps.hr.utils.distances.get_distance_provider', side_effect=ValueError)
+    def test_refresh_all_distances_without_api_key(self, mock_provider):
+        assert not refresh_all_distances()
+
+    def test_unresolved_distance_marked_attempted(self, jobsite, contact, contact_address):
+        distance_cache = ContactJobsiteDistanceCache.objects.create(
+            jobsite=jobsite, contact=contact, distance=1500, time=300
+        )
+        ContactJobsiteDistanceCache.objects.filter(id=distance_cache.id).update(
+            updated_at=timezone.now() - timedelta(days=7)
+        )
+        provider = mock.Mock(max_dimensions=25)
+        provider.get_distances.return_value = [{'distance': None, 'duration': None}]
+
+        assert refresh_jobsite_distances(jobsite, [contact.id], provider, workers=2)
+
+        updated_cache = ContactJobsiteDistanceCache.objects.get(id=distance_cache.id)
+        assert updated_cache.distance == 1500
+        assert updated_cache.updated_at > timezone.now() - timedelta(days=1)
+
+    def test_filter_contacts_near(self, jobsite, candidate_contact, contact_address):
+        jobsite.address.refresh_from_db()
+        candidate_contacts = CandidateContact.objects.filter(id=candidate_contact.id)
+
+        assert filter_contacts_near(candidate_contacts, jobsite.address, 5000).exists()
+        assert not filter_contacts_near(candidate_contacts, jobsite.address, 500).exists()
+
+    def test_estimated_distance(self, jobsite, candidate_contact, contact_address):
+        jobsite.address.refresh_from_db()
+
+        candidate = CandidateContact.objects.annotate(
+            estimated_distance=get_estimated_distance(jobsite.address)
+        ).get(id=candidate_contact.id)
+
+        assert 1000 < candidate.estimated_distance < 2000
+
+
+@pytest.mark.django_db
+class TestGetPdfFile:
+
+    @pytest.fixture
+    def folder(self):
+        return Folder.objects.create(name='invoices')
+
+    @pytest.fixture
+    def html(self):
+        return '<p>{}</p>'.format(uuid.uuid4())
+
+    @mock.patch('r3sourcer.apps.hr.utils.pdf.render_pdf', return_value=b'%PDF-1.4')
+    def test_identical_document_not_rendered(self, mock_render_pdf, folder, html):
+        file_obj = get_pdf_file(html, folder, 'invoice.pdf')
+
+        assert get_pdf_file(html, folder, 'invoice.pdf') == file_obj
+        assert mock_render_pdf.call_count == 1
+
+    @mock.patch('r3sourcer.apps.hr.utils.pdf.render_pdf', return_value=b'%PDF-1.4')
+    def test_identical_document_copied(self, mock_render_pdf, folder, html):
+        file_obj = get_pdf_file(html, folder, 'invoice.pdf')
+        copied_file_obj = get_pdf_file(html, folder, 'invoice_copy.pdf')
+
+        assert copied_file_obj != file_obj
+        assert copied_file_obj.name == 'invoice_copy.pdf'
+        assert mock_render_pdf.call_count == 1
+
+    @mock.patch('r3sourcer.apps.hr.utils.pdf.render_pdf', return_value=b'%PDF-1.4')
+    def test_changed_document_rendered(self, mock_render_pdf, folder, html):
+        get_pdf_file(html, folder, 'invoice.pdf')
+        get_pdf_file(html + '<p>changed</p>', folder, 'invoice.pdf')
+
+        assert mock_render_pdf.call_count == 2
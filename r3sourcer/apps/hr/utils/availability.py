@@ -0,0 +1,178 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .job import HAS_JOBOFFER, HAS_TIMESHEET, UNAVAILABLE
+
+
+def _make_aware(value):
+    """
+    Naive datetimes are compared in default time zone as the database does for naive lookups
+    """
+    if timezone.is_naive(value):
+        return timezone.make_aware(value, timezone.get_default_timezone())
+
+    return value
+
+
+def _sync_intervals(reason, object_ids, intervals):
+    """
+    Replaces stored busy intervals of the objects with the actual ones
+    :param reason: reason of the intervals
+    :param object_ids: ids of the refreshed objects
+    :param intervals: list of (object_id, candidate_contact_id, busy_from, busy_until) tuples
+    """
+    from r3sourcer.apps.hr.models import CandidateBusyInterval
+
+    object_ids = set(object_ids)
+    if not object_ids:
+        return
+
+    actual = {
+        (object_id, candidate_contact_id): (busy_from, busy_until)
+        for object_id, candidate_contact_id, busy_from, busy_until in intervals
+    }
+    stored = {
+        (object_id, candidate_contact_id): (pk, busy_from, busy_until)
+        for pk, object_id, candidate_contact_id, busy_from, busy_until in CandidateBusyInterval.objects.filter(
+            reason=reason, object_id__in=object_ids
+        ).values_list('id', 'object_id', 'candidate_contact_id', 'busy_from', 'busy_until')
+    }
+
+    outdated_ids = [
+        pk for key, (pk, busy_from, busy_until) in stored.items() if actual.get(key) != (busy_from, busy_until)
+    ]
+    if outdated_ids:
+        CandidateBusyInterval.objects.filter(id__in=outdated_ids).delete()
+
+    new_intervals = [
+        CandidateBusyInterval(
+            reason=reason, object_id=object_id, candidate_contact_id=candidate_contact_id,
+            busy_from=busy_from, busy_until=busy_until,
+        ) for (object_id, candidate_contact_id), (busy_from, busy_until) in actual.items()
+        if stored.get((object_id, candidate_contact_id), (None, ))[1:] != (busy_from, busy_until)
+    ]
+    if new_intervals:
+        CandidateBusyInterval.objects.bulk_create(new_intervals)
+
+
+def refresh_job_offer_intervals(job_offer_ids):
+    """
+    Stores shift start of undefined and accepted job offers as candidate busy intervals
+    """
+    from r3sourcer.apps.hr.models import JobOffer
+
+    job_offers = JobOffer.objects.filter(
+        id__in=job_offer_ids,
+        status__in=[JobOffer.STATUS_CHOICES.undefined, JobOffer.STATUS_CHOICES.accepted],
+    ).values_list('id', 'candidate_contact_id', 'shift__date__shift_date', 'shift__time')
+
+    intervals = []
+    for job_offer_id, candidate_contact_id, shift_date, shift_time in job_offers:
+        shift_start = _make_aware(datetime.combine(shift_date, shift_time))
+        intervals.append((job_offer_id, candidate_contact_id, shift_start, shift_start))
+
+    _sync_intervals(HAS_JOBOFFER, job_offer_ids, intervals)
+
+
+def refresh_shift_job_offer_intervals(**shift_lookup):
+    from r3sourcer.apps.hr.models import JobOffer
+
+    refresh_job_offer_intervals(list(JobOffer.objects.filter(**shift_lookup).values_list('id', flat=True)))
+
+
+def refresh_time_sheet_intervals(time_sheet_ids):
+    """
+    Stores shift start of the timesheets as candidate busy intervals
+    """
+    from r3sourcer.apps.hr.models import TimeSheet
+
+    time_sheets = TimeSheet.objects.filter(
+        id__in=time_sheet_ids, shift_started_at__isnull=False
+    ).values_list('id', 'job_offer__candidate_contact_id', 'shift_started_at')
+
+    intervals = [
+        (time_sheet_id, candidate_contact_id, shift_started_at, shift_started_at)
+        for time_sheet_id, candidate_contact_id, shift_started_at in time_sheets
+    ]
+
+    _sync_intervals(HAS_TIMESHEET, time_sheet_ids, intervals)
+
+
+def refresh_unavailability_intervals(unavailability_ids):
+    """
+    Stores contact unavailability dates as busy intervals of all candidates of the contact
+    """
+    from r3sourcer.apps.core.models import ContactUnavailability
+
+    unavailabilities = ContactUnavailability.objects.filter(
+        id__in=unavailability_ids,
+        unavailable_from__isnull=False,
+        unavailable_until__isnull=False,
+        contact__candidate_contacts__isnull=False,
+    ).values_list('id', 'contact__candidate_contacts', 'unavailable_from', 'unavailable_until')
+
+    intervals = [
+        (
+            unavailability_id, candidate_contact_id,
+            _make_aware(datetime.combine(unavailable_from, time.min)),
+            _make_aware(datetime.combine(unavailable_until, time.max)),
+        ) for unavailability_id, candidate_contact_id, unavailable_from, unavailable_until in unavailabilities
+    ]
+
+    _sync_intervals(UNAVAILABLE, unavailability_ids, intervals)
+
+
+def delete_intervals(reason, object_ids):
+    from r3sourcer.apps.hr.models import CandidateBusyInterval
+
+    CandidateBusyInterval.objects.filter(reason=reason, object_id__in=object_ids).delete()
+
+
+def get_candidates_busy_reasons(candidate_contacts, shift_starts):
+    """
+    Gets reasons why candidates can't be booked for the shifts with one range query
+    :param candidate_contacts: queryset of CandidateContacts to search for
+    :param shift_starts: dict of the naive shift start datetimes by shift key
+    :return: dict of {shift_key: {candidate_contact_id: set of reasons}}
+    """
+    from r3sourcer.apps.hr.models import CandidateBusyInterval
+
+    result = {key: defaultdict(set) for key in shift_starts}
+    if not shift_starts:
+        return result
+
+    delta = timedelta(hours=settings.VACANCY_FILLING_TIME_DELTA)
+    windows = {}
+    query = Q()
+    for key, shift_start in shift_starts.items():
+        shift_start = _make_aware(shift_start)
+        windows[key] = (shift_start - delta, shift_start, shift_start + delta)
+        query |= Q(
+            reason__in=[HAS_JOBOFFER, HAS_TIMESHEET],
+            busy_from__lte=shift_start + delta,
+            busy_until__gte=shift_start - delta,
+        ) | Q(
+            reason=UNAVAILABLE,
+            busy_from__lte=shift_start,
+            busy_until__gte=shift_start,
+        )
+
+    intervals = CandidateBusyInterval.objects.filter(
+        query, candidate_contact__in=candidate_contacts
+    ).values_list('candidate_contact_id', 'reason', 'busy_from', 'busy_until')
+
+    for candidate_contact_id, reason, busy_from, busy_until in intervals:
+        for key, (from_date, shift_start, to_date) in windows.items():
+            if reason == UNAVAILABLE:
+                is_busy = busy_from <= shift_start <= busy_until
+            else:
+                is_busy = busy_from <= to_date and busy_until >= from_date
+
+            if is_busy:
+                result[key][candidate_contact_id].add(reason)
+
+    return result
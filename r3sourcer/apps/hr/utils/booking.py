@@ -0,0 +1,148 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+
+from r3sourcer.helpers.datetimes import tz2utc
+
+from .availability import get_candidates_busy_reasons, refresh_job_offer_intervals
+
+
+def _get_offers_history(job, candidate_contacts):
+    """
+    Loads shift dates, times and statuses of the candidates' job offers for the job
+    :return: dict of {candidate_contact_id: list of (shift_date, shift_time, status) tuples}
+    """
+    history = defaultdict(list)
+    job_offers = job.get_job_offers().filter(
+        candidate_contact__in=candidate_contacts
+    ).values_list('candidate_contact_id', 'shift__date__shift_date', 'shift__time', 'status')
+
+    for candidate_contact_id, shift_date, shift_time, status in job_offers:
+        history[candidate_contact_id].append((shift_date, shift_time, status))
+
+    return history
+
+
+def _has_other_offers(job_offer, offers_history):
+    """
+    In memory version of JobOffer.has_future_accepted_jo() or JobOffer.has_previous_jo() checks
+    """
+    from r3sourcer.apps.hr.models import JobOffer
+
+    shift_date, shift_time = job_offer.shift.date.shift_date, job_offer.shift.time
+    now = job_offer.now_tz
+    today, now_time = now.date(), now.time()
+
+    for offer_date, offer_time, status in offers_history:
+        if status == JobOffer.STATUS_CHOICES.accepted and offer_date >= shift_date and offer_time > shift_time:
+            return True
+
+        is_upcoming = offer_date > today or (offer_date == today and offer_time >= now_time)
+        is_earlier = offer_date < shift_date or (offer_date == shift_date and offer_time <= shift_time)
+        if is_upcoming and is_earlier:
+            return True
+
+    return False
+
+
+def book_candidates(job, shifts, candidate_ids):
+    """
+    Creates job offers for all available (candidate, shift) pairs at once.
+
+    Availability of all pairs is checked with one query, offers are inserted in bulk
+    and their confirmation SMS are scheduled by one batched task.
+
+    :param job: Job of the shifts
+    :param shifts: list of Shifts with selected dates ordered by start
+    :param candidate_ids: ids of CandidateContacts to book
+    :return: list of created JobOffers
+    """
+    from r3sourcer.apps.candidate.models import CandidateContact
+    from r3sourcer.apps.hr.models import CarrierList, JobOffer
+    from r3sourcer.apps.hr.tasks import schedule_jo_confirmations
+
+    candidates = {
+        str(candidate.id): candidate
+        for candidate in CandidateContact.objects.filter(id__in=candidate_ids).select_related('contact')
+    }
+    if not candidates or not shifts:
+        return []
+
+    delta = timedelta(hours=settings.VACANCY_FILLING_TIME_DELTA)
+    shift_starts = {shift.id: datetime.combine(shift.date.shift_date, shift.time) for shift in shifts}
+    busy_reasons = get_candidates_busy_reasons(list(candidates.values()), shift_starts)
+    offers_history = _get_offers_history(job, list(candidates.values()))
+
+    job_offers = []
+    confirmation_tasks = {}
+    for candidate_id in dict.fromkeys(str(candidate_id) for candidate_id in candidate_ids):
+        candidate = candidates.get(candidate_id)
+        if candidate is None:
+            continue
+
+        history = offers_history[candidate.id]
+        booked_starts = []
+        for shift in shifts:
+            shift_start = shift_starts[shift.id]
+            if busy_reasons[shift.id].get(candidate.id):
+                continue
+
+            # offers booked earlier in this batch make the candidate busy as well
+            if any(abs(shift_start - booked_start) <= delta for booked_start in booked_starts):
+                continue
+
+            booked_starts.append(shift_start)
+
+            job_offer = JobOffer(shift=shift, candidate_contact=candidate)
+            job_offer.tz = job.tz
+
+            shift_date = shift.date.shift_date
+            is_first = not any(offer_date < shift_date for offer_date, _, _ in history)
+            is_recurring = any(
+                offer_date < shift_date and status == JobOffer.STATUS_CHOICES.accepted
+                for offer_date, _, status in history
+            )
+            history.append((shift_date, shift.time, job_offer.status))
+
+            eta = job_offer.get_confirmation_eta(has_other_offers=_has_other_offers(job_offer, history))
+            if eta:
+                job_offer.scheduled_sms_datetime = tz2utc(eta)
+                confirmation_tasks[job_offer.id] = job_offer.get_confirmation_task(is_first, is_recurring)
+
+            job_offers.append(job_offer)
+
+    if not job_offers:
+        return []
+
+    JobOffer.objects.bulk_create(job_offers)
+    refresh_job_offer_intervals([job_offer.id for job_offer in job_offers])
+
+    # target date lookup is made the same way as in JobOffer.save()
+    to_target_date = CarrierList._meta.get_field('target_date').to_python
+    target_dates = {job_offer.id: to_target_date(job_offer.start_time_utc) for job_offer in job_offers}
+    carrier_list_targets = set(CarrierList.objects.filter(
+        candidate_contact__in=list(candidates.values()),
+        target_date__in=set(target_dates.values()),
+    ).values_list('candidate_contact_id', 'target_date'))
+    for job_offer in job_offers:
+        if (job_offer.candidate_contact_id, target_dates[job_offer.id]) in carrier_list_targets:
+            job_offer.move_candidate_to_carrier_list(new_offer=True)
+
+    master_companies = {}
+    confirmations = []
+    for job_offer in job_offers:
+        task = confirmation_tasks.get(job_offer.id)
+        if task is None:
+            continue
+
+        candidate = job_offer.candidate_contact
+        if candidate.id not in master_companies:
+            master_companies[candidate.id] = candidate.contact.get_closest_company()
+
+        confirmations.append((str(job_offer.id), str(master_companies[candidate.id].id), task.name))
+
+    if confirmations:
+        schedule_jo_confirmations.delay(confirmations)
+
+    return job_offers
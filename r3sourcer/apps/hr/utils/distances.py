@@ -0,0 +1,291 @@
+import logging
+import math
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, FloatField, Func, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast
+
+from r3sourcer.apps.core.utils.companies import get_site_master_company
+from r3sourcer.apps.core.utils.geo import (
+    EARTH_RADIUS, GMapsException, GeoPoint, MODE_TRANSIT, get_bounding_box, get_distance_provider
+)
+from r3sourcer.helpers.datetimes import utc_now
+
+
+log = logging.getLogger(__name__)
+
+DISTANCE_REFRESH_STARTED_KEY = 'hr_distance_refresh_started_at'
+METERS_PER_DEGREE = EARTH_RADIUS * math.pi / 180
+
+
+def get_address_point(address):
+    return GeoPoint(address.get_full_address(), address.latitude, address.longitude)
+
+
+def load_contact_points(contact_ids):
+    """
+    Loads active addresses of the contacts with one query
+    :return: dict of {contact_id: GeoPoint}
+    """
+    from r3sourcer.apps.core.models import ContactAddress
+
+    contact_addresses = ContactAddress.objects.filter(
+        contact_id__in=contact_ids, is_active=True
+    ).select_related('address__city', 'address__state', 'address__country').order_by('pk')
+
+    points = {}
+    for contact_address in contact_addresses:
+        if contact_address.contact_id not in points:
+            points[contact_address.contact_id] = get_address_point(contact_address.address)
+
+    return points
+
+
+def load_travel_modes(contact_ids):
+    """
+    Gets distance matrix travel mode of the contacts by their candidate transportation
+    :return: dict of {contact_id: mode}
+    """
+    from r3sourcer.apps.candidate.models import CandidateContact
+
+    candidates = CandidateContact.objects.filter(
+        contact_id__in=contact_ids, candidate_rels__master_company=get_site_master_company()
+    ).order_by('pk').values_list('contact_id', 'transportation_to_work')
+
+    modes = {}
+    for contact_id, transportation_to_work in candidates:
+        if contact_id not in modes:
+            is_public = transportation_to_work == CandidateContact.TRANSPORTATION_CHOICES.public
+            modes[contact_id] = MODE_TRANSIT if is_public else None
+
+    return modes
+
+
+def save_distances(jobsite, distances):
+    """
+    Upserts calculated distances of the jobsite
+    :param distances: dict of {contact_id: {"distance", "duration"}}
+    """
+    from r3sourcer.apps.hr.models import ContactJobsiteDistanceCache
+
+    resolved = {}
+    unresolved_contact_ids = []
+    for contact_id, distance in distances.items():
+        if distance and distance['distance']:
+            resolved[contact_id] = distance
+        else:
+            unresolved_contact_ids.append(contact_id)
+
+    with transaction.atomic():
+        if unresolved_contact_ids:
+            mark_distances_attempted(jobsite, unresolved_contact_ids)
+
+        if not resolved:
+            return
+
+        ContactJobsiteDistanceCache.objects.filter(jobsite=jobsite, contact_id__in=resolved.keys()).delete()
+        ContactJobsiteDistanceCache.objects.bulk_create([
+            ContactJobsiteDistanceCache(
+                jobsite=jobsite, contact_id=contact_id, distance=distance['distance'], time=distance['duration']
+            ) for contact_id, distance in resolved.items()
+        ])
+
+
+def mark_distances_attempted(jobsite, contact_ids):
+    """
+    Touches cached distances the provider can't calculate, so resumed refresh doesn't request them again
+    """
+    from r3sourcer.apps.hr.models import ContactJobsiteDistanceCache
+
+    ContactJobsiteDistanceCache.objects.filter(
+        jobsite=jobsite, contact_id__in=contact_ids
+    ).update(updated_at=utc_now())
+
+
+def get_provider():
+    """
+    Configured distance matrix provider or None if it can't be created
+    """
+    try:
+        return get_distance_provider()
+    except ValueError as e:
+        # client is not created without Distance Matrix API key
+        log.warning('Distance provider is not available: %s', e)
+
+
+def refresh_jobsite_distances(jobsite, contact_ids, provider=None, workers=None):
+    """
+    Calculates and saves distances between jobsite and contacts.
+
+    Contacts are grouped by travel mode and split into chunks of the provider matrix size,
+    chunks are requested by the thread pool and saved as soon as they are calculated so
+    stopped refresh doesn't lose finished chunks.
+
+    :param jobsite: jobsite object
+    :param contact_ids: ids of the contacts
+    :param provider: distance matrix provider, configured provider by default
+    :param workers: size of the thread pool
+    :return: limit of queries is not reached
+    """
+    jobsite_address = jobsite.get_address()
+    if jobsite_address is None:
+        return True
+
+    provider = provider or get_provider()
+    if provider is None:
+        return False
+
+    workers = workers or settings.DISTANCE_REFRESH_WORKERS
+
+    points = load_contact_points(contact_ids)
+    modes = load_travel_modes(points.keys())
+
+    contacts_by_mode = defaultdict(list)
+    for contact_id in points:
+        contacts_by_mode[modes.get(contact_id)].append(contact_id)
+
+    chunks = []
+    for mode, mode_contact_ids in contacts_by_mode.items():
+        for i in range(0, len(mode_contact_ids), provider.max_dimensions):
+            chunks.append((mode, mode_contact_ids[i:i + provider.max_dimensions]))
+
+    origin = get_address_point(jobsite_address)
+
+    def calculate_chunk(mode, chunk_contact_ids):
+        distances = provider.get_distances(origin, [points[contact_id] for contact_id in chunk_contact_ids], mode)
+        return dict(zip(chunk_contact_ids, distances))
+
+    is_finished = True
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(calculate_chunk, mode, chunk_contact_ids): chunk_contact_ids
+            for mode, chunk_contact_ids in chunks
+        }
+
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+
+            try:
+                distances = future.result()
+            except GMapsException as e:
+                if e.code == GMapsException.INVALID_REQUEST[1]:
+                    log.warning('Distances for jobsite %s cannot be calculated: %s', jobsite.id, e)
+                    mark_distances_attempted(jobsite, futures[future])
+                    continue
+
+                log.warning('Distance refresh of jobsite %s is stopped: %s', jobsite.id, e)
+                is_finished = False
+                for pending in futures:
+                    pending.cancel()
+                continue
+
+            save_distances(jobsite, distances)
+
+    return is_finished
+
+
+def refresh_all_distances(provider=None, workers=None):
+    """
+    Refreshes all cached contact to jobsite distances.
+
+    Start time of the refresh is stored in the cache until all distances are refreshed, so the
+    refresh stopped by provider limits continues with distances not updated since that time.
+
+    :return: all distances are refreshed
+    """
+    from r3sourcer.apps.hr.models import ContactJobsiteDistanceCache, Jobsite
+
+    started_at = cache.get(DISTANCE_REFRESH_STARTED_KEY)
+    if started_at is None:
+        started_at = utc_now()
+        cache.set(DISTANCE_REFRESH_STARTED_KEY, started_at, None)
+
+    outdated = defaultdict(list)
+    for jobsite_id, contact_id in ContactJobsiteDistanceCache.objects.filter(
+        updated_at__lt=started_at
+    ).values_list('jobsite_id', 'contact_id'):
+        outdated[jobsite_id].append(contact_id)
+
+    provider = provider or get_provider()
+    if provider is None:
+        return False
+
+    jobsites = Jobsite.objects.filter(id__in=outdated.keys()).select_related(
+        'address__city', 'address__state', 'address__country'
+    )
+    for jobsite in jobsites:
+        address = jobsite.get_address()
+        if address is None or (address.latitude == 0 and address.longitude == 0):
+            continue
+
+        if not refresh_jobsite_distances(jobsite, outdated[jobsite.id], provider, workers):
+            return False
+
+    cache.delete(DISTANCE_REFRESH_STARTED_KEY)
+    return True
+
+
+def straight_line_distance(latitude, longitude, latitude_field='latitude', longitude_field='longitude'):
+    """
+    Database expression of the straight line distance in meters from the point to the coordinate fields.
+    Uses equirectangular projection which is precise enough for city scale distances.
+    """
+    longitude_scale = math.cos(math.radians(float(latitude)))
+    delta_latitude = F(latitude_field) - Value(float(latitude))
+    delta_longitude = (F(longitude_field) - Value(float(longitude))) * Value(longitude_scale)
+
+    distance = Func(
+        Func(delta_latitude, Value(2), function='POWER') + Func(delta_longitude, Value(2), function='POWER'),
+        function='SQRT'
+    ) * Value(METERS_PER_DEGREE)
+
+    return Cast(ExpressionWrapper(distance, output_field=FloatField()), IntegerField())
+
+
+def get_located_contact_addresses():
+    from r3sourcer.apps.core.models import ContactAddress
+
+    return ContactAddress.objects.filter(is_active=True).exclude(address__latitude=0, address__longitude=0)
+
+
+def get_estimated_distance(address, contact_ref='contact'):
+    """
+    Subquery of the straight line distance from the address to the active address of the contact
+    """
+    contact_addresses = get_located_contact_addresses().filter(
+        contact=OuterRef(contact_ref)
+    ).order_by('pk').annotate(
+        estimated_distance=straight_line_distance(
+            address.latitude, address.longitude, 'address__latitude', 'address__longitude'
+        )
+    )
+
+    return Subquery(contact_addresses.values('estimated_distance')[:1], output_field=IntegerField())
+
+
+def filter_contacts_near(queryset, address, radius, contact_field='contact'):
+    """
+    Excludes objects whose contact active address is outside of the bounding box of the radius.
+
+    Road distance is never shorter than the straight line, so nothing within the radius is lost.
+    Objects of contacts without known location are kept.
+    """
+    min_latitude, max_latitude, min_longitude, max_longitude = get_bounding_box(
+        address.latitude, address.longitude, radius
+    )
+    located_contacts = get_located_contact_addresses()
+    nearby_contacts = located_contacts.filter(
+        address__latitude__range=(min_latitude, max_latitude),
+        address__longitude__range=(min_longitude, max_longitude),
+    )
+    contact_id_field = '{}_id__in'.format(contact_field)
+
+    return queryset.filter(
+        Q(**{contact_id_field: nearby_contacts.values('contact_id')}) |
+        ~Q(**{contact_id_field: located_contacts.values('contact_id')})
+    )
@@ -1,7 +1,5 @@
-from datetime import timedelta, datetime
-from collections import defaultdict
+from datetime import datetime
 
-from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.db.models import Q, Count
 
@@ -57,48 +55,25 @@ def get_partially_available_candidate_ids_for_vs(candidate_contacts, shift_date,
     :param shift_start_time: shift_start_time value of ShiftDate
     :return: set of ids of unavailable or partially available recruits
     """
-    from r3sourcer.apps.hr.models import JobOffer
+    from r3sourcer.apps.hr.utils.availability import get_candidates_busy_reasons
 
     shift_start_time = datetime.combine(shift_date, shift_time)
 
-    from_date = shift_start_time - timedelta(hours=settings.VACANCY_FILLING_TIME_DELTA)
-    to_date = shift_start_time + timedelta(hours=settings.VACANCY_FILLING_TIME_DELTA)
-    candidate_ids = defaultdict(set)
-
-    candidate_ids = update_unavailable_reason(candidate_ids, candidate_contacts.filter(
-        Q(job_offers__shift__date__shift_date=from_date.date(),
-          job_offers__shift__time__gte=from_date.timetz()) |
-        Q(job_offers__shift__date__shift_date__gt=from_date.date()),
-        Q(job_offers__shift__date__shift_date=to_date.date(),
-          job_offers__shift__time__lte=to_date.timetz()) |
-        Q(job_offers__shift__date__shift_date__lt=to_date.date()),
-        Q(job_offers__status=JobOffer.STATUS_CHOICES.accepted) |
-        Q(job_offers__status=JobOffer.STATUS_CHOICES.undefined)
-    ).values_list('id', flat=True), HAS_JOBOFFER)
-
-    candidate_ids = update_unavailable_reason(
-        candidate_ids, candidate_contacts.filter(
-            job_offers__time_sheets__shift_started_at__range=[from_date, to_date]
-        ).values_list('id', flat=True), HAS_TIMESHEET
-    )
-
-    candidate_ids = update_unavailable_reason(
-        candidate_ids, candidate_contacts.filter(
-            contact__contact_unavailabilities__unavailable_from__lte=shift_start_time,
-            contact__contact_unavailabilities__unavailable_until__gte=shift_start_time,
-        ).values_list('id', flat=True), UNAVAILABLE
-    )
-
-    return candidate_ids
+    return get_candidates_busy_reasons(candidate_contacts, {shift_start_time: shift_start_time})[shift_start_time]
 
 
 def get_partially_available_candidate_ids(candidate_contacts, job_shifts):
-    partial = {}
+    from r3sourcer.apps.hr.utils.availability import get_candidates_busy_reasons
 
+    job_shifts = list(job_shifts)
+    busy_reasons = get_candidates_busy_reasons(candidate_contacts, {
+        job_shift.id: datetime.combine(job_shift.date.shift_date, job_shift.time) for job_shift in job_shifts
+    })
+
+    partial = {}
     for job_shift in job_shifts:
-        vs_id, shift_time, shift_date = job_shift.id, job_shift.time, job_shift.date.shift_date
-        partially_available = get_partially_available_candidate_ids_for_vs(candidate_contacts, shift_date, shift_time)
-        for candidate_id, reasons in partially_available.items():
+        vs_id = job_shift.id
+        for candidate_id, reasons in busy_reasons[vs_id].items():
             if candidate_id not in partial:
                 partial[candidate_id] = {
                     'reasons': reasons,
@@ -0,0 +1,66 @@
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from filer.models import File
+
+
+logger = logging.getLogger(__name__)
+
+PDF_FILE_CACHE_KEY = 'hr_pdf_file_{}'
+PDF_RENDER_VERSION = 1
+
+
+def render_pdf(html):
+    """
+    Renders HTML to PDF.
+
+    :param html: HTML string
+    :return: PDF bytes
+    """
+    import weasyprint
+
+    return weasyprint.HTML(string=html).write_pdf()
+
+
+def get_content_hash(html):
+    return hashlib.sha256('{}:{}'.format(PDF_RENDER_VERSION, html).encode('utf-8')).hexdigest()
+
+
+def _read_file(file_obj):
+    try:
+        with file_obj.file.open('rb') as pdf_file:
+            return pdf_file.read()
+    except (IOError, OSError, ValueError):
+        logger.warning('Cannot read cached PDF file %s', file_obj.id)
+
+
+def get_pdf_file(html, folder, file_name):
+    """
+    Gets filer File with PDF of the HTML.
+
+    Files are cached by hash of the HTML, identical documents are served from the existing file
+    or copied from its storage instead of being rendered again.
+
+    :param html: rendered HTML of the document
+    :param folder: filer Folder of the file
+    :param file_name: name of the file
+    :return: filer File
+    """
+    cache_key = PDF_FILE_CACHE_KEY.format(get_content_hash(html))
+    cached_file_id = cache.get(cache_key)
+    cached_file = cached_file_id and File.objects.filter(id=cached_file_id).first()
+
+    if cached_file and cached_file.folder_id == folder.id and cached_file.name == file_name:
+        return cached_file
+
+    content = cached_file and _read_file(cached_file)
+    if not content:
+        content = render_pdf(html)
+
+    file_obj = File.objects.create(folder=folder, name=file_name, file=ContentFile(content, name=file_name))
+    cache.set(cache_key, file_obj.id, settings.PDF_FILE_CACHE_TIMEOUT)
+
+    return file_obj
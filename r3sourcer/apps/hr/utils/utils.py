@@ -1,5 +1,4 @@
 import logging
-from collections import defaultdict
 from datetime import timedelta
 from functools import reduce
 from itertools import chain
@@ -11,12 +10,9 @@ from django.template.defaulttags import register
 from django.templatetags.static import static
 from django.utils import formats
 
-from r3sourcer.apps.candidate.models import CandidateContact
 from r3sourcer.apps.core.models import InvoiceRule, Invoice, CompanyContact
-from r3sourcer.apps.core.utils.geo import calc_distance, MODE_TRANSIT, MAX_DIMENSIONS
 from r3sourcer.celeryapp import app
 from r3sourcer.helpers.datetimes import utc_now, date2utc_date
-from r3sourcer.apps.core.utils.companies import get_site_master_company
 
 log = logging.getLogger(__name__)
 
@@ -55,21 +51,6 @@ def get_payslip_rule(company):
         return master_company.payslip_rules.first()
 
 
-def create_or_update_distance_cache(contact, jobsite, distance):
-    from ..models import ContactJobsiteDistanceCache
-    if distance != -1 and distance["distance"]:
-        updated_values = {
-            "jobsite": jobsite,
-            "contact": contact,
-            "distance": distance["distance"],
-            "time": distance["duration"]
-        }
-
-        obj, created = ContactJobsiteDistanceCache.objects.update_or_create(
-            jobsite=jobsite, contact=contact, defaults=updated_values
-        )
-
-
 def calculate_distances_for_jobsite(contacts, jobsite):
     """
     Calculates and save distances between jobsite and contacts
@@ -77,42 +58,9 @@ def calculate_distances_for_jobsite(contacts, jobsite):
     :param jobsite: jobsite object
     :return: limit of queries is not reached
     """
-    contacts_dict = defaultdict(list)
-    for contact in contacts:
-        candidate = contact.candidate_contacts.filter(candidate_rels__master_company=get_site_master_company()).first()
-        is_public = candidate.transportation_to_work == CandidateContact.TRANSPORTATION_CHOICES.public
-        if hasattr(contact, 'candidate_contacts') and is_public:
-            contacts_dict[MODE_TRANSIT].append(contact)
-        else:
-            contacts_dict[None].append(contact)
-
-    for mode, contact_list in contacts_dict.items():
-        addresses = []
-        for contact in contact_list:
-            active_address = contact.active_address
-            if active_address:
-                addresses.append(active_address.get_full_address())
-
-        jobsite_address = jobsite.get_address()
-        if jobsite_address is None:
-            continue
-
-        s = 0
-        while s < len(addresses):
-            segments = addresses[s:s + MAX_DIMENSIONS]
-            s = s + MAX_DIMENSIONS
-
-            result = calc_distance(jobsite_address.get_full_address(), segments, mode=mode)
-            if not result:
-                return bool(result)
-
-            if len(contact_list) == 1:
-                result = [result]
-
-            for distance, contact in zip(result[0], contact_list):
-                create_or_update_distance_cache(contact, jobsite, distance)
+    from .distances import refresh_jobsite_distances
 
-    return True
+    return refresh_jobsite_distances(jobsite, [contact.id for contact in contacts])
 
 
 def send_jo_rejection(job_offer):  # pragme: no cover
@@ -0,0 +1,169 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import LogHistory
+
+
+logger = logging.getLogger(__name__)
+
+
+class LogBuffer(object):
+    """
+    Accumulates LogHistory rows and writes them to ClickHouse in batches.
+
+    Buffered rows are flushed when the current transaction is committed, when the
+    buffer reaches `max_size` rows or after `flush_interval` seconds. Inserts are made
+    by a background thread, rows which cannot be inserted are stored to the spool file
+    and sent again with the next successful flush.
+    """
+
+    def __init__(self, database, max_size=None, flush_interval=None, spool_path=None):
+        self.database = database
+        self.max_size = max_size or settings.LOGGER_BUFFER_SIZE
+        self.flush_interval = flush_interval or settings.LOGGER_BUFFER_FLUSH_INTERVAL
+        self.spool_path = spool_path or settings.LOGGER_SPOOL_PATH
+
+        self._rows = []
+        self._lock = threading.RLock()
+        self._spool_lock = threading.Lock()
+        self._timer = None
+        self._pid = None
+        self._queue = None
+
+        atexit.register(self.close)
+
+    def add(self, rows):
+        if not rows:
+            return
+
+        with self._lock:
+            self._rows.extend(rows)
+            is_full = len(self._rows) >= self.max_size
+
+        if is_full:
+            self.flush()
+            return
+
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(self.flush)
+
+        # rows of rolled back transactions and rows logged outside of transaction are flushed by timer
+        self._start_timer()
+
+    def _start_timer(self):
+        with self._lock:
+            if self._timer is not None:
+                return
+
+            self._timer = threading.Timer(self.flush_interval, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _pop_rows(self):
+        with self._lock:
+            rows, self._rows = self._rows, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        return rows
+
+    def flush(self, sync=False):
+        rows = self._pop_rows()
+        if not rows:
+            return
+
+        if sync:
+            self.write(rows)
+        else:
+            self._get_queue().put(rows)
+
+    def _get_queue(self):
+        # worker thread is not inherited by forked processes (e.g. celery prefork pool)
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.Queue()
+                worker = threading.Thread(target=self._worker, args=(self._queue, ), daemon=True)
+                worker.start()
+
+        return self._queue
+
+    def _worker(self, rows_queue):
+        while True:
+            rows = rows_queue.get()
+            try:
+                self.write(rows)
+            except Exception:
+                # worker must survive, otherwise queued rows are never written
+                logger.exception('Cannot write %s log rows', len(rows))
+            finally:
+                rows_queue.task_done()
+
+    def close(self):
+        """
+        Writes buffered and queued rows synchronously on interpreter exit
+        """
+        rows = self._pop_rows()
+        with self._lock:
+            # queue of the parent process is not drained by forked processes
+            rows_queue = self._queue if self._pid == os.getpid() else None
+
+        while rows_queue is not None:
+            try:
+                rows.extend(rows_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        if rows:
+            self.write(rows)
+
+    def write(self, rows, replay=True):
+        try:
+            self.database.insert(rows)
+        except Exception:
+            logger.exception('Cannot write %s log rows to ClickHouse, spooling them', len(rows))
+            self.spool(rows)
+        else:
+            if replay:
+                self.replay_spool()
+
+    def spool(self, rows):
+        with self._spool_lock:
+            with open(self.spool_path, 'a') as spool_file:
+                for row in rows:
+                    spool_file.write(json.dumps(self._serialize_row(row)) + '\n')
+
+    def replay_spool(self):
+        with self._spool_lock:
+            if not os.path.exists(self.spool_path):
+                return
+
+            # spool file is shared by processes, the first one renaming it replays the rows
+            replay_path = '{}.{}.replay'.format(self.spool_path, os.getpid())
+            try:
+                os.rename(self.spool_path, replay_path)
+            except FileNotFoundError:
+                return
+
+        with open(replay_path) as replay_file:
+            rows = [LogHistory(**json.loads(line)) for line in replay_file if line.strip()]
+
+        os.remove(replay_path)
+        for i in range(0, len(rows), self.max_size):
+            self.write(rows[i:i + self.max_size], replay=False)
+
+    @classmethod
+    def _serialize_row(cls, row):
+        data = row.to_dict()
+        data['transaction_type'] = data['transaction_type'].name
+        data['date'] = data['date'].isoformat()
+
+        return data
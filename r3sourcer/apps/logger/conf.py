@@ -1,10 +1,18 @@
+import os
+import tempfile
+
 LOGGER_DB = 'Logger'
 LOGGER_USER = None
 LOGGER_PASSWORD = ''
 LOGGER_HOST = 'localhost'
 LOGGER_PORT = 8123
+LOGGER_BUFFERED = False
+LOGGER_BUFFER_SIZE = 1000
+LOGGER_BUFFER_FLUSH_INTERVAL = 5
+LOGGER_SPOOL_PATH = os.path.join(tempfile.gettempdir(), 'endless_logger_spool.jsonl')
 
 
 __all__ = [
-    'LOGGER_DB', 'LOGGER_USER', 'LOGGER_PASSWORD', 'LOGGER_HOST', 'LOGGER_PORT'
+    'LOGGER_DB', 'LOGGER_USER', 'LOGGER_PASSWORD', 'LOGGER_HOST', 'LOGGER_PORT', 'LOGGER_BUFFERED',
+    'LOGGER_BUFFER_SIZE', 'LOGGER_BUFFER_FLUSH_INTERVAL', 'LOGGER_SPOOL_PATH',
 ]
@@ -1,5 +1,29 @@
 from functools import wraps
 
+from django.db.models.base import DEFERRED
+
+
+SNAPSHOT_ATTR = '_logger_snapshot'
+
+
+def get_instance_snapshot(instance, fields=None):
+    """
+    Gets loaded values of the instance local fields keyed by attname.
+    Deferred fields are marked with DEFERRED and never loaded from the database.
+    """
+    return {
+        field.attname: instance.__dict__.get(field.attname, DEFERRED)
+        for field in instance._meta.local_fields
+        if fields is None or field.name in fields or field.attname in fields
+    }
+
+
+def snapshot_instance(sender, instance, **kwargs):
+    """
+    post_init receiver which stores original values of the instance
+    """
+    setattr(instance, SNAPSHOT_ATTR, get_instance_snapshot(instance))
+
 
 def save_decorator(method, endless_logger):
     """
@@ -9,16 +33,28 @@ def save_decorator(method, endless_logger):
     @wraps(method)
     def wrapper(self, *args, **kwargs):
         just_added = self._state.adding
-        old_instance = None
+        update_fields = kwargs.get('update_fields')
+        old_values = getattr(self, SNAPSHOT_ATTR, None)
+        if not just_added and old_values is None and self.id:
+            # instance was built bypassing __init__, the only case which needs the query
+            old_values = self.__class__.objects.filter(id=self.id).values(
+                *[field.attname for field in self._meta.local_fields]
+            ).first()
+
         result = method(self, *args, **kwargs)
         if self.id:
-            if not just_added:
-                old_instance = self.__class__.objects.get(id=self.id)
-
+            new_values = get_instance_snapshot(self, update_fields)
             if just_added:
                 endless_logger.log_instance_change(self, transaction_type='create')
-            else:
-                endless_logger.log_instance_change(self, old_instance=old_instance, transaction_type='update')
+            elif old_values is not None:
+                changed_values = {
+                    attname: value for attname, value in old_values.items() if attname in new_values
+                }
+                endless_logger.log_instance_change(self, old_instance=changed_values, transaction_type='update')
+
+            if update_fields is not None:
+                new_values = dict(old_values or {}, **new_values)
+            setattr(self, SNAPSHOT_ATTR, new_values)
 
         return result
     return wrapper
@@ -26,13 +62,14 @@ def save_decorator(method, endless_logger):
 
 def delete_decorator(method, endless_logger):
     """
-    Decorator for delete method of the model. After saving of the
+    Decorator for delete method of the model. After deleting of the
     model calls functions for logging object changes.
     """
     @wraps(method)
     def wrapper(self, *args, **kwargs):
-        old_instance = self.__class__.objects.get(id=self.id)
+        old_values = getattr(self, SNAPSHOT_ATTR, None) or get_instance_snapshot(self)
+        old_values = dict(old_values, **{self._meta.pk.attname: self.pk})
         result = method(self, *args, **kwargs)
-        endless_logger.log_instance_change(self, old_instance=old_instance, transaction_type='delete')
+        endless_logger.log_instance_change(self, old_instance=old_values, transaction_type='delete')
         return result
     return wrapper
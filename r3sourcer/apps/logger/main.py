@@ -3,11 +3,12 @@ import types
 
 from django.apps import apps
 from django.conf import settings
+from django.db.models.signals import post_init
 
 from .manager import get_endless_logger
 from .services import LocationLogger
 from .query import get_logger_queryset
-from .decorators import __name__ as __decorators_name__
+from .decorators import __name__ as __decorators_name__, snapshot_instance
 
 
 endless_logger = get_endless_logger()
@@ -30,4 +31,5 @@ def autodiscover():
                         getattr(sys.modules[__decorators_name__], decorator_name)(getattr(model, method_name),
                                                                                   endless_logger))
 
+            post_init.connect(snapshot_instance, sender=model)
             model.objects.get_queryset = types.MethodType(get_logger_queryset, model.objects)
@@ -1,11 +1,15 @@
+import threading
+from contextlib import contextmanager
 from datetime import date, datetime
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models.base import DEFERRED
 from django.utils.formats import date_format
 from infi.clickhouse_orm.database import Database
 from infi.clickhouse_orm.fields import DateTimeField
 
+from .buffer import LogBuffer
 from .models import LogHistory
 from .utils import get_current_user, get_field_value, format_range
 from ...helpers.datetimes import utc_now
@@ -30,6 +34,13 @@ class EndlessLogger(object):
         method_name = "log_{}_instance".format(transaction_type)
         getattr(self, method_name)(instance, general_logger_fields, old_instance)
 
+    @contextmanager
+    def batch(self):
+        """
+        Groups log rows written inside of the block into one insert
+        """
+        yield
+
     def log_create_instance(self, instance, general_logger_fields, old_instance=None):
         raise NotImplementedError
 
@@ -49,13 +60,19 @@ class EndlessLogger(object):
          """
         raise NotImplementedError
 
+    def get_current_user_id(self):
+        """
+        Gets id of the current user as it is stored in the log
+        """
+        current_user = get_current_user()
+        return str(current_user.id if current_user else None)
+
     def get_general_fields(self, instance, transaction_type, user=None):
         """
         Generates dictionary with general fields for instance logging
         """
-        current_user = get_current_user()
         general_logger_fields = {
-            'updated_by': user if user else str(current_user.id if current_user else None),
+            'updated_by': user if user else self.get_current_user_id(),
             'date': date.today(),
             'updated_at': int(round(utc_now().timestamp() * 1000)),
             'model': "{}.{}".format(instance.__class__.__module__, instance.__class__.__name__),
@@ -155,6 +172,23 @@ class EndlessLogger(object):
         history = self.get_history_for_fields(model, object_id, [field]).get(field, [])
         return history[0] if len(history) > 0 else {}
 
+    def get_recent_fields_changes(self, model, object_ids, field, transaction_type=None):
+        """
+        Gets the most recent change of the field for every object
+        :param model: model of the objects
+        :param object_ids: list of object ids
+        :param field: name of the field
+        :param transaction_type: type of the transaction operation
+        :return: :dict: {
+            "object_id": {
+                "updated_by": "user_id",
+                "updated_at": datetime,
+            }
+        }
+        :rtype: dict
+        """
+        raise NotImplementedError
+
 
 class ClickHouseLogger(EndlessLogger):
     def __init__(self):
@@ -163,6 +197,36 @@ class ClickHouseLogger(EndlessLogger):
                                         username=settings.LOGGER_USER,
                                         password=settings.LOGGER_PASSWORD)
         self.logger_database.migrate('r3sourcer.apps.logger.clickhouse_migrations')
+        self.buffer = LogBuffer(self.logger_database) if getattr(settings, 'LOGGER_BUFFERED', False) else None
+        self._local = threading.local()
+
+    def insert(self, log_array):
+        """
+        Writes log rows to the current batch, to the buffer if buffering is enabled or directly to ClickHouse
+        """
+        if not log_array:
+            return
+
+        batch = getattr(self._local, 'batch', None)
+        if batch is not None:
+            batch.extend(log_array)
+        elif self.buffer is not None:
+            self.buffer.add(log_array)
+        else:
+            self.logger_database.insert(log_array)
+
+    @contextmanager
+    def batch(self):
+        if getattr(self._local, 'batch', None) is not None:
+            yield
+            return
+
+        self._local.batch = []
+        try:
+            yield
+        finally:
+            log_array, self._local.batch = self._local.batch, None
+            self.insert(log_array)
 
     @staticmethod
     def date_to_db_representation(date_value):
@@ -187,44 +251,63 @@ class ClickHouseLogger(EndlessLogger):
                 **general_logger_fields
             )
             log_array.append(log)
-        self.logger_database.insert(log_array)
+        self.insert(log_array)
 
     def log_update_instance(self, instance, general_logger_fields, old_instance):
         """
-        Logs object create
+        Logs object update
         :param instance: instance
         :param general_logger_fields: dictionary of the fields for logging
-        :param old_instance: old instance of object
+        :param old_instance: old instance of object or dictionary of its original values by field attname
         """
         log_array = []
         for field in instance._meta.local_fields:
-            if getattr(instance, field.name) != getattr(old_instance, field.name):
+            if isinstance(old_instance, dict):
+                old_value = old_instance.get(field.attname, DEFERRED)
+                if old_value is DEFERRED or field.attname not in instance.__dict__:
+                    continue
+            else:
+                old_value = get_field_value(old_instance, field)
+
+            new_value = get_field_value(instance, field)
+            if new_value != old_value:
                 log = LogHistory(
                     field=field.name,
-                    new_value=str(get_field_value(instance, field)),
-                    old_value=str(get_field_value(old_instance, field)),
+                    new_value=str(new_value),
+                    old_value=str(old_value),
                     **general_logger_fields
                 )
                 log_array.append(log)
-        self.logger_database.insert(log_array)
+        self.insert(log_array)
 
     def log_delete_instance(self, instance, general_logger_fields, old_instance):
         """
         Logs object deletion
         :param instance: instance if exists
         :param general_logger_fields: dictionary of the fields for logging
-        :param old_instance: old instance of object if exists
+        :param old_instance: old instance of object or dictionary of its original values by field attname
         """
         log_array = []
-        general_logger_fields['object_id'] = str(old_instance.id)
+        if isinstance(old_instance, dict):
+            general_logger_fields['object_id'] = str(old_instance.get(instance._meta.pk.attname))
+        else:
+            general_logger_fields['object_id'] = str(old_instance.id)
+
         for field in instance._meta.local_fields:
+            if isinstance(old_instance, dict):
+                old_value = old_instance.get(field.attname, DEFERRED)
+                if old_value is DEFERRED:
+                    continue
+            else:
+                old_value = get_field_value(old_instance, field)
+
             log = LogHistory(
                 field=field.name,
-                old_value=str(get_field_value(old_instance, field)),
+                old_value=str(old_value),
                 **general_logger_fields
             )
             log_array.append(log)
-        self.logger_database.insert(log_array)
+        self.insert(log_array)
 
     def log_update_field(self, field_name, general_logger_fields, new_value='', old_value=''):
         """
@@ -240,7 +323,7 @@ class ClickHouseLogger(EndlessLogger):
             old_value=str(old_value),
             **general_logger_fields
         )
-        self.logger_database.insert([log])
+        self.insert([log])
 
     def get_object_history(self, model, object_id=None, by_user=None, from_date=None, to_date=None, desc=True,
                            offset=0, limit=None):
@@ -433,3 +516,26 @@ class ClickHouseLogger(EndlessLogger):
         )
 
         return self._map_field_history(log_qs[0]) if log_qs.count() > 0 else {}
+
+    def get_recent_fields_changes(self, model, object_ids, field, transaction_type=None):
+        object_ids = {str(object_id) for object_id in object_ids if object_id is not None}
+        if not object_ids:
+            return {}
+
+        query = "SELECT object_id, argMax(updated_by, updated_at) AS last_updated_by, " \
+                "max(updated_at) AS last_updated_at " \
+                "FROM $db.`{}` " \
+                "WHERE model='{}.{}' and field='{}' and object_id IN ({})" \
+            .format(LogHistory.table_name(), model.__module__, model.__name__, field, format_range(object_ids))
+
+        if transaction_type is not None:
+            query = "{} and transaction_type='{}'".format(query, transaction_type)
+
+        query = "{} GROUP BY object_id".format(query)
+
+        return {
+            item.object_id: {
+                'updated_by': item.last_updated_by,
+                'updated_at': datetime.utcfromtimestamp(item.last_updated_at / 1000),
+            } for item in self.logger_database.select(query)
+        }
@@ -3,6 +3,7 @@ import importlib
 from django.conf import settings
 from django.db import models
 
+from .decorators import SNAPSHOT_ATTR, get_instance_snapshot
 from .utils import get_field_value_by_field_name
 
 
@@ -23,22 +24,17 @@ class LoggerQuerySet(models.QuerySet):
         """
         Bulk create with logging of the objects' fields which were created
         """
-        real_objects = None
-        model = None
-        old_ids = []
-        if objs and len(objs) > 0:
-            model = objs[0].__class__
-            old_ids = list(model.objects.all().values_list('id', flat=True))
-
         objs = super().bulk_create(objs, batch_size)
 
-        if objs and len(objs) > 0:
-            real_objects = model.objects.exclude(id__in=old_ids)
-
-        if real_objects:
+        created_objs = [obj for obj in objs if obj.pk is not None]
+        if created_objs:
             from .main import endless_logger
-            for obj in real_objects:
-                endless_logger.log_instance_change(obj, transaction_type='create')
+            user = endless_logger.get_current_user_id()
+            with endless_logger.batch():
+                for obj in created_objs:
+                    endless_logger.log_instance_change(obj, user=user, transaction_type='create')
+                    setattr(obj, SNAPSHOT_ATTR, get_instance_snapshot(obj))
+
         return objs
 
     def update(self, **kwargs):
@@ -51,12 +47,13 @@ class LoggerQuerySet(models.QuerySet):
 
         from .main import endless_logger
         rows = super().update(**kwargs)
-        for elem in old_values:
-            general_logger_fields = endless_logger.get_general_fields(elem, 'update')
-            for field_name, field_value in kwargs.items():
-                endless_logger.log_update_field(field_name, general_logger_fields,
-                                                new_value=field_value,
-                                                old_value=get_field_value_by_field_name(elem, field_name))
+        with endless_logger.batch():
+            for elem in old_values:
+                general_logger_fields = endless_logger.get_general_fields(elem, 'update')
+                for field_name, field_value in kwargs.items():
+                    endless_logger.log_update_field(field_name, general_logger_fields,
+                                                    new_value=field_value,
+                                                    old_value=get_field_value_by_field_name(elem, field_name))
         return rows
 
     def delete(self):
@@ -69,9 +66,10 @@ class LoggerQuerySet(models.QuerySet):
 
         from .main import endless_logger
         deleted, _rows_count = super().delete()
-        for elem in old_values:
-            general_logger_fields = endless_logger.get_general_fields(elem, 'delete')
-            endless_logger.log_update_field('id', general_logger_fields,
-                                            old_value=elem.id)
+        with endless_logger.batch():
+            for elem in old_values:
+                general_logger_fields = endless_logger.get_general_fields(elem, 'delete')
+                endless_logger.log_update_field('id', general_logger_fields,
+                                                old_value=elem.id)
 
         return deleted, _rows_count
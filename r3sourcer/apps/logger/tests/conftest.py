@@ -20,11 +20,25 @@ class ModelForAutodiscover(models.Model):
         return True
 
 
+class OneToOneModelForAutodiscover(models.Model):
+    name = models.CharField(max_length=63)
+    rel = models.OneToOneField(NameModel, null=True)
+
+    @classmethod
+    def use_logger(cls):
+        return True
+
+
 @pytest.fixture()
 def test_model_for_autodiscover(db):
     return ModelForAutodiscover
 
 
+@pytest.fixture()
+def test_one_to_one_model(db):
+    return OneToOneModelForAutodiscover
+
+
 @pytest.fixture()
 def test_instance(db):
     obj = NameModel.objects.create(name='test name')
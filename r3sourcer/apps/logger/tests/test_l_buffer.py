@@ -0,0 +1,95 @@
+from datetime import date
+
+import mock
+import pytest
+
+from r3sourcer.apps.logger.buffer import LogBuffer
+from r3sourcer.apps.logger.models import LogHistory, TRANSACTION_TYPES
+
+
+def make_row(object_id='1'):
+    return LogHistory(
+        model='test.Model',
+        field='name',
+        object_id=object_id,
+        new_value='new',
+        old_value='old',
+        updated_by='user',
+        updated_at=1,
+        transaction_type=TRANSACTION_TYPES.update,
+        date=date(2017, 1, 1),
+    )
+
+
+@pytest.fixture
+def spool_path(tmpdir):
+    return str(tmpdir.join('spool.jsonl'))
+
+
+class TestLogBuffer:
+
+    def test_flush_on_size(self, spool_path):
+        database = mock.MagicMock()
+        buffer = LogBuffer(database, max_size=2, flush_interval=60, spool_path=spool_path)
+
+        with mock.patch.object(buffer, 'flush') as mock_flush:
+            buffer.add([make_row()])
+            assert not mock_flush.called
+
+            buffer.add([make_row('2')])
+            assert mock_flush.called
+
+        buffer.flush(sync=True)
+
+        database.insert.assert_called_once()
+        assert len(database.insert.call_args[0][0]) == 2
+
+    def test_spool_and_replay(self, spool_path):
+        database = mock.MagicMock()
+        database.insert.side_effect = [Exception, None, None]
+        buffer = LogBuffer(database, max_size=10, flush_interval=60, spool_path=spool_path)
+
+        buffer.write([make_row('1')])
+        buffer.write([make_row('2')])
+
+        assert database.insert.call_count == 3
+        replayed = database.insert.call_args[0][0]
+        assert len(replayed) == 1
+        assert replayed[0].object_id == '1'
+        assert replayed[0].transaction_type == TRANSACTION_TYPES.update
+
+    def test_replay_spool_renamed_by_another_process(self, spool_path):
+        database = mock.MagicMock()
+        buffer = LogBuffer(database, max_size=10, flush_interval=60, spool_path=spool_path)
+        buffer.spool([make_row('1')])
+
+        with mock.patch('r3sourcer.apps.logger.buffer.os.rename', side_effect=FileNotFoundError):
+            buffer.replay_spool()
+
+        assert not database.insert.called
+
+    def test_worker_survives_write_error(self, spool_path):
+        database = mock.MagicMock()
+        buffer = LogBuffer(database, max_size=10, flush_interval=60, spool_path=spool_path)
+
+        with mock.patch.object(buffer, 'spool', side_effect=IOError):
+            database.insert.side_effect = [Exception, None]
+            rows_queue = buffer._get_queue()
+            rows_queue.put([make_row('1')])
+            rows_queue.put([make_row('2')])
+            rows_queue.join()
+
+        assert database.insert.call_count == 2
+        assert database.insert.call_args[0][0][0].object_id == '2'
+
+    def test_close_writes_queued_rows(self, spool_path):
+        database = mock.MagicMock()
+        buffer = LogBuffer(database, max_size=10, flush_interval=60, spool_path=spool_path)
+
+        with mock.patch.object(buffer, '_worker'):
+            buffer._get_queue().put([make_row('1')])
+        buffer.add([make_row('2')])
+        buffer.close()
+
+        database.insert.assert_called_once()
+        assert [row.object_id for row in database.insert.call_args[0][0]] == ['2', '1']
@@ -0,0 +1,73 @@
+import mock
+import pytest
+
+from django.db.models.signals import post_init
+
+from r3sourcer.apps.logger.decorators import (
+    save_decorator, delete_decorator, snapshot_instance, SNAPSHOT_ATTR
+)
+
+
+@pytest.fixture
+def snapshot_model(test_model):
+    post_init.connect(snapshot_instance, sender=test_model)
+    yield test_model
+    post_init.disconnect(snapshot_instance, sender=test_model)
+
+
+class TestDecorators:
+
+    @pytest.fixture
+    def endless_logger(self):
+        return mock.MagicMock()
+
+    def test_snapshot_on_load(self, snapshot_model, test_instance):
+        instance = snapshot_model.objects.get(id=test_instance.id)
+
+        assert getattr(instance, SNAPSHOT_ATTR) == {'id': test_instance.id, 'name': 'test name'}
+
+    def test_save_update_uses_snapshot(self, snapshot_model, test_instance, endless_logger,
+                                       django_assert_num_queries):
+        save = save_decorator(snapshot_model.save, endless_logger)
+        instance = snapshot_model.objects.get(id=test_instance.id)
+        instance.name = 'new name'
+
+        with django_assert_num_queries(1):
+            save(instance)
+
+        endless_logger.log_instance_change.assert_called_once_with(
+            instance, old_instance={'id': test_instance.id, 'name': 'test name'}, transaction_type='update'
+        )
+        assert getattr(instance, SNAPSHOT_ATTR)['name'] == 'new name'
+
+    def test_save_update_fields(self, snapshot_model, test_instance, endless_logger):
+        save = save_decorator(snapshot_model.save, endless_logger)
+        instance = snapshot_model.objects.get(id=test_instance.id)
+        instance.name = 'new name'
+
+        save(instance, update_fields=['name'])
+
+        endless_logger.log_instance_change.assert_called_once_with(
+            instance, old_instance={'name': 'test name'}, transaction_type='update'
+        )
+        assert getattr(instance, SNAPSHOT_ATTR) == {'id': test_instance.id, 'name': 'new name'}
+
+    def test_save_create(self, snapshot_model, endless_logger):
+        save = save_decorator(snapshot_model.save, endless_logger)
+        instance = snapshot_model(name='created')
+
+        save(instance)
+
+        endless_logger.log_instance_change.assert_called_once_with(instance, transaction_type='create')
+        assert getattr(instance, SNAPSHOT_ATTR) == {'id': instance.id, 'name': 'created'}
+
+    def test_delete_uses_snapshot(self, snapshot_model, test_instance, endless_logger):
+        delete = delete_decorator(snapshot_model.delete, endless_logger)
+        instance = snapshot_model.objects.get(id=test_instance.id)
+        instance_id = instance.id
+
+        delete(instance)
+
+        endless_logger.log_instance_change.assert_called_once_with(
+            instance, old_instance={'id': instance_id, 'name': 'test name'}, transaction_type='delete'
+        )
@@ -220,3 +220,18 @@ class TestClickhouseLogger:
         assert len(result["fields"]) == 2
         for field in result["fields"]:
             assert field["new_value"] == str(getattr(new_instance, field["field"]))
+
+    def test_get_recent_fields_changes(self, test_model):
+        first = test_model.objects.create(name='First', id=8)
+        second = test_model.objects.create(name='Second', id=9)
+        general_logger_fields = self.logger.get_general_fields(first, 'update')
+        general_logger_fields['updated_by'] = 'user1'
+        self.logger.log_update_field('name', general_logger_fields, new_value='First 1', old_value='First')
+        general_logger_fields['updated_by'] = 'user2'
+        general_logger_fields['updated_at'] += 1
+        self.logger.log_update_field('name', general_logger_fields, new_value='First 2', old_value='First 1')
+
+        result = self.logger.get_recent_fields_changes(test_model, [first.id, second.id], 'name')
+
+        assert list(result.keys()) == [str(first.id)]
+        assert result[str(first.id)]['updated_by'] == 'user2'
@@ -1,3 +1,5 @@
+import mock
+
 from r3sourcer.apps.logger.manager import ClickHouseLogger
 from r3sourcer.apps.logger.models import LogHistory, TRANSACTION_TYPES
 from r3sourcer.apps.logger.query import get_logger_queryset
@@ -31,6 +33,15 @@ class TestLoggerQuerySet:
             assert item.old_value == ''
             assert item.transaction_type == TRANSACTION_TYPES.create
 
+    def test_bulk_create_single_insert(self, db):
+        from r3sourcer.apps.logger.main import endless_logger
+
+        with mock.patch.object(endless_logger.logger_database, 'insert') as mock_insert:
+            self.test_model.objects.bulk_create([NameModel(name='n1'), NameModel(name='n2')])
+
+        mock_insert.assert_called_once()
+        assert len(mock_insert.call_args[0][0]) == 4
+
     def test_update(self, db):
         self.test_model.objects.create(name='n3')
         rows = self.test_model.objects.filter(name='n3').update(name='n4')
@@ -21,5 +21,13 @@ class TestUtils:
         instance = test_model_for_autodiscover.objects.create(name="Model", rel=test_instance)
         assert test_instance.id == get_field_value(instance, instance.__class__._meta.get_field("rel"))
 
+    def test_get_field_value_one_to_one_field(self, db, test_instance, test_one_to_one_model,
+                                              django_assert_num_queries):
+        instance = test_one_to_one_model.objects.get(
+            id=test_one_to_one_model.objects.create(name="Model", rel=test_instance).id
+        )
+        with django_assert_num_queries(0):
+            assert test_instance.id == get_field_value(instance, instance.__class__._meta.get_field("rel"))
+
     def test_get_field_value_by_field_name(self, db, test_instance):
         assert test_instance.name == get_field_value_by_field_name(test_instance, "name")
@@ -37,13 +37,14 @@ def get_current_user():
 
 def get_field_value(instance, field):
     """
-    Gets value of the field. If the field is ForeignKey returns id of the related object
+    Gets value of the field. If the field is ForeignKey or OneToOneField returns id of the related object
     :param instance: instance
     :param field: field of the instance
     :return: value of the field
     """
-    if field.get_internal_type() == "ForeignKey" and getattr(instance, field.name):
-        new_value = getattr(instance, field.name).pk
+    if field.is_relation and (field.many_to_one or field.one_to_one):
+        # related id is read from attname, so the related object is not fetched
+        new_value = getattr(instance, field.attname)
     else:
         new_value = getattr(instance, field.name)
     return new_value
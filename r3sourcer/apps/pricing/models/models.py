@@ -4,14 +4,16 @@ from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.db.models import Q, F
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.utils.formats import date_format
 from django.utils.translation import ugettext_lazy as _
 from model_utils import Choices
 
 from r3sourcer.apps.core.models import Company
 from r3sourcer.helpers.models.abs import UUIDModel, TimeZoneUUIDModel
-from r3sourcer.apps.pricing.models.rules import all_rules, AllowanceWorkRule
+from r3sourcer.apps.pricing.models.rules import (
+    all_rules, AllowanceWorkRule, WeekdayWorkRule, OvertimeWorkRule, TimeOfDayWorkRule,
+)
 
 
 class PriceListMixin(models.Model):
@@ -495,3 +497,16 @@ __all__ = [
 
 
 post_save.connect(PriceListRate.set_default_rate, sender=PriceListRate)
+
+
+def invalidate_rate_coefficient_rule_sets(sender, **kwargs):
+    from r3sourcer.apps.pricing.rule_sets import invalidate_rule_sets
+    invalidate_rule_sets()
+
+
+for rule_set_model in (
+    RateCoefficient, RateCoefficientRel, RateCoefficientModifier, DynamicCoefficientRule,
+    WeekdayWorkRule, OvertimeWorkRule, TimeOfDayWorkRule, AllowanceWorkRule,
+):
+    post_save.connect(invalidate_rate_coefficient_rule_sets, sender=rule_set_model)
+    post_delete.connect(invalidate_rate_coefficient_rule_sets, sender=rule_set_model)
@@ -0,0 +1,112 @@
+import uuid
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+
+from .models import RateCoefficient, DynamicCoefficientRule
+
+
+RULE_SET_VERSION_KEY = 'pricing_rule_set_version'
+RULE_SET_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def get_rule_set_version():
+    version = cache.get(RULE_SET_VERSION_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(RULE_SET_VERSION_KEY, version, None)
+
+    return version
+
+
+def invalidate_rule_sets(*args, **kwargs):
+    cache.set(RULE_SET_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+class RateCoefficientRuleSet:
+    """
+    Compiled rate coefficients of the master company for industry and modifier type.
+
+    Keeps coefficients ordered by multiplier, fixed addition, fixed override and priority
+    with used rules already resolved to the concrete rule objects, so hours can be
+    calculated without hitting the database.
+    """
+
+    def __init__(self, entries):
+        # list of (overlaps, rate_coefficient, rules) tuples
+        self.entries = entries
+
+    def get_entries(self, overlaps=False):
+        return [
+            (rate_coefficient, rules) for is_overlaps, rate_coefficient, rules in self.entries
+            if is_overlaps == overlaps
+        ]
+
+    @classmethod
+    def get_cache_key(cls, company, industry, modifier_type, version=None):
+        return 'pricing_rule_set_{}_{}_{}_{}'.format(
+            version or get_rule_set_version(), company.pk, industry.pk, modifier_type
+        )
+
+    @classmethod
+    def get(cls, company, industry, modifier_type, version=None):
+        cache_key = cls.get_cache_key(company, industry, modifier_type, version)
+        rule_set = cache.get(cache_key)
+
+        if rule_set is None:
+            rule_set = cls.load(company, industry, modifier_type)
+            cache.set(cache_key, rule_set, RULE_SET_CACHE_TIMEOUT)
+
+        return rule_set
+
+    @classmethod
+    def load(cls, company, industry, modifier_type):
+        rows = RateCoefficient.objects.owned_by(company).filter(
+            industry=industry,
+            rate_coefficient_modifiers__type=modifier_type,
+            active=True,
+        ).values_list(
+            'id',
+            'overlaps',
+            'priority',
+            'rate_coefficient_modifiers__multiplier',
+            'rate_coefficient_modifiers__fixed_addition',
+            'rate_coefficient_modifiers__fixed_override',
+        ).distinct()
+
+        rows = sorted(rows, key=lambda row: (-row[3], -row[4], -row[5], -row[2]))
+        coefficient_ids = {row[0] for row in rows}
+
+        rate_coefficients = RateCoefficient.objects.in_bulk(coefficient_ids)
+        rules_map = cls._load_rules(coefficient_ids)
+
+        entries = [
+            (overlaps, rate_coefficients[coefficient_id], rules_map.get(coefficient_id, []))
+            for coefficient_id, overlaps, *_ in rows
+        ]
+
+        return cls(entries)
+
+    @classmethod
+    def _load_rules(cls, coefficient_ids):
+        dynamic_rules = list(DynamicCoefficientRule.objects.filter(
+            rate_coefficient_id__in=coefficient_ids, used=True,
+        ).order_by('-priority').values_list('rate_coefficient_id', 'rule_type_id', 'rule_id'))
+
+        rule_ids = defaultdict(set)
+        for _, rule_type_id, rule_id in dynamic_rules:
+            rule_ids[rule_type_id].add(rule_id)
+
+        rule_objects = {}
+        for rule_type_id, ids in rule_ids.items():
+            rule_model = ContentType.objects.get_for_id(rule_type_id).model_class()
+            rule_objects.update(rule_model.objects.in_bulk(ids))
+
+        rules_map = defaultdict(list)
+        for coefficient_id, _, rule_id in dynamic_rules:
+            rule = rule_objects.get(rule_id)
+            if rule is not None:
+                rules_map[coefficient_id].append(rule)
+
+        return rules_map
@@ -1,51 +1,59 @@
+from collections import defaultdict
 from datetime import timedelta
 
-from .models import RateCoefficient, WeekdayWorkRule
-from .exceptions import RateNotApplicable
+from django.apps import apps
 from django.db import models
+from django.db.models import F
+
+from r3sourcer.apps.core.models import Company
+from r3sourcer.helpers.datetimes import geo_time_zone, utc2local
+from .models import WeekdayWorkRule, Industry
+from .exceptions import RateNotApplicable
+from .rule_sets import RateCoefficientRuleSet, get_rule_set_version
 
 
 class CoefficientService:
 
-    def get_industry_rate_coefficient(self, company, industry, modifier_type, start_datetime, overlaps=False):
-        query = models.Q(industry=industry,
-                         rate_coefficient_modifiers__type=modifier_type,
-                         active=True,
-                         overlaps=overlaps)
+    def __init__(self):
+        # compiled rule sets are kept until pricing models are changed
+        self._rule_sets = {}
+        self._rule_sets_version = None
+
+    def get_rule_set(self, company, industry, modifier_type):
+        version = get_rule_set_version()
+        if version != self._rule_sets_version:
+            self._rule_sets = {}
+            self._rule_sets_version = version
 
-        rate_coefficients = RateCoefficient.objects.owned_by(company).filter(query)
+        key = (company.pk, industry.pk, modifier_type)
+        if key not in self._rule_sets:
+            self._rule_sets[key] = RateCoefficientRuleSet.get(company, industry, modifier_type, version)
 
-        return rate_coefficients.order_by(
-            '-rate_coefficient_modifiers__multiplier',
-            '-rate_coefficient_modifiers__fixed_addition',
-            '-rate_coefficient_modifiers__fixed_override',
-            '-priority',
-        ).distinct()
+        return self._rule_sets[key]
 
-    def process_rate_coefficients(self, rate_coefficients, start_datetime,
+    def process_coefficient_rules(self, coefficient_rules, start_datetime,
                                   origin_hours, break_started=None,
                                   break_ended=None, overlaps=False):
         res = []
         worked_hours = origin_hours
-        for rate_coefficient in rate_coefficients:
-            rules = rate_coefficient.rate_coefficient_rules.filter(used=True).order_by('-priority').distinct()
+        for rate_coefficient, rules in coefficient_rules:
             try:
                 used_hours = worked_hours
                 is_allowance = False
 
                 for rule in rules:
                     calc_hours = origin_hours if is_allowance else worked_hours
-                    hours = rule.rule.calc_hours(start_datetime,
-                                                 calc_hours,
-                                                 break_started,
-                                                 break_ended)
+                    hours = rule.calc_hours(start_datetime,
+                                            calc_hours,
+                                            break_started,
+                                            break_ended)
 
                     if hours == timedelta(hours=-1):
                         is_allowance = True
                         hours = timedelta(hours=1)
                         if used_hours < hours:
                             used_hours = hours
-                    elif isinstance(rule.rule, WeekdayWorkRule):
+                    elif isinstance(rule, WeekdayWorkRule):
                         break
 
                     used_hours = min(hours, used_hours)
@@ -80,11 +88,10 @@ class CoefficientService:
 
     def calc(self, company, industry, modifier_type, start_datetime, worked_hours,
              break_started=None, break_ended=None, overlaps=False):
+        rule_set = self.get_rule_set(company, industry, modifier_type)
+
         if overlaps:
-            rate_coefficients = self.get_industry_rate_coefficient(
-                company, industry, modifier_type, start_datetime, overlaps=True
-            )
-            res = self.process_rate_coefficients(rate_coefficients,
+            res = self.process_coefficient_rules(rule_set.get_entries(overlaps=True),
                                                  start_datetime,
                                                  worked_hours,
                                                  break_started,
@@ -93,14 +100,94 @@ class CoefficientService:
         else:
             res = []
 
-        rate_coefficients = self.get_industry_rate_coefficient(company,
-                                                               industry,
-                                                               modifier_type,
-                                                               start_datetime,
-                                                               overlaps=False)
-        res.extend(self.process_rate_coefficients(rate_coefficients,
+        res.extend(self.process_coefficient_rules(rule_set.get_entries(overlaps=False),
                                                   start_datetime,
                                                   worked_hours,
                                                   break_started,
                                                   break_ended))
         return res
+
+    def _get_timesheet_values(self, timesheets):
+        TimeSheet = apps.get_model('hr', 'TimeSheet')
+        if isinstance(timesheets, models.QuerySet):
+            timesheet_ids = timesheets.order_by().values('id')
+        else:
+            timesheet_ids = [timesheet.pk for timesheet in timesheets]
+
+        jobsite_path = 'job_offer__shift__date__job__jobsite__'
+        return TimeSheet.objects.filter(pk__in=timesheet_ids).values(
+            'id',
+            'shift_started_at',
+            'shift_ended_at',
+            'break_started_at',
+            'break_ended_at',
+            master_company_id=F(jobsite_path + 'master_company'),
+            industry_id=F(jobsite_path + 'industry'),
+            longitude=F(jobsite_path + 'address__longitude'),
+            latitude=F(jobsite_path + 'address__latitude'),
+        )
+
+    def calc_many(self, timesheets, modifier_type, overlaps=False, local_breaks=True):
+        """
+        Calculate coefficient hours for list or queryset of timesheets.
+
+        :param local_breaks: break times are passed in the jobsite time zone, otherwise in UTC
+        :return: dict of timesheet id -> coeffs_hours as returned by `calc`
+        """
+        rows = list(self._get_timesheet_values(timesheets))
+
+        groups = defaultdict(list)
+        for row in rows:
+            groups[(row['master_company_id'], row['industry_id'])].append(row)
+
+        companies = Company.objects.in_bulk({company_id for company_id, _ in groups})
+        industries = Industry.objects.in_bulk({industry_id for _, industry_id in groups})
+
+        time_zones = {}
+        res = {}
+
+        for (company_id, industry_id), group_rows in groups.items():
+            company = companies[company_id]
+            industry = industries[industry_id]
+
+            for row in group_rows:
+                coord = (row['longitude'], row['latitude'])
+                if coord not in time_zones:
+                    time_zones[coord] = geo_time_zone(*coord)
+                tz = time_zones[coord]
+
+                shift_started_at = row['shift_started_at']
+                break_started_at = row['break_started_at']
+                break_ended_at = row['break_ended_at']
+                if local_breaks:
+                    break_started_at = break_started_at and utc2local(break_started_at, tz)
+                    break_ended_at = break_ended_at and utc2local(break_ended_at, tz)
+
+                res[row['id']] = self.calc(
+                    company, industry, modifier_type,
+                    shift_started_at and utc2local(shift_started_at, tz),
+                    self._get_shift_duration(row),
+                    break_started=break_started_at,
+                    break_ended=break_ended_at,
+                    overlaps=overlaps,
+                )
+
+        return res
+
+    @classmethod
+    def _get_shift_duration(cls, row):
+        shift_delta = None
+        if row['shift_ended_at'] and row['shift_started_at']:
+            shift_delta = row['shift_ended_at'] - row['shift_started_at']
+
+        break_delta = None
+        if row['break_ended_at'] and row['break_started_at']:
+            break_delta = row['break_ended_at'] - row['break_started_at']
+
+        if shift_delta and break_delta:
+            return shift_delta - break_delta
+        elif shift_delta:
+            return shift_delta
+
+        return timedelta(0)
+
@@ -9,6 +9,7 @@ from r3sourcer.apps.core.models import Company
 from r3sourcer.apps.pricing.models import (
     DynamicCoefficientRule, RateCoefficientModifier, Industry,
 )
+from r3sourcer.apps.pricing.rule_sets import RateCoefficientRuleSet
 from r3sourcer.apps.pricing.services import CoefficientService
 
 
@@ -252,3 +253,50 @@ class TestCoefficientRates:
         assert res[0]['hours'] == timedelta(hours=1)
         assert res[1]['coefficient'] == 'base'
         assert res[1]['hours'] == timedelta(hours=7)
+
+    def test_rule_set_order(self, rate_coefficient, rate_coefficient_another, monday_rule, overtime_rule,
+                            company, industry):
+        self.add_rule(rate_coefficient, monday_rule)
+        self.add_rule(rate_coefficient, overtime_rule)
+
+        rule_set = RateCoefficientRuleSet.load(company, industry, RateCoefficientModifier.TYPE_CHOICES.candidate)
+        entries = rule_set.get_entries()
+
+        assert [coefficient for coefficient, _ in entries] == [rate_coefficient, rate_coefficient_another]
+        assert entries[0][1] == [overtime_rule, monday_rule]
+        assert entries[1][1] == []
+        assert rule_set.get_entries(overlaps=True) == []
+
+    @freeze_time(datetime(2017, 1, 2, 8, 30))
+    def test_calc_rule_set_invalidated_same_service(self, settings, rate_coefficient, overtime_rule):
+        settings.TIME_ZONE = 'UTC'
+        service = CoefficientService()
+        args = (
+            Company.objects.get(name='Company'), Industry.objects.get(type='test'),
+            RateCoefficientModifier.TYPE_CHOICES.candidate, timezone.now(), timedelta(hours=8)
+        )
+
+        assert len(service.calc(*args)) == 1
+
+        self.add_rule(rate_coefficient, overtime_rule)
+        res = service.calc(*args)
+
+        assert len(res) == 2
+        assert res[0]['coefficient'] == rate_coefficient
+
+    @freeze_time(datetime(2017, 1, 2, 8, 30))
+    def test_calc_rule_set_invalidated(self, settings, rate_coefficient, overtime_rule):
+        settings.TIME_ZONE = 'UTC'
+
+        res = CoefficientService().calc(
+            Company.objects.get(name='Company'), Industry.objects.get(type='test'),
+            RateCoefficientModifier.TYPE_CHOICES.candidate, timezone.now(), timedelta(hours=8)
+        )
+        assert len(res) == 1
+
+        self.add_rule(rate_coefficient, overtime_rule)
+        res = self.calc_res()
+
+        assert len(res) == 2
+        assert res[0]['coefficient'] == rate_coefficient
+
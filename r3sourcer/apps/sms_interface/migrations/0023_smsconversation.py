@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+BATCH_SIZE = 1000
+
+
+def fill_conversations(apps, schema_editor):
+    SMSConversation = apps.get_model('sms_interface', 'SMSConversation')
+    SMSMessage = apps.get_model('sms_interface', 'SMSMessage')
+
+    conversations = {}
+    for check_reply, field_name in ((True, 'open_message_id'), (False, 'closed_message_id')):
+        latest_messages = SMSMessage.objects.filter(
+            type='SENT', check_reply=check_reply, sent_at__isnull=False,
+            from_number__isnull=False, to_number__isnull=False,
+        ).exclude(
+            from_number=''
+        ).exclude(
+            to_number=''
+        ).order_by(
+            'from_number', 'to_number', '-sent_at'
+        ).distinct(
+            'from_number', 'to_number'
+        ).values_list('from_number', 'to_number', 'id')
+
+        for from_number, to_number, message_id in latest_messages.iterator():
+            conversation = conversations.setdefault(
+                (from_number, to_number), SMSConversation(from_number=from_number, to_number=to_number)
+            )
+            setattr(conversation, field_name, message_id)
+
+    conversations = list(conversations.values())
+    for i in range(0, len(conversations), BATCH_SIZE):
+        SMSConversation.objects.bulk_create(conversations[i:i + BATCH_SIZE])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms_interface', '0022_auto_20211112_1032'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SMSConversation',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('from_number', models.CharField(max_length=25, verbose_name='From number')),
+                ('to_number', models.CharField(max_length=25, verbose_name='To number')),
+                ('closed_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sms_interface.SMSMessage', verbose_name='Latest message not waiting for reply')),
+                ('open_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sms_interface.SMSMessage', verbose_name='Latest message waiting for reply')),
+            ],
+            options={
+                'verbose_name': 'SMS conversation',
+                'verbose_name_plural': 'SMS conversations',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='smsconversation',
+            unique_together=set([('from_number', 'to_number')]),
+        ),
+        migrations.RunPython(fill_conversations, migrations.RunPython.noop),
+    ]
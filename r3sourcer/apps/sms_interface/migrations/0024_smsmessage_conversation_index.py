@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sms_interface', '0023_smsconversation'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='smsmessage',
+            index_together={('from_number', 'to_number', 'sent_at')},
+        ),
+    ]
@@ -1,5 +1,6 @@
 from .default_sms_templates import *
 from .phone_numbers import *
+from .sms_conversations import *
 from .sms_messages import *
 from .sms_related_objects import *
 from .sms_templates import *
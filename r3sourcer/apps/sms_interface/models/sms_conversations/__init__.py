@@ -0,0 +1,6 @@
+from .model import SMSConversation
+
+
+__all__ = (
+    SMSConversation.__name__,
+)
@@ -0,0 +1,140 @@
+from django.db import IntegrityError, models, transaction
+from django.utils.translation import ugettext_lazy as _
+
+from r3sourcer.helpers.models.abs import UUIDModel
+
+
+class SMSConversation(UUIDModel):
+    """
+    Latest outgoing messages sent from one number to another.
+    Replies are matched to the sent message with one lookup instead of scanning the messages history.
+    """
+
+    from_number = models.CharField(
+        max_length=25,
+        verbose_name=_("From number"),
+    )
+    to_number = models.CharField(
+        max_length=25,
+        verbose_name=_("To number"),
+    )
+    open_message = models.ForeignKey(
+        'sms_interface.SMSMessage',
+        on_delete=models.SET_NULL,
+        verbose_name=_("Latest message waiting for reply"),
+        related_name='+',
+        null=True,
+        blank=True,
+    )
+    closed_message = models.ForeignKey(
+        'sms_interface.SMSMessage',
+        on_delete=models.SET_NULL,
+        verbose_name=_("Latest message not waiting for reply"),
+        related_name='+',
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = _("SMS conversation")
+        verbose_name_plural = _("SMS conversations")
+        unique_together = ('from_number', 'to_number')
+
+    def __str__(self):
+        return '{} -> {}'.format(self.from_number, self.to_number)
+
+    @classmethod
+    def get_message_field(cls, sms_message):
+        return 'open_message' if sms_message.check_reply else 'closed_message'
+
+    def set_message(self, sms_message):
+        """
+        Points the conversation to the message if it is newer than the current one
+        :return: conversation is changed
+        """
+        field_name = self.get_message_field(sms_message)
+        current = getattr(self, field_name)
+        if current is not None and current.sent_at > sms_message.sent_at:
+            return False
+
+        setattr(self, field_name, sms_message)
+        return True
+
+    @classmethod
+    def add_messages(cls, *sms_messages):
+        """
+        Updates conversations of the sent messages
+        """
+        from r3sourcer.apps.sms_interface.models import SMSMessage
+
+        latest = {}
+        for sms_message in sms_messages:
+            if sms_message.type != SMSMessage.TYPE_CHOICES.SENT or sms_message.sent_at is None:
+                continue
+            if not sms_message.from_number or not sms_message.to_number:
+                continue
+
+            # numbers are compared the same way as they are stored
+            key = (str(sms_message.from_number), str(sms_message.to_number), cls.get_message_field(sms_message))
+            if key not in latest or latest[key].sent_at <= sms_message.sent_at:
+                latest[key] = sms_message
+
+        if not latest:
+            return
+
+        try:
+            with transaction.atomic():
+                cls._set_messages(latest, create=True)
+        except IntegrityError:
+            # conversations are created by the concurrent sending, update them instead
+            with transaction.atomic():
+                cls._set_messages(latest, create=False)
+
+    @classmethod
+    def _set_messages(cls, latest, create):
+        conversations = {
+            (conversation.from_number, conversation.to_number): conversation
+            for conversation in cls.objects.select_for_update(of=('self',)).filter(
+                from_number__in={from_number for from_number, _, _ in latest},
+                to_number__in={to_number for _, to_number, _ in latest},
+            ).select_related('open_message', 'closed_message')
+        }
+
+        new_conversations = {}
+        changed = {}
+        for (from_number, to_number, message_field), sms_message in latest.items():
+            conversation = conversations.get((from_number, to_number))
+            if conversation is None:
+                conversation = new_conversations.setdefault(
+                    (from_number, to_number), cls(from_number=from_number, to_number=to_number)
+                )
+                conversation.set_message(sms_message)
+            elif conversation.set_message(sms_message):
+                changed[conversation.pk] = conversation
+
+        for conversation in changed.values():
+            conversation.save(update_fields=['open_message', 'closed_message', 'updated_at'])
+
+        if create:
+            cls.objects.bulk_create(new_conversations.values())
+
+    @classmethod
+    def update_message(cls, sms_message):
+        """
+        Moves the message between open and closed messages of its conversation when check_reply is changed
+        """
+        from r3sourcer.apps.sms_interface.models import SMSMessage
+
+        # the message is replaced by the latest one left with its previous check_reply,
+        # older messages sent to the number can still wait for reply
+        previous_check_reply = not sms_message.check_reply
+        previous_field = 'open_message' if previous_check_reply else 'closed_message'
+        previous_message = SMSMessage.objects.filter(
+            from_number=sms_message.from_number,
+            to_number=sms_message.to_number,
+            type=SMSMessage.TYPE_CHOICES.SENT,
+            check_reply=previous_check_reply,
+            sent_at__isnull=False,
+        ).exclude(pk=sms_message.pk).order_by('-sent_at').first()
+        cls.objects.filter(**{previous_field: sms_message}).update(**{previous_field: previous_message})
+        cls.add_messages(sms_message)
@@ -5,7 +5,6 @@ import re
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
-from django.db.models import F
 from django.utils.translation import ugettext_lazy as _
 from model_utils import Choices
 
@@ -14,6 +13,7 @@ from r3sourcer.apps.sms_interface.managers import SMSMessageObjectOwnerManager
 from r3sourcer.apps.sms_interface.mixins import DeadlineCheckingMixin
 from r3sourcer.helpers.models.abs import TimeZoneUUIDModel
 
+from ..sms_conversations import SMSConversation
 from ..sms_related_objects import SMSRelatedObject
 
 
@@ -191,15 +191,12 @@ class SMSMessage(DeadlineCheckingMixin, TimeZoneUUIDModel):
 
     objects = SMSMessageObjectOwnerManager()
 
+    geo_address_path = 'company__company_addresses__address'
+    geo_address_filter = {'company__company_addresses__hq': True}
+
     @property
     def geo(self):
-        return self.__class__.objects.filter(
-            pk=self.pk,
-            company__company_addresses__hq=True,
-        ).annotate(
-            longitude=F('company__company_addresses__address__longitude'),
-            latitude=F('company__company_addresses__address__latitude')
-        ).values_list('longitude', 'latitude').get()
+        return self.get_geo_address()[:2]
 
     @property
     def sent_at_tz(self):
@@ -226,17 +223,17 @@ class SMSMessage(DeadlineCheckingMixin, TimeZoneUUIDModel):
         return self.check_reply_at
 
     def is_late_reply(self):
+        if self.type != self.TYPE_CHOICES.RECEIVED or self.get_sent_by_reply():
+            return False
+
         sent_message = self.get_sent_by_reply(check_reply=False)
-        return (
-            self.type == self.TYPE_CHOICES.RECEIVED and
-            not self.get_sent_by_reply() and
-            sent_message and
-            not SMSMessage.objects.filter(
-                sent_at__range=[sent_message.sent_at_utc, self.sent_at_utc],
-                from_number=sent_message.from_number,
-                to_number=sent_message.to_number
-            ).exclude(id__in=[self.pk, sent_message.id]).exists()
-        )
+        if not sent_message:
+            return False
+
+        # late reply is the reply to the last message sent to the number
+        conversation = self.get_conversation()
+        open_message = conversation.open_message
+        return not (open_message and sent_message.sent_at_utc <= open_message.sent_at_utc <= self.sent_at_utc)
 
     def is_positive_answer(self):
         pattern = r'^(y[a-z]s|y|ye[a-z]{0,1}?|yse|yeah|ya(s*)|yo|ok)(\W(.|\n)*)?$'
@@ -268,13 +265,49 @@ class SMSMessage(DeadlineCheckingMixin, TimeZoneUUIDModel):
             d_timedelta = datetime.timedelta(minutes=self.delivery_timeout)
             self.check_delivery_at = self.now_utc + d_timedelta
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._indexed_check_reply = instance.__dict__.get('check_reply')
+        return instance
+
     def save(self, *args, **kwargs):
-        if self._state.adding:
+        adding = self._state.adding
+        if adding:
             self.set_check_dates()
         super().save(*args, **kwargs)
 
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'check_reply' not in update_fields:
+            return
+
+        if adding:
+            SMSConversation.add_messages(self)
+        elif self.type == self.TYPE_CHOICES.SENT and self.check_reply != getattr(self, '_indexed_check_reply', None):
+            SMSConversation.update_message(self)
+
+        self._indexed_check_reply = self.check_reply
+
+    def get_conversation(self):
+        """
+        Conversation the message is reply to
+        """
+        return SMSConversation.objects.filter(
+            from_number=self.to_number, to_number=self.from_number
+        ).select_related('open_message', 'closed_message').first()
+
     def get_sent_by_reply(self, check_reply=True):
-        return self.__class__.objects.filter(
+        conversation = self.get_conversation()
+        if conversation is None:
+            return None
+
+        sent_message = conversation.open_message if check_reply else conversation.closed_message
+        if (sent_message is not None and sent_message.check_reply == check_reply and
+                sent_message.sent_at <= self.sent_at_utc):
+            return sent_message
+
+        # the message is deleted (pointer is set to null), sent after the reply or changed outside of the conversation
+        return SMSMessage.objects.filter(
             sent_at__lte=self.sent_at_utc,
             from_number=self.to_number,
             to_number=self.from_number,
@@ -307,6 +340,21 @@ class SMSMessage(DeadlineCheckingMixin, TimeZoneUUIDModel):
             ) for obj in args if isinstance(obj, (dict, models.Model))
         ]
 
+    def make_related_objects(self, *args):
+        """
+        Makes unsaved related objects of the message for bulk insert, accepts the same args as add_related_objects
+        """
+        related_objects = {}
+        for obj in args:
+            if isinstance(obj, models.Model):
+                related_objects.setdefault(obj.id, SMSRelatedObject(sms=self, content_object=obj))
+            elif isinstance(obj, dict):
+                related_objects.setdefault(obj['object_id'], SMSRelatedObject(
+                    sms=self, object_id=obj['object_id'], content_type_id=obj['content_type']
+                ))
+
+        return list(related_objects.values())
+
     def get_related_objects(self, obj_type=None):
         qry = models.Q()
         if obj_type is not None:
@@ -353,3 +401,4 @@ class SMSMessage(DeadlineCheckingMixin, TimeZoneUUIDModel):
         ordering = ['-sent_at']
         verbose_name = _("SMS message")
         verbose_name_plural = _("SMS messages")
+        index_together = [('from_number', 'to_number', 'sent_at')]
@@ -1,16 +1,17 @@
 import logging
 from abc import ABCMeta, abstractmethod
+from collections import OrderedDict, defaultdict
 
 from django.conf import settings
 from django.db import transaction
 from phonenumber_field.phonenumber import PhoneNumber
 
-from r3sourcer.apps.core.models import Contact, Company
+from r3sourcer.apps.core.models import Contact, Company, ContactLanguage
 from r3sourcer.apps.core.service import factory
 from r3sourcer.apps.core.utils.companies import get_site_master_company
 from .exceptions import SMSServiceError, AccountHasNotPhoneNumbers, SMSBalanceError, SMSDisableError
 from .helpers import get_sms
-from .models import SMSMessage, SMSTemplate
+from .models import SMSConversation, SMSMessage, SMSRelatedObject, SMSTemplate
 
 logger = logging.getLogger(__name__)
 
@@ -18,32 +19,55 @@ logger = logging.getLogger(__name__)
 class BaseSMSService(metaclass=ABCMeta):
 
     def get_template(self, contact: Contact, master_company: Company, tpl_name: str) -> SMSTemplate:
-        # notification language selection
-        if contact.is_candidate_contact():
-            languages = contact.languages.order_by('-default')
+        return self.get_templates([contact], master_company, tpl_name)[contact.id]
 
-        elif contact.is_company_contact():
-            languages = master_company.languages.order_by('-default')
-
-        # template selection
-        templates = SMSTemplate.objects.filter(slug=tpl_name, company=master_company)
-        template = None
+    def get_templates(self, contacts, master_company, tpl_name):
+        """
+        Selects notification templates of the contacts.
 
-        for lang in languages:
-            try:
-                template = templates.get(language=lang.language)
-                break
-            except SMSTemplate.DoesNotExist:
-                continue
+        Candidates get the template of their languages, company contacts get the template of master
+        company languages, default language template is used if nothing matches. All languages and
+        templates are loaded with one query each.
 
-        if template is None:
-            template = templates.filter(language_id=settings.DEFAULT_LANGUAGE).first()
+        :return: dict of {contact id: SMSTemplate or None}
+        """
+        templates = {}
+        for template in SMSTemplate.objects.filter(
+            slug=tpl_name, company=master_company
+        ).select_related('language').order_by('pk'):
+            templates.setdefault(template.language_id, template)
+
+        candidate_ids = set(Contact.objects.filter(
+            id__in=[contact.id for contact in contacts], candidate_contacts__isnull=False
+        ).values_list('id', flat=True))
+        candidate_languages = defaultdict(list)
+        for contact_id, language_id in ContactLanguage.objects.filter(
+            contact_id__in=candidate_ids
+        ).order_by('-default').values_list('contact_id', 'language_id'):
+            candidate_languages[contact_id].append(language_id)
+
+        company_languages = None
+
+        result = {}
+        for contact in contacts:
+            if contact.id in candidate_ids:
+                languages = candidate_languages[contact.id]
+            else:
+                if company_languages is None:
+                    company_languages = list(
+                        master_company.languages.order_by('-default').values_list('language_id', flat=True)
+                    )
+                languages = company_languages
+
+            result[contact.id] = next(
+                (templates[language] for language in languages if language in templates),
+                templates.get(settings.DEFAULT_LANGUAGE)
+            )
 
-        if template is None:
+        if None in result.values():
             logger.exception('Cannot find sms template with name %s', tpl_name)
-            # raise Exception('Cannot find sms template with name:', tpl_name)
 
-        return template
+        return result
 
     @transaction.atomic
     def send(self, to_number, text, from_number, related_obj=[], **kwargs):
@@ -114,6 +138,126 @@ class BaseSMSService(metaclass=ABCMeta):
 
             return sms_message
 
+    @transaction.atomic
+    def send_tpl_bulk(self, messages, master_company_obj, from_number=None):
+        """
+        Sends templated SMS messages to many contacts at once.
+
+        Templates of all contacts are resolved with one query per template slug and rendered in memory,
+        messages and their related objects are inserted in bulk and SMS balance of every company is
+        debited once for the whole batch.
+
+        :param messages: list of (contact, template, params) items, template is SMSTemplate or its slug,
+                         params are the same as send_tpl() kwargs
+        :param master_company_obj: master company of the templates
+        :param from_number: sender number
+        :return: list of SMSMessage or None for every item of the messages
+        """
+        if isinstance(from_number, PhoneNumber):
+            from_number = from_number.as_e164
+
+        contacts_by_slug = defaultdict(list)
+        for contact_obj, template, _ in messages:
+            if not isinstance(template, SMSTemplate):
+                contacts_by_slug[template].append(contact_obj)
+
+        templates = {
+            slug: self.get_templates(contacts, master_company_obj, slug) for slug, contacts in contacts_by_slug.items()
+        }
+
+        to_numbers = []
+        for contact_obj, _, params in messages:
+            if params.get('new_phone_mobile') == True:
+                to_number = contact_obj.new_phone_mobile
+            else:
+                to_number = contact_obj.phone_mobile
+            to_numbers.append(to_number.as_e164 if isinstance(to_number, PhoneNumber) else to_number)
+
+        recipients = {}
+        for recipient in Contact.objects.filter(phone_mobile__in={n for n in to_numbers if n}).order_by('pk'):
+            recipients.setdefault(recipient.phone_mobile.as_e164, recipient)
+
+        sms_messages = [None] * len(messages)
+        companies = {}
+        batches = OrderedDict()
+        for index, ((contact_obj, template, params), to_number) in enumerate(zip(messages, to_numbers)):
+            if not isinstance(template, SMSTemplate):
+                template = templates[template][contact_obj.id]
+
+            recipient = recipients.get(to_number)
+            if template is None or recipient is None or not recipient.sms_enabled:
+                continue
+
+            recipient_company = recipient.get_closest_company()
+            if recipient_company not in companies:
+                companies[recipient_company] = (
+                    self.get_sending_company(recipient_company),
+                    self.get_from_number(from_number, recipient_company),
+                )
+
+            company, company_from_number = companies[recipient_company]
+            if not company:
+                continue
+
+            sms_message = get_sms(
+                from_number=company_from_number,
+                to_number=to_number,
+                text=template.compile(**params)['text'],
+                company=company,
+                **params
+            )
+            sms_message.template = template
+            sms_messages[index] = sms_message
+
+            related_objs = [params.get('related_obj'), *params.get('related_objs', [])]
+            batches.setdefault(company, []).append((index, sms_message, related_objs))
+
+        to_send = []
+        related_objects = []
+        for company, batch in batches.items():
+            try:
+                self.sms_disable(company)
+                self.substract_segments_cost(company, sum(sms_message.segments for _, sms_message, _ in batch))
+            except SMSBalanceError:
+                error_code = "No Funds"
+                error_message = "SMS balance should be positive, your is: {}".format(company.sms_balance.balance)
+            except SMSDisableError:
+                error_code = "SMS disabled"
+                error_message = "SMS sending is disabled for company {}, your SMS balance is: {}".format(
+                    company, company.sms_balance.balance
+                )
+            else:
+                error_code = error_message = None
+
+            for index, sms_message, related_objs in batch:
+                sms_message.set_check_dates()
+                if error_code is None:
+                    to_send.append((index, sms_message))
+                    related_objects.extend(sms_message.make_related_objects(*related_objs))
+                else:
+                    sms_message.error_code = error_code
+                    sms_message.error_message = error_message
+
+        created_messages = SMSMessage.objects.bulk_create([
+            sms_message for sms_message in sms_messages if sms_message is not None
+        ])
+        SMSConversation.add_messages(*created_messages)
+        SMSRelatedObject.objects.bulk_create(related_objects)
+
+        for index, sms_message in to_send:
+            try:
+                self.process_sms_send(sms_message)
+
+                logger.info("Message sent: sid={}; to_number={}".format(sms_message.sid, sms_message.to_number))
+            except SMSServiceError as e:
+                sms_message.error_message = str(e)
+                sms_message.save(update_fields=['error_message'])
+            except AccountHasNotPhoneNumbers:
+                sms_message.delete()
+                sms_messages[index] = None
+
+        return sms_messages
+
     @abstractmethod
     def process_sms_send(self, sms_message):
         """
@@ -207,25 +351,23 @@ class BaseSMSService(metaclass=ABCMeta):
             )
             return
 
+        related_objects = []
         if sent_message:
-            sms_message.add_related_objects(*sent_message.get_related_objects())
+            related_objects = sent_message.get_related_objects()
+            sms_message.add_related_objects(*related_objects)
             sent_message.no_check_reply()
 
         elif sms_message.is_late_reply():
             sent_message = sms_message.get_sent_by_reply(check_reply=False)
             # add related object to late reply
-            sms_message.add_related_objects(*sent_message.get_related_objects())
+            related_objects = sent_message.get_related_objects()
+            sms_message.add_related_objects(*related_objects)
             sent_message.late_reply = sms_message
             sent_message.save(update_fields=['late_reply_id'])
             logger.info('Received late reply for message {}: sent: {}; reply: {};'.format(
                 sent_message, sent_message.id, sms_message.id
             ))
 
-        if sent_message is not None:
-            related_objects = sent_message.get_related_objects()
-        else:
-            related_objects = []
-
         for related_object in [x for x in related_objects if hasattr(x, 'process_sms_reply')]:
             logger.info('Run process_sms_reply. Related object: {}; Answer: {}'.format(
                 related_object, positive
@@ -279,6 +421,15 @@ class BaseSMSService(metaclass=ABCMeta):
         if self._get_recipient(to_number) is None:
             return
 
+        return self.get_sending_company(company)
+
+    def get_sending_company(self, company):
+        """
+        Gets company which sends SMS messages, None if SMS sending is disabled
+        """
+        if not company:
+            return
+
         master_company = company.get_closest_master_company()
 
         if not master_company.company_settings.sms_enabled:
@@ -291,9 +442,12 @@ class BaseSMSService(metaclass=ABCMeta):
         return from_number
 
     def substract_sms_cost(self, company, sms_message):
+        self.substract_segments_cost(company, sms_message.segments)
+
+    def substract_segments_cost(self, company, segments):
         if company.sms_balance:
             if company.sms_balance.balance > 0:
-                company.sms_balance.substract_sms_cost(sms_message.segments)
+                company.sms_balance.substract_sms_cost(segments)
             else:
                 raise SMSBalanceError()
         else:
@@ -327,12 +481,15 @@ class FakeSMSService(BaseSMSService):
             res.append(sms)
         return res
 
-    def substract_sms_cost(self, company, sms_message):
+    def substract_segments_cost(self, company, segments):
         pass
 
     def can_send_sms(self, to_number, company=None):
-        company = get_site_master_company()
         if self._get_recipient(to_number) is None:
             return
 
+        return self.get_sending_company(company)
+
+    def get_sending_company(self, company):
+        company = get_site_master_company()
         return company if company.company_settings.sms_enabled else None
@@ -10,7 +10,7 @@ import pytest
 from django_mock_queries.query import MockSet, MockModel
 
 from r3sourcer.apps.sms_interface.models import (
-    SMSMessage, SMSRelatedObject,
+    SMSConversation, SMSMessage, SMSRelatedObject,
     )
 
 
@@ -158,6 +158,92 @@ class TestSMSMessage:
     def test_get_sent_by_reply_does_not_exists(self, first_sms):
         assert first_sms.get_sent_by_reply() is None
 
+    def test_get_sent_by_reply_sent_after_reply(self, contact, first_sms, second_sms):
+        SMSMessage.objects.create(
+            from_number=first_sms.to_number,
+            to_number=contact.phone_mobile,
+            sent_at=timezone.now() + timedelta(minutes=5),
+            type=SMSMessage.TYPE_CHOICES.SENT,
+            check_reply=True,
+        )
+
+        assert first_sms.get_sent_by_reply() == second_sms
+
+    def test_conversation_open_message(self, second_sms):
+        conversation = SMSConversation.objects.get(
+            from_number=second_sms.from_number, to_number=second_sms.to_number
+        )
+
+        assert conversation.open_message == second_sms
+        assert conversation.closed_message is None
+
+    def test_conversation_older_message(self, contact, second_sms):
+        SMSMessage.objects.create(
+            from_number=second_sms.from_number,
+            to_number=second_sms.to_number,
+            sent_at=second_sms.sent_at - timedelta(minutes=5),
+            type=SMSMessage.TYPE_CHOICES.SENT,
+            check_reply=True,
+        )
+
+        conversation = SMSConversation.objects.get(
+            from_number=second_sms.from_number, to_number=second_sms.to_number
+        )
+        assert conversation.open_message == second_sms
+
+    def test_conversation_no_check_reply(self, second_sms):
+        second_sms.no_check_reply()
+
+        conversation = SMSConversation.objects.get(
+            from_number=second_sms.from_number, to_number=second_sms.to_number
+        )
+        assert conversation.open_message is None
+        assert conversation.closed_message == second_sms
+
+    def test_conversation_no_check_reply_older_open_message(self, second_sms):
+        older_sms = SMSMessage.objects.create(
+            from_number=second_sms.from_number,
+            to_number=second_sms.to_number,
+            sent_at=second_sms.sent_at - timedelta(minutes=5),
+            type=SMSMessage.TYPE_CHOICES.SENT,
+            check_reply=True,
+        )
+        second_sms.no_check_reply()
+
+        conversation = SMSConversation.objects.get(
+            from_number=second_sms.from_number, to_number=second_sms.to_number
+        )
+        assert conversation.open_message == older_sms
+        assert conversation.closed_message == second_sms
+
+    def test_get_sent_by_reply_older_open_message(self, first_sms, second_sms):
+        older_sms = SMSMessage.objects.create(
+            from_number=second_sms.from_number,
+            to_number=second_sms.to_number,
+            sent_at=second_sms.sent_at - timedelta(minutes=5),
+            type=SMSMessage.TYPE_CHOICES.SENT,
+            check_reply=True,
+        )
+        second_sms.no_check_reply()
+
+        assert first_sms.get_sent_by_reply() == older_sms
+        assert not first_sms.is_late_reply()
+
+    def test_get_sent_by_reply_latest_open_message_deleted(self, first_sms, second_sms):
+        older_sms = SMSMessage.objects.create(
+            from_number=second_sms.from_number,
+            to_number=second_sms.to_number,
+            sent_at=second_sms.sent_at - timedelta(minutes=5),
+            type=SMSMessage.TYPE_CHOICES.SENT,
+            check_reply=True,
+        )
+        second_sms.delete()
+
+        assert first_sms.get_sent_by_reply() == older_sms
+
+    def test_conversation_received_message(self, first_sms):
+        assert not SMSConversation.objects.exists()
+
     def test_has_contact_relation(self, first_sms):
         assert first_sms.has_contact_relation()
 
@@ -6,10 +6,10 @@ import pytest
 
 from django.utils import timezone
 
-from r3sourcer.apps.core.models import Contact
+from r3sourcer.apps.core.models import Contact, ContactLanguage, Language
 from r3sourcer.apps.core.service import factory
-from r3sourcer.apps.sms_interface.exceptions import SMSServiceError
-from r3sourcer.apps.sms_interface.models import SMSMessage
+from r3sourcer.apps.sms_interface.exceptions import SMSBalanceError, SMSServiceError
+from r3sourcer.apps.sms_interface.models import SMSMessage, SMSRelatedObject, SMSTemplate
 from r3sourcer.apps.sms_interface.services import (
     BaseSMSService, FakeSMSService
 )
@@ -449,3 +449,61 @@ class TestSMSServices:
 
         assert mock_log.exception.called
         assert not mock_send.called
+
+    def test_get_templates_default_language(self, service, sms_template, candidate_contact, contact, company):
+        templates = service.get_templates([candidate_contact.contact, contact], company, 'sms-template')
+
+        assert templates == {candidate_contact.contact.id: sms_template, contact.id: sms_template}
+
+    def test_get_templates_contact_language(self, service, sms_template, candidate_contact, company):
+        language = Language.objects.create(alpha_2='de', name='German')
+        ContactLanguage.objects.create(contact=candidate_contact.contact, language=language, default=True)
+        de_template = SMSTemplate.objects.create(
+            name='SMS Template', slug='sms-template', type=SMSTemplate.SMS,
+            message_text_template='vorlage', company=company, language=language,
+        )
+
+        templates = service.get_templates([candidate_contact.contact], company, 'sms-template')
+
+        assert templates[candidate_contact.contact.id] == de_template
+
+    @mock.patch.object(SMSTestService, 'substract_segments_cost')
+    @mock.patch.object(SMSTestService, 'get_sending_company')
+    @mock.patch.object(SMSTestService, 'process_sms_send')
+    def test_send_tpl_bulk(
+        self, mock_sms_send, mock_sending_company, mock_substract, service, sms_template, candidate_contact,
+        contact, company
+    ):
+        mock_sending_company.return_value = company
+
+        sms_messages = service.send_tpl_bulk([
+            (candidate_contact.contact, 'sms-template', {'related_obj': candidate_contact}),
+            (contact, sms_template, {}),
+        ], company)
+
+        assert len(sms_messages) == 2
+        assert SMSMessage.objects.filter(template=sms_template, text='template').count() == 2
+        assert SMSRelatedObject.objects.filter(sms=sms_messages[0], object_id=candidate_contact.id).exists()
+        mock_substract.assert_called_once_with(company, 2)
+        assert mock_sms_send.call_count == 2
+
+    @mock.patch.object(SMSTestService, 'substract_segments_cost', side_effect=SMSBalanceError)
+    @mock.patch.object(SMSTestService, 'get_sending_company')
+    @mock.patch.object(SMSTestService, 'process_sms_send')
+    def test_send_tpl_bulk_no_funds(
+        self, mock_sms_send, mock_sending_company, mock_substract, service, sms_template, candidate_contact, company
+    ):
+        mock_sending_company.return_value = company
+
+        sms_messages = service.send_tpl_bulk([(candidate_contact.contact, 'sms-template', {})], company)
+
+        assert sms_messages[0].error_code == 'No Funds'
+        assert SMSMessage.objects.filter(error_code='No Funds').count() == 1
+        assert not mock_sms_send.called
+
+    @mock.patch.object(SMSTestService, 'process_sms_send')
+    def test_send_tpl_bulk_template_not_found(self, mock_sms_send, service, candidate_contact, company):
+        sms_messages = service.send_tpl_bulk([(candidate_contact.contact, 'sms', {})], company)
+
+        assert sms_messages == [None]
+        assert not SMSMessage.objects.exists()
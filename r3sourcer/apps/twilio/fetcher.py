@@ -0,0 +1,102 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import requests
+from django.conf import settings
+
+from r3sourcer.helpers.datetimes import utc_now
+
+
+logger = logging.getLogger(__name__)
+
+MESSAGES_LIST_URL = '{}/2010-04-01/Accounts/{}/Messages.json'
+
+
+def format_sent_after(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    return value.isoformat()
+
+
+def fetch_account_messages(auth, account_sid, sent_after=None, base_url=None):
+    """
+    Fetches messages of the account following the pages of the Twilio messages list
+
+    :param auth: (sid, auth token) of the credential
+    :param account_sid: sid of the account or sub-account
+    :param sent_after: date or datetime, only messages sent after it are fetched
+    :param base_url: Twilio REST API url, settings.TWILIO_API_URL by default
+    :return: list of message dicts
+    """
+    base_url = base_url or settings.TWILIO_API_URL
+    url = MESSAGES_LIST_URL.format(base_url, account_sid)
+    params = {'PageSize': settings.TWILIO_FETCH_PAGE_SIZE}
+    if sent_after:
+        params['DateSent>'] = format_sent_after(sent_after)
+
+    messages = []
+    with requests.Session() as session:
+        session.auth = auth
+        while url:
+            response = session.get(url, params=params, timeout=settings.TWILIO_FETCH_TIMEOUT)
+            response.raise_for_status()
+            page = response.json()
+
+            messages.extend(page.get('messages', []))
+
+            # next page uri contains all query params of the list
+            next_page_uri = page.get('next_page_uri')
+            url = next_page_uri and '{}{}'.format(base_url, next_page_uri)
+            params = None
+
+    return messages
+
+
+def fetch_messages(accounts, workers=None, base_url=None):
+    """
+    Fetches new messages of the accounts and stores them.
+
+    Accounts are requested by the thread pool, messages of every account are upserted in bulk
+    as soon as they are fetched and the account high-water mark is moved. Failed accounts keep
+    their high-water mark and are fetched from it next time.
+
+    :param accounts: list of TwilioAccount
+    :param workers: size of the thread pool
+    :param base_url: Twilio REST API url
+    :return: list of created TwilioSMSMessage
+    """
+    from r3sourcer.apps.twilio.models import TwilioSMSMessage
+
+    if not accounts:
+        return []
+
+    workers = workers or settings.TWILIO_FETCH_WORKERS
+    sync_date = utc_now().date()
+
+    created = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                fetch_account_messages,
+                (account.credential.sid, account.credential.auth_token),
+                account.sid,
+                account.get_fetch_from(),
+                base_url,
+            ): account for account in accounts
+        }
+
+        for future in as_completed(futures):
+            account = futures[future]
+            try:
+                remote_messages = future.result()
+            except (requests.RequestException, ValueError) as e:
+                logger.warning('Messages of Twilio account %s are not fetched: %s', account.sid, e)
+                continue
+
+            logger.info('Fetched %s messages of Twilio account %s', len(remote_messages), account.sid)
+            created.extend(TwilioSMSMessage.upsert_remote(remote_messages))
+            account.set_fetched(remote_messages, sync_date)
+
+    return created
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twilio', '0003_auto_20191212_1443'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='twilioaccount',
+            name='last_message_sent_at',
+            field=models.DateTimeField(default=None, editable=False, null=True, verbose_name='Last fetched message sent at'),
+        ),
+    ]
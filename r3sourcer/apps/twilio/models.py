@@ -1,6 +1,8 @@
 import logging
 from datetime import timedelta
+from email.utils import parsedate_to_datetime
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.db import transaction
@@ -23,6 +25,14 @@ def get_parse_date_from():
     return utc_now() - timedelta(hours=24)
 
 
+def parse_remote_date(value):
+    """
+    Parses RFC 2822 date of the Twilio REST API
+    """
+    if value:
+        return tz2utc(parsedate_to_datetime(value))
+
+
 class TwilioCredential(UUIDModel, DeadlineCheckingMixin):
 
     INVALID_CREDENTIALS = _("Invalid account sid/auth token: %s")
@@ -194,6 +204,14 @@ class TwilioAccount(UUIDModel):
         editable=False
     )
 
+    # high-water mark of the fetched messages
+    last_message_sent_at = models.DateTimeField(
+        verbose_name=_("Last fetched message sent at"),
+        default=None,
+        null=True,
+        editable=False
+    )
+
     def __str__(self):
         return '#ID:{}: #{}'.format(self.sid, self.credential)
 
@@ -242,6 +260,32 @@ class TwilioAccount(UUIDModel):
             last_sync = self.credential.parse_from_date
         return last_sync
 
+    def get_fetch_from(self):
+        """
+        Messages sent after the high-water mark are fetched, overlap picks up messages
+        which are sent at the same time as the previous fetch
+        """
+        if self.last_message_sent_at:
+            return self.last_message_sent_at - timedelta(minutes=settings.TWILIO_FETCH_OVERLAP_MINUTES)
+
+        return self.get_last_sync()
+
+    def set_fetched(self, remote_messages, sync_date):
+        """
+        Moves the high-water mark to the latest fetched message
+
+        :param remote_messages: list of message dicts of the Twilio REST API
+        :param sync_date: date of the sync
+        """
+        sent_dates = [parse_remote_date(remote_message.get('date_sent')) for remote_message in remote_messages]
+        sent_dates = [sent_date for sent_date in sent_dates if sent_date]
+        if self.last_message_sent_at:
+            sent_dates.append(self.last_message_sent_at)
+
+        self.last_message_sent_at = max(sent_dates, default=None)
+        self.last_sync = sync_date
+        self.save(update_fields=['last_sync', 'last_message_sent_at'])
+
     @classmethod
     def fetch_remote(cls, credential, remote_account):
         values_account = {
@@ -261,47 +305,75 @@ class TwilioAccount(UUIDModel):
 class TwilioSMSMessage(sms_models.SMSMessage):
 
     @classmethod
-    @transaction.atomic
-    def fetch_remote(cls, account, remote_message):
-
-        # get message type (sent or delivered)
-        if remote_message.status == cls.TYPE_CHOICES.RECEIVED.lower():
+    def dict_from_remote(cls, remote_message):
+        """
+        Message values of the message dict of the Twilio REST API
+        """
+        if remote_message['status'] == cls.TYPE_CHOICES.RECEIVED.lower():
             message_type = cls.TYPE_CHOICES.RECEIVED
         else:
             message_type = cls.TYPE_CHOICES.SENT
 
-        values_message = {
-            'sid': remote_message.sid,
-            'from_number': remote_message.from_,
-            'to_number': remote_message.to,
-            'text': remote_message.body,
-            'sent_at': tz2utc(remote_message.date_sent),
-            'updated_at': tz2utc(remote_message.date_updated),
-            'created_at': tz2utc(remote_message.date_created),
-            'status': remote_message.status.upper(),
+        error_code = remote_message.get('error_code')
+
+        return {
+            'sid': remote_message['sid'],
+            'from_number': remote_message['from'],
+            'to_number': remote_message['to'],
+            'text': remote_message['body'],
+            'sent_at': parse_remote_date(remote_message.get('date_sent')),
+            'status': remote_message['status'].upper(),
             'type': message_type,
-            'error_code': remote_message.error_code,
-            'error_message': remote_message.error_message,
+            'error_code': str(error_code) if error_code is not None else None,
+            'error_message': remote_message.get('error_message'),
         }
 
-        sms_messages = cls.objects.select_for_update().filter(sid=remote_message.sid)
-        if sms_messages.count() > 1:
-            sms_message = sms_messages.filter(
-                models.Q(template__isnull=False) | models.Q(related_object_id__isnull=False)
-            ).first()
-        else:
-            sms_message = None
-
-        sms_message = sms_message or sms_messages.first()
-
-        if sms_message is not None:
-            for key, value in values_message.items():
-                setattr(sms_message, key, value)
-            sms_message.save()
-        else:
-            sms_message = cls.objects.create(**values_message)
+    @classmethod
+    @transaction.atomic
+    def upsert_remote(cls, remote_messages):
+        """
+        Creates or updates fetched messages in bulk, unchanged messages are not written
 
-        return sms_message
+        :param remote_messages: list of message dicts of the Twilio REST API
+        :return: list of created messages
+        """
+        values = {}
+        for remote_message in remote_messages:
+            values[remote_message['sid']] = cls.dict_from_remote(remote_message)
+
+        if not values:
+            return []
+
+        existing = {}
+        for sms_message in cls.objects.select_for_update().filter(sid__in=values.keys()).order_by('created_at'):
+            # duplicates of the sid are resolved to the message sent by the system (with template or related object)
+            current = existing.get(sms_message.sid)
+            is_linked = sms_message.template_id is not None or sms_message.related_object_id is not None
+            if current is None or (is_linked and current.template_id is None and current.related_object_id is None):
+                existing[sms_message.sid] = sms_message
+
+        created = []
+        for sid, values_message in values.items():
+            sms_message = existing.get(sid)
+            if sms_message is None:
+                sms_message = cls(is_fetched=True, **values_message)
+                sms_message.set_check_dates()
+                created.append(sms_message)
+                continue
+
+            changed = {
+                key: value for key, value in values_message.items() if getattr(sms_message, key) != value
+            }
+            if not sms_message.is_fetched:
+                changed['is_fetched'] = True
+
+            if changed:
+                cls.objects.filter(pk=sms_message.pk).update(updated_at=utc_now(), **changed)
+
+        cls.objects.bulk_create(created)
+        sms_models.SMSConversation.add_messages(*created)
+
+        return created
 
     class Meta:
         proxy = True
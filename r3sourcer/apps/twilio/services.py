@@ -4,6 +4,7 @@ from r3sourcer.apps.core.utils.companies import get_master_companies_by_contact
 from r3sourcer.apps.sms_interface.exceptions import AccountHasNotPhoneNumbers
 from r3sourcer.apps.sms_interface.services import BaseSMSService
 from r3sourcer.apps.twilio import models
+from r3sourcer.apps.twilio.fetcher import fetch_messages
 from r3sourcer.helpers.datetimes import utc_now
 
 logger = logging.getLogger(__name__)
@@ -27,34 +28,21 @@ class TwilioSMSService(BaseSMSService):
         sms_message.save(update_fields=['sid', 'from_number'])
 
     def process_sms_fetch(self):
-        sms_list = []
+        accounts = []
+        credentials = []
 
         """ Fetch all credentials from db """
         c_items = models.TwilioCredential.objects.all()
 
         for c in c_items.iterator():
-            """ Update current credential (numbers, accounts, messages) """
+            """ Update current credential (numbers, accounts) """
             phone_numbers = []
-            last_sync = utc_now()
+            c.last_sync = utc_now()
             for n in c.client.api.incoming_phone_numbers.stream():
                 phone_numbers.append(models.TwilioPhoneNumber.fetch_remote(n, c.company))
 
             for remote_account in c.client.api.accounts.stream():
-                account = models.TwilioAccount.fetch_remote(c, remote_account)
-
-                """ Update current account (messages) """
-                params = {
-                    'date_sent_after': account.get_last_sync()
-                }  # get all messages sent_at after `self.get_last_sync()`
-
-                acc_last_sync = utc_now().date()
-                logger.info("Sync params: {}".format(params))
-
-                for sms_message in remote_account.messages.stream(**params):
-                    sms_list.append(models.TwilioSMSMessage.fetch_remote(account, sms_message))
-
-                account.last_sync = acc_last_sync
-                account.save(update_fields=['last_sync'])
+                accounts.append(models.TwilioAccount.fetch_remote(c, remote_account))
 
             acc_sid_list = models.TwilioPhoneNumber.objects.filter(twilio_accounts=None).values_list(
                 'account_sid', flat=True
@@ -66,7 +54,12 @@ class TwilioSMSService(BaseSMSService):
                         *models.TwilioPhoneNumber.objects.filter(account_sid=sid)
                     )
 
-            c.last_sync = last_sync
+            credentials.append(c)
+
+        """ Fetch messages of all accounts (only messages new for the system are returned) """
+        sms_list = fetch_messages(accounts)
+
+        for c in credentials:
             c.save(update_fields=['last_sync'])
 
         return sms_list
@@ -0,0 +1,45 @@
+import pytest
+
+from r3sourcer.apps.core.models import User, Company, CompanyContact
+from r3sourcer.apps.twilio.models import TwilioAccount, TwilioCredential
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(
+        email='test@test.tt', phone_mobile='+12345678901',
+        password='test1234'
+    )
+
+
+@pytest.fixture
+def primary_contact(db, user):
+    return CompanyContact.objects.create(contact=user.contact)
+
+
+@pytest.fixture
+def company(db, primary_contact):
+    return Company.objects.create(
+        name='Company',
+        business_id='111',
+        registered_for_gst=True,
+        primary_contact=primary_contact,
+        type=Company.COMPANY_TYPES.master,
+    )
+
+
+@pytest.fixture
+def twilio_credentials(db, company):
+    return TwilioCredential.objects.create(
+        company=company,
+        sid='AC_credential',
+        auth_token='auth_token',
+    )
+
+
+@pytest.fixture
+def twilio_account(db, twilio_credentials):
+    return TwilioAccount.objects.create(
+        credential=twilio_credentials,
+        sid='AC_account',
+    )
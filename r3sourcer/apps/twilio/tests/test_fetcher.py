@@ -0,0 +1,95 @@
+from datetime import datetime
+
+import pytest
+import pytz
+import requests_mock
+
+from r3sourcer.apps.sms_interface.models import SMSMessage
+from r3sourcer.apps.twilio.fetcher import MESSAGES_LIST_URL, fetch_account_messages, fetch_messages
+from r3sourcer.apps.twilio.models import TwilioSMSMessage
+
+
+BASE_URL = 'http://twilio.local'
+
+
+def remote_message(sid, date_sent='Mon, 01 Mar 2021 10:00:00 +0000', status='received', body='yes'):
+    return {
+        'sid': sid,
+        'from': '+12345678901',
+        'to': '+123456789',
+        'body': body,
+        'status': status,
+        'date_sent': date_sent,
+        'date_created': date_sent,
+        'date_updated': date_sent,
+        'error_code': None,
+        'error_message': None,
+    }
+
+
+def list_url(account_sid):
+    return MESSAGES_LIST_URL.format(BASE_URL, account_sid)
+
+
+class TestFetchAccountMessages:
+
+    def test_fetch_pages(self, settings):
+        next_page_uri = '/2010-04-01/Accounts/AC_account/Messages.json?PageSize=1&Page=1&PageToken=PA1'
+
+        with requests_mock.Mocker() as mock_request:
+            mock_request.get(list_url('AC_account'), [
+                {'json': {'messages': [remote_message('SM1')], 'next_page_uri': next_page_uri}},
+                {'json': {'messages': [remote_message('SM2')], 'next_page_uri': None}},
+            ])
+
+            messages = fetch_account_messages(
+                ('AC_credential', 'token'), 'AC_account', datetime(2021, 3, 1, 9, tzinfo=pytz.utc), BASE_URL
+            )
+
+            first_request, second_request = mock_request.request_history
+
+        assert [message['sid'] for message in messages] == ['SM1', 'SM2']
+        assert first_request.qs['datesent>'] == ['2021-03-01t09:00:00z']
+        assert second_request.qs['pagetoken'] == ['pa1']
+
+
+@pytest.mark.django_db
+class TestFetchMessages:
+
+    def test_fetch_messages(self, twilio_account):
+        with requests_mock.Mocker() as mock_request:
+            mock_request.get(list_url(twilio_account.sid), json={
+                'messages': [remote_message('SM1'), remote_message('SM2', 'Mon, 01 Mar 2021 11:00:00 +0000')],
+                'next_page_uri': None,
+            })
+
+            created = fetch_messages([twilio_account], base_url=BASE_URL)
+
+        twilio_account.refresh_from_db()
+        assert len(created) == 2
+        assert SMSMessage.objects.filter(is_fetched=True, type=SMSMessage.TYPE_CHOICES.RECEIVED).count() == 2
+        assert twilio_account.last_message_sent_at == datetime(2021, 3, 1, 11, tzinfo=pytz.utc)
+
+    def test_fetch_messages_upsert(self, twilio_account):
+        TwilioSMSMessage.upsert_remote([remote_message('SM1', status='queued', body='offer')])
+
+        with requests_mock.Mocker() as mock_request:
+            mock_request.get(list_url(twilio_account.sid), json={
+                'messages': [remote_message('SM1', status='delivered', body='offer')],
+                'next_page_uri': None,
+            })
+
+            created = fetch_messages([twilio_account], base_url=BASE_URL)
+
+        assert created == []
+        assert SMSMessage.objects.get(sid='SM1').status == 'DELIVERED'
+
+    def test_fetch_messages_error(self, twilio_account):
+        with requests_mock.Mocker() as mock_request:
+            mock_request.get(list_url(twilio_account.sid), status_code=500)
+
+            created = fetch_messages([twilio_account], base_url=BASE_URL)
+
+        twilio_account.refresh_from_db()
+        assert created == []
+        assert twilio_account.last_message_sent_at is None
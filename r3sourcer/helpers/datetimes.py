@@ -1,9 +1,14 @@
 from datetime import datetime, timedelta, date, time
+from functools import lru_cache
 
 import pytz
 from django.conf import settings
 
 
+TIME_ZONE_COORDINATES_PRECISION = 3
+TIME_ZONE_CACHE_SIZE = 4096
+
+
 def utc_now():
     return datetime.now(pytz.utc)
 
@@ -56,12 +61,26 @@ def geo_time_zone(lng, lat):
     if None in (lng, lat):
         return pytz.timezone(default_tz)
 
+    return pytz.timezone(geo_time_zone_name(lng, lat))
+
+
+def geo_time_zone_name(lng, lat):
+    """
+    Resolves time zone name of the coordinates.
+    Names are cached process wide by coordinates rounded to ~100 meters.
+    """
+    return _find_time_zone_name(
+        round(float(lng), TIME_ZONE_COORDINATES_PRECISION), round(float(lat), TIME_ZONE_COORDINATES_PRECISION)
+    )
+
+
+@lru_cache(maxsize=TIME_ZONE_CACHE_SIZE)
+def _find_time_zone_name(lng, lat):
     tf = settings.TIME_ZONE_FINDER
     try:
-        time_zone = tf.timezone_at(lng=lng, lat=lat)
+        return tf.timezone_at(lng=lng, lat=lat)
     except pytz.UnknownTimeZoneError:
-        time_zone = default_tz
-    return pytz.timezone(time_zone)
+        return settings.TIME_ZONE
 
 
 def today_7_am():
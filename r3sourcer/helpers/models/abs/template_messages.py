@@ -1,5 +1,6 @@
 import collections
 import re
+import threading
 
 from django.core.exceptions import ValidationError
 from django.db import models
@@ -9,6 +10,52 @@ from django.utils.translation import ugettext_lazy as _
 from .uuid_models import UUIDModel
 
 
+COMPILED_TEMPLATES_CACHE_SIZE = 512
+
+_compiled_templates = collections.OrderedDict()
+_compiled_templates_lock = threading.Lock()
+_missing = object()
+
+
+class CompiledTemplate:
+    """
+    Template strings parsed once into literal text and placeholders.
+
+    Rendering resolves values of all placeholders in one pass and substitutes them
+    without regular expressions.
+    """
+
+    def __init__(self, template_cls, *raw_strings):
+        self.template_cls = template_cls
+        self.raw_strings = raw_strings
+        self.params = set()
+        self.rows = []
+
+        pattern = re.compile(template_cls.get_param_pattern(), re.I)
+        for raw_string in raw_strings:
+            parts = []
+            position = 0
+            for match in pattern.finditer(raw_string):
+                param = match.group('param')
+                parts.append((raw_string[position:match.start()], param, match.group(0)))
+                self.params.add(param)
+                position = match.end()
+
+            parts.append((raw_string[position:], None, None))
+            self.rows.append(parts)
+
+    def render(self, **params):
+        values_dict = self.template_cls.resolve_params(params, self.params)
+        values = {param: str(values_dict[param]) for param in self.params if param in values_dict}
+
+        return [
+            ''.join(
+                literal + (values.get(param, placeholder) if param is not None else '')
+                for literal, param, placeholder in parts
+            ) for parts in self.rows
+        ]
+
+
 class TemplateMessage(UUIDModel):
 
     INVALID_DEEP_MESSAGE = _("Max level deep: %s")
@@ -111,11 +158,7 @@ class TemplateMessage(UUIDModel):
                 'contact': Contact.objects.last()
             }
         """
-        subject_compiled, text_compiled, html_compiled = self.compile_string(
-            self.subject_template,
-            self.message_text_template,
-            self.message_html_template,
-            **params)
+        subject_compiled, text_compiled, html_compiled = self.get_compiled_template().render(**params)
 
         return {
             'id': self.id,
@@ -124,6 +167,30 @@ class TemplateMessage(UUIDModel):
             'subject': subject_compiled
         }
 
+    def get_compiled_template(self):
+        """
+        Compiled template of the instance, cached per template pk and updated_at
+        """
+        raw_strings = (self.subject_template, self.message_text_template, self.message_html_template)
+        if self._state.adding:
+            return CompiledTemplate(type(self), *raw_strings)
+
+        key = (type(self), self.pk, self.updated_at)
+        with _compiled_templates_lock:
+            compiled = _compiled_templates.get(key)
+            if compiled is not None:
+                _compiled_templates.move_to_end(key)
+
+        # instance can be changed in memory without saving
+        if compiled is None or compiled.raw_strings != raw_strings:
+            compiled = CompiledTemplate(type(self), *raw_strings)
+            with _compiled_templates_lock:
+                _compiled_templates[key] = compiled
+                if len(_compiled_templates) > COMPILED_TEMPLATES_CACHE_SIZE:
+                    _compiled_templates.popitem(last=False)
+
+        return compiled
+
     @classmethod
     def get_dict_values(cls, params, *rows, use_lookup=True):
         """Return dict with parsed variables as keys and params as its values.
@@ -135,68 +202,88 @@ class TemplateMessage(UUIDModel):
         :return: dict
         """
 
+        return cls.resolve_params(params, cls.get_require_params(*rows, use_lookup=use_lookup))
+
+    @classmethod
+    def resolve_params(cls, params, parsed_params):
+        """Return dict with values of the parsed variables and their lookup prefixes.
+        Values of the shared lookup prefixes are resolved once.
+
+        :param params: dict of variables
+        :param parsed_params: variable names
+
+        :return: dict
+        """
+
         values_dict = dict()
+        resolved = dict()
 
-        for parsed_item in cls.get_require_params(*rows, use_lookup=use_lookup):
+        for parsed_item in parsed_params:
 
             if parsed_item in params:
                 values_dict.setdefault(parsed_item, params.get(parsed_item))
 
-            split_parameter = parsed_item.split(cls.DELIMITER)[:cls.MAX_LEVEL_DEEP]
+            split_parameter = cls._split_param(parsed_item, params)
+            if len(split_parameter) == 0:
+                continue
 
-            parameter = ""
-            special_parameter = split_parameter[0]
+            parameter = split_parameter[0]
+            value = params[parameter]
+            values_dict.setdefault(parameter, value)
 
-            for p in list(split_parameter):
+            for index in range(1, len(split_parameter)):
+                lookup = tuple(split_parameter[:index + 1])
+                if lookup not in resolved:
+                    resolved[lookup] = cls._get_lookup_value(value, split_parameter[index])
 
-                if special_parameter in params:
-                    split_parameter = [special_parameter] + split_parameter[1:]
+                value = resolved[lookup]
+                if value is _missing:
                     break
-                split_parameter = split_parameter[1:]
-                if parameter:
-                    parameter = '{}{}{}'.format(parameter, cls.DELIMITER, p)
-                else:
-                    parameter = '{}'.format(parameter)
-                if len(split_parameter) == 0:
-                    break
-                special_parameter = '{}{}{}'.format(
-                    special_parameter,
-                    cls.DELIMITER,
-                    split_parameter[0]
-                )
 
-            if len(split_parameter) == 0:
-                continue
+                parameter = '{}{}{}'.format(parameter, cls.DELIMITER, split_parameter[index])
+                values_dict.setdefault(parameter, value)
 
-            value = params[split_parameter[0]]
+        return values_dict
 
-            for index, t in enumerate(split_parameter):
-                parameter = '{}{}'.format(parameter, t)
-                values_dict.setdefault(parameter, value)
-                if len(split_parameter) - 1 == index:
-                    continue
+    @classmethod
+    def _split_param(cls, parsed_item, params):
+        """
+        Splits variable into lookups, the first item is the shortest prefix found in params
+        """
+        split_parameter = parsed_item.split(cls.DELIMITER)[:cls.MAX_LEVEL_DEEP]
+        special_parameter = split_parameter[0]
 
-                key = split_parameter[index + 1]
+        for _level in list(split_parameter):
+            if special_parameter in params:
+                return [special_parameter] + split_parameter[1:]
 
-                # handler
-                if isinstance(value, collections.Iterable) and not hasattr(value, key):
-                    try:
-                        value = value[key]
-                    except Exception:
-                        break
+            split_parameter = split_parameter[1:]
+            if len(split_parameter) == 0:
+                break
+            special_parameter = '{}{}{}'.format(special_parameter, cls.DELIMITER, split_parameter[0])
+
+        return []
+
+    @classmethod
+    def _get_lookup_value(cls, value, key):
+        # handler
+        if isinstance(value, collections.Iterable) and not hasattr(value, key):
+            try:
+                value = value[key]
+            except Exception:
+                return _missing
+        else:
+            if key not in ['delete', 'save', 'update', 'fetch_remote']:
+                if hasattr(value, key):
+                    value = getattr(value, key)
                 else:
-                    if key not in ['delete', 'save', 'update', 'fetch_remote']:
-                        if hasattr(value, key):
-                            value = getattr(value, key)
-                        else:
-                            break
+                    return _missing
 
-                # checking for callable
-                if callable(value):
-                    value = value()
+        # checking for callable
+        if callable(value):
+            value = value()
 
-                parameter = '{}{}'.format(parameter, cls.DELIMITER)
-        return values_dict
+        return value
 
     @classmethod
     def get_require_params(cls, *rows, use_lookup=True):
@@ -209,11 +296,7 @@ class TemplateMessage(UUIDModel):
 
         :return: set of names variables'
         """
-        pattern = '{start}\\s*{pattern}\\s*{end}'.format(
-            start=re.escape(cls.INTERPOLATE_START),
-            pattern='(?P<param>[a-z]{1}[a-z\_0-9]*)',
-            end=re.escape(cls.INTERPOLATE_END)
-        )
+        pattern = cls.get_param_pattern()
 
         # get all param names
         parsed_params = set()
@@ -225,6 +308,14 @@ class TemplateMessage(UUIDModel):
 
         return set(parsed_params)
 
+    @classmethod
+    def get_param_pattern(cls):
+        return '{start}\\s*{pattern}\\s*{end}'.format(
+            start=re.escape(cls.INTERPOLATE_START),
+            pattern='(?P<param>[a-z]{1}[a-z\_0-9]*)',
+            end=re.escape(cls.INTERPOLATE_END)
+        )
+
     @classmethod
     def compile_string(cls, *raw_strings, **params):
         """Replace variables on param values.
@@ -234,21 +325,7 @@ class TemplateMessage(UUIDModel):
         :return: compiled rows
         """
 
-        raw_strings = list(raw_strings)
-
-        values_dict = cls.get_dict_values(params, *raw_strings)
-        for param, value in values_dict.items():
-            pattern = "{start}\\s*{param}\\s*{end}".format(
-                start=re.escape(cls.INTERPOLATE_START),
-                end=re.escape(cls.INTERPOLATE_END),
-                param=param
-            )
-
-            value = str(value)
-            for index, r in enumerate(raw_strings):
-                raw_strings[index] = re.sub(pattern, value, r)
-
-        return raw_strings
+        return CompiledTemplate(cls, *raw_strings).render(**params)
 
     def save(self, *args, **kwargs):
         if self._state.adding:
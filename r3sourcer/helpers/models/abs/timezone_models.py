@@ -8,7 +8,14 @@ from django_mock_queries.constants import ObjectDoesNotExist
 from r3sourcer.helpers.datetimes import datetime2timezone, geo_time_zone, tz2utc, utc2local
 
 
+_NOT_LOADED = object()
+
+
 class TimeZone(models.Model):
+    # lookup path to the Address of the object location and filters of the lookup
+    geo_address_path = None
+    geo_address_filter = {}
+
     class Meta:
         abstract = True
 
@@ -16,10 +23,63 @@ class TimeZone(models.Model):
     def geo(self):
         raise NotImplementedError
 
+    def get_stored_time_zone(self):
+        """
+        Time zone name persisted with the object, it is used instead of the geo lookup
+        """
+        return None
+
+    def _get_loaded_geo_address(self):
+        if self.geo_address_filter:
+            return _NOT_LOADED
+
+        obj = self
+        for field_name in self.geo_address_path.split('__'):
+            field = obj._meta.get_field(field_name)
+            if not (field.concrete and (field.many_to_one or field.one_to_one)):
+                return _NOT_LOADED
+            if getattr(obj, field.attname) is None:
+                return None
+            if not field.is_cached(obj):
+                return _NOT_LOADED
+
+            obj = getattr(obj, field_name)
+
+        return obj
+
+    def get_geo_address(self):
+        """
+        Coordinates and stored time zone of the address at `geo_address_path`.
+        Address loaded with select_related is used without query.
+
+        :return: (longitude, latitude, time zone name) tuple
+        """
+        address = self._get_loaded_geo_address()
+        if address is None:
+            return None, None, None
+        elif address is not _NOT_LOADED:
+            return address.longitude, address.latitude, address.time_zone
+
+        return self.__class__.objects.filter(pk=self.pk, **self.geo_address_filter).values_list(
+            '{}__longitude'.format(self.geo_address_path),
+            '{}__latitude'.format(self.geo_address_path),
+            '{}__time_zone'.format(self.geo_address_path),
+        ).get()
+
     @cached_property
     def tz(self):
+        time_zone = self.get_stored_time_zone()
+        if time_zone:
+            return pytz.timezone(time_zone)
+
         try:
-            coord = self.geo
+            if self.geo_address_path is None:
+                coord = self.geo
+            else:
+                # coordinates are fetched together with the stored time zone of the address
+                *coord, time_zone = self.get_geo_address()
+                if time_zone:
+                    return pytz.timezone(time_zone)
         except ObjectDoesNotExist:
             coord = -0.118092, 51.509865
         return geo_time_zone(*coord)
@@ -114,6 +114,10 @@ if 'r3sourcer.apps.logger' in INSTALLED_APPS:
     LOGGER_PASSWORD = env('LOGGER_PASSWORD', LOGGER_PASSWORD)
     LOGGER_HOST = env('LOGGER_HOST', LOGGER_HOST)
     LOGGER_PORT = env('LOGGER_PORT', LOGGER_PORT)
+    LOGGER_BUFFERED = env('LOGGER_BUFFERED', '0') == '1'
+    LOGGER_BUFFER_SIZE = int(env('LOGGER_BUFFER_SIZE', LOGGER_BUFFER_SIZE))
+    LOGGER_BUFFER_FLUSH_INTERVAL = int(env('LOGGER_BUFFER_FLUSH_INTERVAL', LOGGER_BUFFER_FLUSH_INTERVAL))
+    LOGGER_SPOOL_PATH = env('LOGGER_SPOOL_PATH', LOGGER_SPOOL_PATH)
 
     LOGGER_ENABLED = env('LOGGER_ENABLED', '1') == '1'
 
@@ -313,8 +317,16 @@ REST_FRAMEWORK = {
     )
 }
 
+SERIALIZER_FIELD_LAYOUT_CACHE = env('SERIALIZER_FIELD_LAYOUT_CACHE', '1') == '1'
+
 GOOGLE_GEO_CODING_API_KEY = env('GOOGLE_GEO_CODING_API_KEY', '')
 GOOGLE_DISTANCE_MATRIX_API_KEY = env('GOOGLE_DISTANCE_MATRIX_API_KEY', '')
+DISTANCE_MATRIX_PROVIDER_CLASS = env(
+    'DISTANCE_MATRIX_PROVIDER_CLASS', 'r3sourcer.apps.core.utils.geo.GoogleDistanceProvider'
+)
+DISTANCE_REFRESH_WORKERS = int(env('DISTANCE_REFRESH_WORKERS', 4))
+
+PDF_FILE_CACHE_TIMEOUT = int(env('PDF_FILE_CACHE_TIMEOUT', 60 * 60 * 24 * 30))
 
 # CORE APP
 
@@ -374,7 +386,14 @@ ENABLED_TWILIO_WORKING = False
 SMS_SERVICE_ENABLED = env('SMS_SERVICE_ENABLED', '0') == '1'
 SMS_SERVICE_CLASS = env('SMS_SERVICE_CLASS', 'r3sourcer.apps.sms_interface.services.FakeSMSService')
 
+TWILIO_API_URL = env('TWILIO_API_URL', 'https://api.twilio.com')
+TWILIO_FETCH_WORKERS = int(env('TWILIO_FETCH_WORKERS', 4))
+TWILIO_FETCH_PAGE_SIZE = int(env('TWILIO_FETCH_PAGE_SIZE', 1000))
+TWILIO_FETCH_TIMEOUT = int(env('TWILIO_FETCH_TIMEOUT', 30))
+TWILIO_FETCH_OVERLAP_MINUTES = int(env('TWILIO_FETCH_OVERLAP_MINUTES', 60))
+
 FETCH_ADDRESS_RAISE_EXCEPTIONS = env('FETCH_ADDRESS_RAISE_EXCEPTIONS', '0') == '1'
+STORE_ADDRESS_TIME_ZONE = env('STORE_ADDRESS_TIME_ZONE', '0') == '1'
 
 DATE_FORMAT = 'd/m/Y'
 DATE_MYOB_FORMAT = 'Y-m-d'
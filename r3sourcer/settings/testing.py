@@ -39,6 +39,10 @@ LOGGER_ENABLED = False
 
 REDIRECT_DOMAIN = 'r3sourcer.com'
 
+DISTANCE_MATRIX_PROVIDER_CLASS = 'r3sourcer.apps.core.utils.geo.HaversineDistanceProvider'
+
+SERIALIZER_FIELD_LAYOUT_CACHE = True
+
 
 def cities_light_uri(n): return 'file://%s' % os.path.join(
     BASE_DIR, 'r3sourcer/apps/core/tests/fixtures/django_cities', n